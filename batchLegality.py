@@ -0,0 +1,413 @@
+import argparse
+import random
+import time
+
+import bitboardBackend
+import gameClasses
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# A batch holds one int8 row of 64 squares per position, a1 first and h8 last as in the bitboard backend. Empty squares
+# are 0, White's pieces are their bitboard piece type plus one and Black's pieces the negative of that.
+# The array passes are only a little faster than KingPiece.checkIfInCheck plus findLegalMoves board by board, and once
+# PositionBatch.fromGameBoards is counted the batch path is slower. It only pays off for callers that already hold
+# encoded positions (PositionBatch.fromBinary); callers starting from GameBoards should stay board by board.
+pawnCode, knightCode, bishopCode, rookCode, queenCode, kingCode = range(1, 7)
+# (rank step, file step) of each sliding direction
+rookDirectionList = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+bishopDirectionList = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+# The benchmark prints this many of the positions where the two paths disagree
+shownMismatchCount = 5
+
+
+def convertAttackListToTable(attackList):
+    # A (64, 64) boolean table from a list of attack bitboards, so attacks of many pieces are one matrix product
+    return numpy.array([[bool(attacks >> square & 1) for square in range(64)] for attacks in attackList])
+
+
+def buildRayTable(rankStep, fileStep):
+    # The squares a slider on each square passes along one direction of an empty board, in a (64, 64) table
+    rayTable = numpy.zeros((64, 64), dtype=bool)
+    for square in range(64):
+        rankIndex, fileIndex = square // 8 + rankStep, square % 8 + fileStep
+        while 0 <= rankIndex <= 7 and 0 <= fileIndex <= 7:
+            rayTable[square, rankIndex * 8 + fileIndex] = True
+            rankIndex, fileIndex = rankIndex + rankStep, fileIndex + fileStep
+    return rayTable
+
+
+if numpy is not None:
+    knightAttackTable = convertAttackListToTable(bitboardBackend.knightAttackList)
+    kingAttackTable = convertAttackListToTable(bitboardBackend.kingAttackList)
+    pawnAttackTables = [convertAttackListToTable(pawnAttackList) for pawnAttackList in bitboardBackend.pawnAttackLists]
+    knightAttackCountTable = knightAttackTable.astype(numpy.float32)
+    kingAttackCountTable = kingAttackTable.astype(numpy.float32)
+    pawnAttackCountTables = [pawnAttackTable.astype(numpy.float32) for pawnAttackTable in pawnAttackTables]
+    rayTableDict = {direction: buildRayTable(*direction) for direction in rookDirectionList + bishopDirectionList}
+
+
+class PositionBatch:
+    # Many positions packed into arrays, one row per position. Colors and castling rights use the bitboard backend's
+    # numbers and flags. The en passant file is that of a pawn that just moved two squares, or -1.
+    def __init__(self, boardArray, colorToMoveArray, castlingRightsArray, enPassantFileArray):
+        self.boardArray = boardArray
+        self.colorToMoveArray = colorToMoveArray
+        self.castlingRightsArray = castlingRightsArray
+        self.enPassantFileArray = enPassantFileArray
+
+    def __len__(self):
+        return len(self.boardArray)
+
+    @classmethod
+    def fromBinary(cls, encodedPositionList):
+        # Decodes GameBoard.toBinary encodings with array operations, without building any boards
+        if numpy is None:
+            raise ImportError("PositionBatch needs NumPy")
+        encodedPositionArray = numpy.frombuffer(b"".join(encodedPositionList), dtype=numpy.uint8).reshape(-1, 32)
+        occupancyArray = numpy.unpackbits(encodedPositionArray[:, :8], axis=1, bitorder="little").astype(bool)
+        pieceCodeArray = numpy.empty((len(encodedPositionArray), 32), dtype=numpy.int8)
+        pieceCodeArray[:, 0::2] = encodedPositionArray[:, 8:24] & 15
+        pieceCodeArray[:, 1::2] = encodedPositionArray[:, 8:24] >> 4
+        # The n-th occupied square of a position holds its n-th piece code, which is color * 6 + piece type
+        pieceOrdinalArray = numpy.clip(numpy.cumsum(occupancyArray, axis=1) - 1, 0, 31)
+        squarePieceCodeArray = numpy.take_along_axis(pieceCodeArray, pieceOrdinalArray, axis=1)
+        squareValueArray = numpy.where(squarePieceCodeArray >= 6, -(squarePieceCodeArray - 5), squarePieceCodeArray + 1)
+        boardArray = numpy.where(occupancyArray, squareValueArray, 0).astype(numpy.int8)
+        return cls(boardArray, encodedPositionArray[:, 24] & 1, encodedPositionArray[:, 24] >> 1,
+                   encodedPositionArray[:, 25].astype(numpy.int8) - 1)
+
+    @classmethod
+    def fromGameBoards(cls, gameBoardList):
+        return cls.fromBinary([gameBoard.toBinary() for gameBoard in gameBoardList])
+
+    def take(self, indexArray):
+        # A batch of the positions at indexArray, which may repeat positions
+        return PositionBatch(self.boardArray[indexArray], self.colorToMoveArray[indexArray],
+                             self.castlingRightsArray[indexArray], self.enPassantFileArray[indexArray])
+
+    def findSignArray(self):
+        # 1 where White is to move and -1 where Black is, so that multiplying a row by it makes the side to move's
+        # pieces positive
+        return numpy.where(self.colorToMoveArray == bitboardBackend.whiteColor, 1, -1).astype(numpy.int8)
+
+    def findKingSquares(self):
+        # The side to move's king square in every position
+        return numpy.argmax(self.boardArray * self.findSignArray()[:, None] == kingCode, axis=1)
+
+
+def findNearestSquares(squareArray, rankStep, fileStep):
+    # The first marked square of each row in the order a ray in this direction meets them, and whether there is one
+    hasSquareArray = squareArray.any(axis=1)
+    if rankStep * 8 + fileStep > 0:
+        return numpy.argmax(squareArray, axis=1), hasSquareArray
+    return 63 - numpy.argmax(squareArray[:, ::-1], axis=1), hasSquareArray
+
+
+def findRayAttacks(originSquareArray, occupiedArray, directionList):
+    # Squares one slider per row reaches, looked up as whole rays and cut off behind the first occupied square
+    attackedArray = numpy.zeros(occupiedArray.shape, dtype=bool)
+    for direction in directionList:
+        rayTable = rayTableDict[direction]
+        rayArray = rayTable[originSquareArray]
+        blockerSquareArray, hasBlockerArray = findNearestSquares(rayArray & occupiedArray, *direction)
+        attackedArray |= rayArray & ~(rayTable[blockerSquareArray] & hasBlockerArray[:, None])
+    return attackedArray
+
+
+def shiftSquares(squareArray, rankStep, fileStep):
+    # Moves everything on (M, 8, 8) boards by the given steps, dropping whatever leaves the board
+    shiftedArray = numpy.zeros_like(squareArray)
+    shiftedArray[:, max(0, rankStep):8 + min(0, rankStep), max(0, fileStep):8 + min(0, fileStep)] = \
+        squareArray[:, max(0, -rankStep):8 - max(0, rankStep), max(0, -fileStep):8 - max(0, fileStep)]
+    return shiftedArray
+
+
+def findSlidingAttacks(sliderArray, emptyArray, directionList):
+    # (M, 64) masks of the squares reached from the marked sliders of each board, up to and including the first
+    # occupied square. Every board takes a step at the same time, so there are at most seven steps per direction
+    # however many sliders a board has.
+    sliderSquares = sliderArray.reshape(-1, 8, 8)
+    emptySquares = emptyArray.reshape(-1, 8, 8)
+    attackedSquares = numpy.zeros_like(sliderSquares)
+    for rankStep, fileStep in directionList:
+        rayFront = sliderSquares
+        for _ in range(7):
+            rayFront = shiftSquares(rayFront, rankStep, fileStep)
+            attackedSquares |= rayFront
+            rayFront = rayFront & emptySquares
+            if not rayFront.any():
+                break
+    return attackedSquares.reshape(-1, 64)
+
+
+def findAttackedSquaresByColor(boardArray, colorIndex):
+    # (M, 64) masks of the squares one color's pieces attack or defend on each board
+    pieceArray = boardArray if colorIndex == bitboardBackend.whiteColor else -boardArray
+    emptyArray = boardArray == 0
+    # Leaper attacks are counted with floating point matrix products, which NumPy hands to BLAS, unlike boolean ones
+    attackCountArray = (pieceArray == knightCode).astype(numpy.float32) @ knightAttackCountTable
+    attackCountArray += (pieceArray == kingCode).astype(numpy.float32) @ kingAttackCountTable
+    attackCountArray += (pieceArray == pawnCode).astype(numpy.float32) @ pawnAttackCountTables[colorIndex]
+    attackedArray = attackCountArray > 0
+    attackedArray |= findSlidingAttacks((pieceArray == rookCode) | (pieceArray == queenCode), emptyArray, rookDirectionList)
+    attackedArray |= findSlidingAttacks((pieceArray == bishopCode) | (pieceArray == queenCode), emptyArray, bishopDirectionList)
+    return attackedArray
+
+
+def findAttackedSquaresByColors(boardArray, attackingColorArray):
+    # Like findAttackedSquaresByColor with a color per board, computed as one pass per color
+    attackedArray = numpy.zeros(boardArray.shape, dtype=bool)
+    for colorIndex in [bitboardBackend.whiteColor, bitboardBackend.blackColor]:
+        rowIndexArray = numpy.flatnonzero(attackingColorArray == colorIndex)
+        if len(rowIndexArray):
+            attackedArray[rowIndexArray] = findAttackedSquaresByColor(boardArray[rowIndexArray], colorIndex)
+    return attackedArray
+
+
+def findAttackedSquareMasks(positionBatch):
+    # (N, 64) masks of the squares attacked by the side that is not to move
+    if numpy is None:
+        raise ImportError("findAttackedSquareMasks needs NumPy")
+    return findAttackedSquaresByColors(positionBatch.boardArray, 1 - positionBatch.colorToMoveArray)
+
+
+def findInCheckFlags(positionBatch):
+    # Whether the side to move is in check, for every position
+    attackedArray = findAttackedSquareMasks(positionBatch)
+    return attackedArray[numpy.arange(len(positionBatch)), positionBatch.findKingSquares()]
+
+
+class PositionSafety:
+    # What legality checks need to know about the side to move's king in each position of a batch. Squares are
+    # attacked as if the king were not on the board, so that squares behind it along a checking line count too.
+    def __init__(self, positionBatch):
+        rowIndexArray = numpy.arange(len(positionBatch))
+        self.relativeBoardArray = positionBatch.boardArray * positionBatch.findSignArray()[:, None]
+        self.kingSquareArray = positionBatch.findKingSquares()
+        boardWithoutKingArray = positionBatch.boardArray.copy()
+        boardWithoutKingArray[rowIndexArray, self.kingSquareArray] = 0
+        self.attackedArray = findAttackedSquaresByColors(boardWithoutKingArray, 1 - positionBatch.colorToMoveArray)
+        self.inCheckArray = self.attackedArray[rowIndexArray, self.kingSquareArray]
+
+        # A piece is pinned when it is the first piece seen from the king along a line and the second is an enemy
+        # slider moving along that line
+        self.pinnedArray = numpy.zeros(self.relativeBoardArray.shape, dtype=bool)
+        occupiedArray = self.relativeBoardArray != 0
+        for directionList, pinningCode in [(rookDirectionList, rookCode), (bishopDirectionList, bishopCode)]:
+            for direction in directionList:
+                rayTable = rayTableDict[direction]
+                firstSquareArray, hasFirstArray = findNearestSquares(rayTable[self.kingSquareArray] & occupiedArray, *direction)
+                secondSquareArray, hasSecondArray = findNearestSquares(rayTable[firstSquareArray] & occupiedArray, *direction)
+                secondPieceArray = self.relativeBoardArray[rowIndexArray, secondSquareArray]
+                isPinnedArray = hasFirstArray & hasSecondArray & (self.relativeBoardArray[rowIndexArray, firstSquareArray] > 0) & \
+                    ((secondPieceArray == -pinningCode) | (secondPieceArray == -queenCode))
+                self.pinnedArray[rowIndexArray[isPinnedArray], firstSquareArray[isPinnedArray]] = True
+
+
+def findPseudoLegalTargets(positionBatch, positionSafety, positionIndexArray, originSquareArray):
+    # (M, 64) masks of where the piece on each origin square of the positions at positionIndexArray may move, before
+    # the king's safety after the move is considered. Castling is included only when the king does not start on or
+    # cross an attacked square. Rows whose origin square does not hold a piece of the side to move get empty masks.
+    rowIndexArray = numpy.arange(len(positionIndexArray))
+    isWhiteToMoveArray = positionBatch.colorToMoveArray[positionIndexArray] == bitboardBackend.whiteColor
+    relativeBoardArray = positionSafety.relativeBoardArray[positionIndexArray]
+    occupiedArray = relativeBoardArray != 0
+    pieceCodeArray = relativeBoardArray[rowIndexArray, originSquareArray]
+
+    targetArray = knightAttackTable[originSquareArray] & (pieceCodeArray == knightCode)[:, None]
+    targetArray |= kingAttackTable[originSquareArray] & (pieceCodeArray == kingCode)[:, None]
+    for directionList, sliderCode in [(rookDirectionList, rookCode), (bishopDirectionList, bishopCode)]:
+        sliderRowArray = numpy.flatnonzero((pieceCodeArray == sliderCode) | (pieceCodeArray == queenCode))
+        if len(sliderRowArray):
+            targetArray[sliderRowArray] |= findRayAttacks(originSquareArray[sliderRowArray], occupiedArray[sliderRowArray],
+                                                          directionList)
+
+    isPawnArray = pieceCodeArray == pawnCode
+    enPassantArray = numpy.zeros(relativeBoardArray.shape, dtype=bool)
+    enPassantFileArray = positionBatch.enPassantFileArray[positionIndexArray]
+    enPassantRowArray = numpy.flatnonzero(enPassantFileArray >= 0)
+    enPassantArray[enPassantRowArray, numpy.where(isWhiteToMoveArray[enPassantRowArray], 40, 16)
+                   + enPassantFileArray[enPassantRowArray]] = True
+    pawnCaptureArray = numpy.where(isWhiteToMoveArray[:, None], pawnAttackTables[bitboardBackend.whiteColor][originSquareArray],
+                                   pawnAttackTables[bitboardBackend.blackColor][originSquareArray])
+    targetArray |= pawnCaptureArray & ((relativeBoardArray < 0) | enPassantArray) & isPawnArray[:, None]
+    forwardStepArray = numpy.where(isWhiteToMoveArray, 8, -8)
+    # Clipped only so that rows without a pawn index inside the board
+    singlePushArray = numpy.clip(originSquareArray + forwardStepArray, 0, 63)
+    doublePushArray = numpy.clip(originSquareArray + 2 * forwardStepArray, 0, 63)
+    canPushArray = isPawnArray & ~occupiedArray[rowIndexArray, singlePushArray]
+    targetArray[rowIndexArray[canPushArray], singlePushArray[canPushArray]] = True
+    canPushTwiceArray = canPushArray & (originSquareArray // 8 == numpy.where(isWhiteToMoveArray, 1, 6)) & \
+        ~occupiedArray[rowIndexArray, doublePushArray]
+    targetArray[rowIndexArray[canPushTwiceArray], doublePushArray[canPushTwiceArray]] = True
+
+    targetArray &= relativeBoardArray <= 0
+
+    homeSquareArray = numpy.where(isWhiteToMoveArray, 4, 60)
+    castlingRightsArray = positionBatch.castlingRightsArray[positionIndexArray]
+    # Right flags, rook offset, offsets that must be empty, offsets the king stands on or crosses
+    for castlingRightArray, rookOffset, emptyOffsetList, safeOffsetList in \
+            [(numpy.where(isWhiteToMoveArray, bitboardBackend.whiteKingSideCastle, bitboardBackend.blackKingSideCastle),
+              3, [1, 2], [0, 1, 2]),
+             (numpy.where(isWhiteToMoveArray, bitboardBackend.whiteQueenSideCastle, bitboardBackend.blackQueenSideCastle),
+              -4, [-1, -2, -3], [0, -1, -2])]:
+        castlingRowArray = numpy.flatnonzero((pieceCodeArray == kingCode) & (originSquareArray == homeSquareArray) &
+                                             (castlingRightsArray & castlingRightArray != 0))
+        if not len(castlingRowArray):
+            continue
+        castlingPositionArray = positionIndexArray[castlingRowArray]
+        castlingHomeArray = homeSquareArray[castlingRowArray]
+        canCastleArray = relativeBoardArray[castlingRowArray, castlingHomeArray + rookOffset] == rookCode
+        for emptyOffset in emptyOffsetList:
+            canCastleArray &= ~occupiedArray[castlingRowArray, castlingHomeArray + emptyOffset]
+        for safeOffset in safeOffsetList:
+            canCastleArray &= ~positionSafety.attackedArray[castlingPositionArray, castlingHomeArray + safeOffset]
+        targetArray[castlingRowArray[canCastleArray], castlingHomeArray[canCastleArray] + (2 if rookOffset > 0 else -2)] = True
+    return targetArray
+
+
+def findLegalTargets(positionBatch, positionSafety, positionIndexArray, originSquareArray):
+    # (M, 64) masks of the legal targets of the piece on each origin square of the positions at positionIndexArray.
+    # King moves are legal when the target is not attacked, and other moves when the king is not in check, the piece
+    # is not pinned and the move is not en passant. Only the remaining moves are played on copies of their boards,
+    # and all the copies are checked for the mover's king being attacked at once.
+    originSquareArray = numpy.asarray(originSquareArray, dtype=numpy.intp)
+    legalArray = findPseudoLegalTargets(positionBatch, positionSafety, positionIndexArray, originSquareArray)
+    candidateRowArray, targetSquareArray = numpy.nonzero(legalArray)
+    if not len(candidateRowArray):
+        return legalArray
+    candidatePositionArray = positionIndexArray[candidateRowArray]
+    candidateOriginArray = originSquareArray[candidateRowArray]
+    movingPieceArray = positionSafety.relativeBoardArray[candidatePositionArray, candidateOriginArray]
+    isKingMoveArray = movingPieceArray == kingCode
+    # A pawn moving diagonally to an empty square captures en passant, removing the pawn beside it
+    isEnPassantArray = (movingPieceArray == pawnCode) & ((targetSquareArray - candidateOriginArray) % 8 != 0) & \
+        (positionSafety.relativeBoardArray[candidatePositionArray, targetSquareArray] == 0)
+    isIllegalArray = isKingMoveArray & positionSafety.attackedArray[candidatePositionArray, targetSquareArray]
+    needsCheckingArray = ~isKingMoveArray & (positionSafety.inCheckArray[candidatePositionArray] |
+                                             positionSafety.pinnedArray[candidatePositionArray, candidateOriginArray] |
+                                             isEnPassantArray)
+
+    checkedIndexArray = numpy.flatnonzero(needsCheckingArray)
+    if len(checkedIndexArray):
+        checkedPositionArray = candidatePositionArray[checkedIndexArray]
+        checkedOriginArray = candidateOriginArray[checkedIndexArray]
+        checkedTargetArray = targetSquareArray[checkedIndexArray]
+        boardIndexArray = numpy.arange(len(checkedIndexArray))
+        boardArray = positionBatch.boardArray[checkedPositionArray]
+        capturedPawnSquareArray = checkedTargetArray - numpy.where(boardArray[boardIndexArray, checkedOriginArray] > 0, 8, -8)
+        isCheckedEnPassantArray = isEnPassantArray[checkedIndexArray]
+        boardArray[boardIndexArray[isCheckedEnPassantArray], capturedPawnSquareArray[isCheckedEnPassantArray]] = 0
+        boardArray[boardIndexArray, checkedTargetArray] = boardArray[boardIndexArray, checkedOriginArray]
+        boardArray[boardIndexArray, checkedOriginArray] = 0
+        attackedArray = findAttackedSquaresByColors(boardArray, 1 - positionBatch.colorToMoveArray[checkedPositionArray])
+        isIllegalArray[checkedIndexArray] = attackedArray[boardIndexArray, positionSafety.kingSquareArray[checkedPositionArray]]
+
+    legalArray[candidateRowArray[isIllegalArray], targetSquareArray[isIllegalArray]] = False
+    return legalArray
+
+
+def findLegalTargetMasks(positionBatch, originSquareArray):
+    # (N, 64) masks of the legal target squares of the piece on each position's origin square. Positions whose
+    # origin square does not hold a piece of the side to move get empty masks.
+    if numpy is None:
+        raise ImportError("findLegalTargetMasks needs NumPy")
+    return findLegalTargets(positionBatch, PositionSafety(positionBatch), numpy.arange(len(positionBatch)), originSquareArray)
+
+
+def checkMovesLegal(positionBatch, originSquareArray, targetSquareArray):
+    # Whether moving from each origin square to each target square is legal in its position. A promotion is legal to
+    # any piece exactly when the pawn move is.
+    legalArray = findLegalTargetMasks(positionBatch, originSquareArray)
+    return legalArray[numpy.arange(len(positionBatch)), numpy.asarray(targetSquareArray, dtype=numpy.intp)]
+
+
+def findLegalMoveMasks(positionBatch):
+    # (N, 64, 64) masks of every legal move, indexed by position, origin square and target square
+    if numpy is None:
+        raise ImportError("findLegalMoveMasks needs NumPy")
+    positionSafety = PositionSafety(positionBatch)
+    positionIndexArray, originSquareArray = numpy.nonzero(positionSafety.relativeBoardArray > 0)
+    legalMoveArray = numpy.zeros((len(positionBatch), 64, 64), dtype=bool)
+    legalMoveArray[positionIndexArray, originSquareArray] = findLegalTargets(positionBatch, positionSafety, positionIndexArray,
+                                                                             originSquareArray)
+    return legalMoveArray
+
+
+def collectRandomPositions(positionCount, randomGenerator):
+    # Positions from games of random legal moves, taken at random plies, as toBinary encodings
+    encodedPositionList = []
+    while len(encodedPositionList) < positionCount:
+        gameBoard = gameClasses.GameBoard()
+        for _ in range(randomGenerator.randint(0, 120)):
+            legalMoveList = gameBoard.generateLegalMoves()
+            if gameBoard.findGameStatus(legalMoveList) != "ongoing":
+                break
+            gameBoard.makeMove(*randomGenerator.choice(legalMoveList))
+        encodedPositionList.append(gameBoard.toBinary())
+    return encodedPositionList
+
+
+def runBenchmark(positionCount, seed=0):
+    # Answers "is the side to move in check" and "which moves are legal" for the same positions board by board and as
+    # one batch, and checks that both agree. Returns True if they do.
+    gameBoardList = [gameClasses.GameBoard.fromBinary(encodedPosition)
+                     for encodedPosition in collectRandomPositions(positionCount, random.Random(seed))]
+
+    startTime = time.perf_counter()
+    boardInCheckList = []
+    boardLegalMoveSetList = []
+    for gameBoard in gameBoardList:
+        kingPiece = gameBoard.whiteKing if gameBoard.playerToMoveNext == "White" else gameBoard.blackKing
+        boardInCheckList.append(kingPiece.checkIfInCheck())
+        boardLegalMoveSetList.append({(gameClasses.squareIndexToBitboardSquareList[chessPiece.squareIndex],
+                                       gameClasses.squareIndexToBitboardSquareList[legalMove[0]])
+                                      for chessPiece, legalMove in gameBoard.findLegalMoves(gameBoard.playerToMoveNext)})
+    boardTime = time.perf_counter() - startTime
+
+    # Converting is Python work per board, so it is timed apart from the array passes
+    startTime = time.perf_counter()
+    positionBatch = PositionBatch.fromGameBoards(gameBoardList)
+    conversionTime = time.perf_counter() - startTime
+    startTime = time.perf_counter()
+    batchInCheckArray = findInCheckFlags(positionBatch)
+    batchLegalMoveArray = findLegalMoveMasks(positionBatch)
+    batchTime = time.perf_counter() - startTime
+
+    mismatchFENList = []
+    for positionIndex, gameBoard in enumerate(gameBoardList):
+        batchLegalMoveSet = {(int(originSquare), int(targetSquare))
+                             for originSquare, targetSquare in zip(*numpy.nonzero(batchLegalMoveArray[positionIndex]))}
+        if bool(batchInCheckArray[positionIndex]) != bool(boardInCheckList[positionIndex]) or \
+                batchLegalMoveSet != boardLegalMoveSetList[positionIndex]:
+            mismatchFENList.append(gameBoard.toFEN())
+    if mismatchFENList:
+        print(f"{len(mismatchFENList)} mismatches, first {min(len(mismatchFENList), shownMismatchCount)}:")
+        for fenString in mismatchFENList[:shownMismatchCount]:
+            print(f"  {fenString}")
+
+    positionCount = len(gameBoardList)
+    print(f"{positionCount} positions, in check flags and legal moves of each")
+    print(f"per board          {boardTime:8.3f}s  {positionCount / boardTime:10.0f} positions/s")
+    print(f"batch              {batchTime:8.3f}s  {positionCount / batchTime:10.0f} positions/s  {boardTime / batchTime:.1f}x")
+    print(f"batch + converting {batchTime + conversionTime:8.3f}s  {positionCount / (batchTime + conversionTime):10.0f} positions/s  "
+          f"{boardTime / (batchTime + conversionTime):.1f}x")
+    return not mismatchFENList
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched check and legal move detection against the "
+                                                 "board by board path on random positions.")
+    parser.add_argument("--positions", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    if numpy is None:
+        parser.error("NumPy is needed for batched legality checks")
+    return 0 if runBenchmark(arguments.positions, arguments.seed) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
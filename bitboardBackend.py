@@ -0,0 +1,342 @@
+pawnType, knightType, bishopType, rookType, queenType, kingType = range(6)
+whiteColor, blackColor = 0, 1
+
+# Squares are numbered 0 (a1) to 63 (h8). Moves are packed into a single integer: the origin square in bits 0-5,
+# the target square in bits 6-11, the promotion piece type in bits 12-15 and a move flag in bits 16 and up.
+normalMoveFlag, doublePawnPushFlag, enPassantFlag, castlingFlag = range(4)
+
+whiteKingSideCastle, whiteQueenSideCastle, blackKingSideCastle, blackQueenSideCastle = 1, 2, 4, 8
+
+promotionTypeList = [queenType, rookType, bishopType, knightType]
+
+
+def findMoveOrigin(move):
+    return move & 63
+
+
+def findMoveTarget(move):
+    return (move >> 6) & 63
+
+
+def findMovePromotionType(move):
+    return (move >> 12) & 15
+
+
+def findMoveFlag(move):
+    return move >> 16
+
+
+def findSquaresInBitboard(bitboard):
+    squareList = []
+    while bitboard:
+        lowestBit = bitboard & -bitboard
+        squareList.append(lowestBit.bit_length() - 1)
+        bitboard ^= lowestBit
+    return squareList
+
+
+def buildLeaperAttackList(movementPatternList):
+    attackList = []
+    for square in range(64):
+        attacks = 0
+        for horizontalAmountOfSquares, verticalAmountOfSquares in movementPatternList:
+            fileIndex = square % 8 + horizontalAmountOfSquares
+            rankIndex = square // 8 + verticalAmountOfSquares
+            if 0 <= fileIndex <= 7 and 0 <= rankIndex <= 7:
+                attacks |= 1 << (rankIndex * 8 + fileIndex)
+        attackList.append(attacks)
+    return attackList
+
+
+def buildLineAttackTables(lineDirectionPairs):
+    # For every square and every line through it (a rank, file or diagonal), map each possible arrangement of
+    # blockers on that line to the squares a slider on the square attacks. A sliding attack is then one mask and one
+    # dictionary lookup per line instead of a walk along the ray.
+    lineMaskLists = []
+    lineAttackTables = []
+    for horizontalDirection, verticalDirection in lineDirectionPairs:
+        lineMaskList = []
+        lineAttackTable = []
+        for square in range(64):
+            raySquareLists = []
+            for directionSign in (1, -1):
+                raySquareList = []
+                fileIndex = square % 8 + horizontalDirection * directionSign
+                rankIndex = square // 8 + verticalDirection * directionSign
+                while 0 <= fileIndex <= 7 and 0 <= rankIndex <= 7:
+                    raySquareList.append(rankIndex * 8 + fileIndex)
+                    fileIndex += horizontalDirection * directionSign
+                    rankIndex += verticalDirection * directionSign
+                raySquareLists.append(raySquareList)
+
+            lineMask = 0
+            for raySquareList in raySquareLists:
+                for raySquare in raySquareList:
+                    lineMask |= 1 << raySquare
+
+            attackTable = {}
+            blockers = 0
+            while True:
+                attacks = 0
+                for raySquareList in raySquareLists:
+                    for raySquare in raySquareList:
+                        attacks |= 1 << raySquare
+                        if blockers & (1 << raySquare):
+                            break
+                attackTable[blockers] = attacks
+                blockers = (blockers - lineMask) & lineMask
+                if blockers == 0:
+                    break
+
+            lineMaskList.append(lineMask)
+            lineAttackTable.append(attackTable)
+        lineMaskLists.append(lineMaskList)
+        lineAttackTables.append(lineAttackTable)
+    return lineMaskLists, lineAttackTables
+
+
+knightAttackList = buildLeaperAttackList([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+kingAttackList = buildLeaperAttackList([(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)])
+pawnAttackLists = [buildLeaperAttackList([(-1, 1), (1, 1)]), buildLeaperAttackList([(-1, -1), (1, -1)])]
+(rankMaskList, fileMaskList, diagonalMaskList, antiDiagonalMaskList), \
+    (rankAttackTable, fileAttackTable, diagonalAttackTable, antiDiagonalAttackTable) = \
+    buildLineAttackTables([(1, 0), (0, 1), (1, 1), (1, -1)])
+
+# Moving a piece to or from one of these squares removes the matching castling rights
+castlingRightsMaskList = [15] * 64
+castlingRightsMaskList[0] = 15 & ~whiteQueenSideCastle
+castlingRightsMaskList[4] = 15 & ~(whiteKingSideCastle | whiteQueenSideCastle)
+castlingRightsMaskList[7] = 15 & ~whiteKingSideCastle
+castlingRightsMaskList[56] = 15 & ~blackQueenSideCastle
+castlingRightsMaskList[60] = 15 & ~(blackKingSideCastle | blackQueenSideCastle)
+castlingRightsMaskList[63] = 15 & ~blackKingSideCastle
+
+
+def findRookAttacks(square, occupancy):
+    return rankAttackTable[square][occupancy & rankMaskList[square]] | \
+        fileAttackTable[square][occupancy & fileMaskList[square]]
+
+
+def findBishopAttacks(square, occupancy):
+    return diagonalAttackTable[square][occupancy & diagonalMaskList[square]] | \
+        antiDiagonalAttackTable[square][occupancy & antiDiagonalMaskList[square]]
+
+
+class BitboardPosition:
+    def __init__(self):
+        self.pieceBitboards = [[0] * 6, [0] * 6]
+        self.colorOccupancy = [0, 0]
+        # Piece codes are color * 6 + piece type, or -1 for an empty square
+        self.pieceCodeList = [-1] * 64
+        self.sideToMove = whiteColor
+        self.castlingRights = 0
+        self.enPassantSquare = -1
+
+    def placePiece(self, square, color, pieceType):
+        squareBit = 1 << square
+        self.pieceBitboards[color][pieceType] |= squareBit
+        self.colorOccupancy[color] |= squareBit
+        self.pieceCodeList[square] = color * 6 + pieceType
+
+    def removePiece(self, square):
+        pieceCode = self.pieceCodeList[square]
+        squareBit = 1 << square
+        self.pieceBitboards[pieceCode // 6][pieceCode % 6] ^= squareBit
+        self.colorOccupancy[pieceCode // 6] ^= squareBit
+        self.pieceCodeList[square] = -1
+        return pieceCode
+
+    def findKingSquare(self, color):
+        return self.pieceBitboards[color][kingType].bit_length() - 1
+
+    def isSquareAttacked(self, square, byColor):
+        attackingPieces = self.pieceBitboards[byColor]
+        if pawnAttackLists[byColor ^ 1][square] & attackingPieces[pawnType]:
+            return True
+        if knightAttackList[square] & attackingPieces[knightType]:
+            return True
+        if kingAttackList[square] & attackingPieces[kingType]:
+            return True
+        occupancy = self.colorOccupancy[0] | self.colorOccupancy[1]
+        if findRookAttacks(square, occupancy) & (attackingPieces[rookType] | attackingPieces[queenType]):
+            return True
+        if findBishopAttacks(square, occupancy) & (attackingPieces[bishopType] | attackingPieces[queenType]):
+            return True
+        return False
+
+    def checkIfInCheck(self, color=None):
+        if color is None:
+            color = self.sideToMove
+        return self.isSquareAttacked(self.findKingSquare(color), color ^ 1)
+
+    def generatePseudoLegalMoves(self):
+        color = self.sideToMove
+        ownPieces = self.pieceBitboards[color]
+        ownOccupancy = self.colorOccupancy[color]
+        enemyOccupancy = self.colorOccupancy[color ^ 1]
+        occupancy = ownOccupancy | enemyOccupancy
+        moveList = []
+
+        # Pawns
+        forwardOffset = 8 if color == whiteColor else -8
+        startRankIndex = 1 if color == whiteColor else 6
+        promotionRankIndex = 7 if color == whiteColor else 0
+        pawnAttackList = pawnAttackLists[color]
+        for square in findSquaresInBitboard(ownPieces[pawnType]):
+            targetSquare = square + forwardOffset
+            if not occupancy & (1 << targetSquare):
+                if targetSquare >> 3 == promotionRankIndex:
+                    for promotionType in promotionTypeList:
+                        moveList.append(square | (targetSquare << 6) | (promotionType << 12))
+                else:
+                    moveList.append(square | (targetSquare << 6))
+                    if square >> 3 == startRankIndex and not occupancy & (1 << (targetSquare + forwardOffset)):
+                        moveList.append(square | ((targetSquare + forwardOffset) << 6) | (doublePawnPushFlag << 16))
+            for targetSquare in findSquaresInBitboard(pawnAttackList[square] & enemyOccupancy):
+                if targetSquare >> 3 == promotionRankIndex:
+                    for promotionType in promotionTypeList:
+                        moveList.append(square | (targetSquare << 6) | (promotionType << 12))
+                else:
+                    moveList.append(square | (targetSquare << 6))
+            if self.enPassantSquare >= 0 and pawnAttackList[square] & (1 << self.enPassantSquare):
+                moveList.append(square | (self.enPassantSquare << 6) | (enPassantFlag << 16))
+
+        # Knights and king
+        notOwnOccupancy = ~ownOccupancy
+        for square in findSquaresInBitboard(ownPieces[knightType]):
+            for targetSquare in findSquaresInBitboard(knightAttackList[square] & notOwnOccupancy):
+                moveList.append(square | (targetSquare << 6))
+        kingSquare = self.findKingSquare(color)
+        for targetSquare in findSquaresInBitboard(kingAttackList[kingSquare] & notOwnOccupancy):
+            moveList.append(kingSquare | (targetSquare << 6))
+
+        # Sliding pieces
+        for square in findSquaresInBitboard(ownPieces[bishopType] | ownPieces[queenType]):
+            for targetSquare in findSquaresInBitboard(findBishopAttacks(square, occupancy) & notOwnOccupancy):
+                moveList.append(square | (targetSquare << 6))
+        for square in findSquaresInBitboard(ownPieces[rookType] | ownPieces[queenType]):
+            for targetSquare in findSquaresInBitboard(findRookAttacks(square, occupancy) & notOwnOccupancy):
+                moveList.append(square | (targetSquare << 6))
+
+        # Castling. The king may not be in check or pass through or land on an attacked square.
+        if self.castlingRights:
+            enemyColor = color ^ 1
+            if color == whiteColor:
+                kingSideRight, queenSideRight, homeSquare = whiteKingSideCastle, whiteQueenSideCastle, 4
+            else:
+                kingSideRight, queenSideRight, homeSquare = blackKingSideCastle, blackQueenSideCastle, 60
+            if self.castlingRights & (kingSideRight | queenSideRight) and \
+                    not self.isSquareAttacked(homeSquare, enemyColor):
+                if self.castlingRights & kingSideRight and \
+                        not occupancy & (3 << (homeSquare + 1)) and \
+                        not self.isSquareAttacked(homeSquare + 1, enemyColor) and \
+                        not self.isSquareAttacked(homeSquare + 2, enemyColor):
+                    moveList.append(homeSquare | ((homeSquare + 2) << 6) | (castlingFlag << 16))
+                if self.castlingRights & queenSideRight and \
+                        not occupancy & (7 << (homeSquare - 3)) and \
+                        not self.isSquareAttacked(homeSquare - 1, enemyColor) and \
+                        not self.isSquareAttacked(homeSquare - 2, enemyColor):
+                    moveList.append(homeSquare | ((homeSquare - 2) << 6) | (castlingFlag << 16))
+
+        return moveList
+
+    def findPinnedPieces(self, color):
+        # A piece is pinned if taking it off the board would expose its king to a slider along the same line
+        kingSquare = self.findKingSquare(color)
+        ownOccupancy = self.colorOccupancy[color]
+        occupancy = ownOccupancy | self.colorOccupancy[color ^ 1]
+        enemyPieces = self.pieceBitboards[color ^ 1]
+        pinnedPieces = 0
+        for findSliderAttacks, enemySliders in \
+                [(findRookAttacks, enemyPieces[rookType] | enemyPieces[queenType]),
+                 (findBishopAttacks, enemyPieces[bishopType] | enemyPieces[queenType])]:
+            if not enemySliders:
+                continue
+            kingAttacks = findSliderAttacks(kingSquare, occupancy)
+            for square in findSquaresInBitboard(kingAttacks & ownOccupancy):
+                if findSliderAttacks(kingSquare, occupancy ^ (1 << square)) & ~kingAttacks & enemySliders:
+                    pinnedPieces |= 1 << square
+        return pinnedPieces
+
+    def generateLegalMoves(self):
+        # Only moves that can possibly expose the king are tried on the board: king moves, en passant, moves of
+        # pinned pieces, and every move while in check
+        legalMoveList = []
+        color = self.sideToMove
+        kingSquare = self.findKingSquare(color)
+        inCheck = self.isSquareAttacked(kingSquare, color ^ 1)
+        pinnedPieces = self.findPinnedPieces(color)
+        for move in self.generatePseudoLegalMoves():
+            originSquare = move & 63
+            if not inCheck and originSquare != kingSquare and not (pinnedPieces >> originSquare) & 1 and \
+                    move >> 16 != enPassantFlag:
+                legalMoveList.append(move)
+                continue
+            undoRecord = self.makeMove(move)
+            if not self.isSquareAttacked(self.findKingSquare(color), color ^ 1):
+                legalMoveList.append(move)
+            self.unmakeMove(move, undoRecord)
+        return legalMoveList
+
+    def makeMove(self, move):
+        originSquare = move & 63
+        targetSquare = (move >> 6) & 63
+        promotionType = (move >> 12) & 15
+        moveFlag = move >> 16
+        color = self.sideToMove
+        undoRecord = (-1, self.castlingRights, self.enPassantSquare)
+
+        if moveFlag == enPassantFlag:
+            capturedSquare = targetSquare - 8 if color == whiteColor else targetSquare + 8
+            undoRecord = (self.removePiece(capturedSquare), self.castlingRights, self.enPassantSquare)
+        elif self.pieceCodeList[targetSquare] >= 0:
+            undoRecord = (self.removePiece(targetSquare), self.castlingRights, self.enPassantSquare)
+
+        pieceCode = self.removePiece(originSquare)
+        if promotionType:
+            self.placePiece(targetSquare, color, promotionType)
+        else:
+            self.placePiece(targetSquare, color, pieceCode % 6)
+
+        if moveFlag == castlingFlag:
+            if targetSquare > originSquare:
+                self.removePiece(originSquare + 3)
+                self.placePiece(originSquare + 1, color, rookType)
+            else:
+                self.removePiece(originSquare - 4)
+                self.placePiece(originSquare - 1, color, rookType)
+
+        self.enPassantSquare = (originSquare + targetSquare) >> 1 if moveFlag == doublePawnPushFlag else -1
+        self.castlingRights &= castlingRightsMaskList[originSquare] & castlingRightsMaskList[targetSquare]
+        self.sideToMove = color ^ 1
+
+        return undoRecord
+
+    def unmakeMove(self, move, undoRecord):
+        originSquare = move & 63
+        targetSquare = (move >> 6) & 63
+        promotionType = (move >> 12) & 15
+        moveFlag = move >> 16
+        capturedPieceCode, self.castlingRights, self.enPassantSquare = undoRecord
+        self.sideToMove ^= 1
+        color = self.sideToMove
+
+        pieceCode = self.removePiece(targetSquare)
+        self.placePiece(originSquare, color, pawnType if promotionType else pieceCode % 6)
+
+        if moveFlag == castlingFlag:
+            if targetSquare > originSquare:
+                self.removePiece(originSquare + 1)
+                self.placePiece(originSquare + 3, color, rookType)
+            else:
+                self.removePiece(originSquare - 1)
+                self.placePiece(originSquare - 4, color, rookType)
+
+        if capturedPieceCode >= 0:
+            if moveFlag == enPassantFlag:
+                capturedSquare = targetSquare - 8 if color == whiteColor else targetSquare + 8
+            else:
+                capturedSquare = targetSquare
+            self.placePiece(capturedSquare, capturedPieceCode // 6, capturedPieceCode % 6)
+
+        return
@@ -0,0 +1,100 @@
+import pygame
+
+import gameClasses
+
+
+class BoardRenderer:
+    # Retained-mode drawing of the board. What each square shows is remembered as a tuple of its piece, highlights
+    # and move marker, and a frame only redraws the squares whose tuple changed, then updates just their rectangles
+    # on the display. A frame where nothing changed draws nothing.
+    checkBorderAlpha = 200
+    selectedSquareAlpha = 90
+    moveMarkerAlpha = 150
+
+    def __init__(self, gameSurface, backgroundSurface, blockSize, pieceSpriteDict, overlaySpriteDict, bufferDistance,
+                 dotBufferDistance):
+        self.gameSurface = gameSurface
+        self.backgroundSurface = backgroundSurface
+        self.blockSize = blockSize
+        # Keyed by (piece type, player color)
+        self.pieceSpriteDict = pieceSpriteDict
+        # Keyed by "redBorder", "greenSquare" and "greenDot"
+        self.overlaySpriteDict = overlaySpriteDict
+        self.bufferDistance = bufferDistance
+        self.dotBufferDistance = dotBufferDistance
+        self.overlayCache = {}
+        # The state each square was last drawn in, keyed by square index
+        self.drawnSquareStateDict = {}
+
+    def invalidate(self):
+        # Forces every square to be redrawn, for when the window contents were lost
+        self.drawnSquareStateDict = {}
+
+    def findOverlay(self, spriteName, alpha):
+        # The sprite with its alpha channel scaled by alpha, made once per sprite, size and alpha. Blitting it looks the
+        # same as compositing the sprite over a copy of the screen and blitting that copy back with alpha.
+        overlaySprite = self.overlaySpriteDict[spriteName]
+        cacheKey = (spriteName, overlaySprite.get_size(), alpha)
+        overlay = self.overlayCache.get(cacheKey)
+        if overlay is None:
+            overlay = overlaySprite.convert_alpha()
+            overlay.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+            self.overlayCache[cacheKey] = overlay
+        return overlay
+
+    def findSquareCoordinates(self, squareIndex, bufferDistance):
+        fileIndex = gameClasses.findFileIndexOfSquare(squareIndex)
+        rankIndex = gameClasses.findRankIndexOfSquare(squareIndex)
+        return (int(self.blockSize * fileIndex + bufferDistance), int(self.blockSize * (7 - rankIndex) + bufferDistance))
+
+    def buildSquareStates(self, gameBoard, selectedPiece):
+        # Returns {square index: (piece sprite key, is king in check, is selected, move marker)} for every square that
+        # shows more than the empty board. The move marker is "capture", "dot" or None.
+        squareStateDict = {}
+        for chessPiece in gameBoard.pieceList:
+            squareStateDict[chessPiece.squareIndex] = [(chessPiece.pieceType, chessPiece.playerColor), False, False, None]
+        for kingPiece, isInCheck in [(gameBoard.whiteKing, gameBoard.whiteInCheck), (gameBoard.blackKing, gameBoard.blackInCheck)]:
+            if isInCheck:
+                squareStateDict[kingPiece.squareIndex][1] = True
+        if selectedPiece:
+            squareStateDict[selectedPiece.squareIndex][2] = True
+            for potentialMove in selectedPiece.positionsBeingAttackedByPiece:
+                squareState = squareStateDict.setdefault(potentialMove[0], [None, False, False, None])
+                squareState[3] = "capture" if potentialMove[1] and not potentialMove[2] else "dot"
+        return {squareIndex: tuple(squareState) for squareIndex, squareState in squareStateDict.items()}
+
+    def drawSquare(self, squareIndex, squareState):
+        squareRect = pygame.Rect(self.findSquareCoordinates(squareIndex, 0), (self.blockSize, self.blockSize))
+        self.gameSurface.blit(self.backgroundSurface, squareRect.topleft, area=squareRect)
+        if squareState is None:
+            return squareRect
+        pieceSpriteKey, isInCheck, isSelected, moveMarker = squareState
+        if isInCheck:
+            self.gameSurface.blit(self.findOverlay("redBorder", BoardRenderer.checkBorderAlpha), squareRect.topleft)
+        if isSelected:
+            self.gameSurface.blit(self.findOverlay("greenSquare", BoardRenderer.selectedSquareAlpha), squareRect.topleft)
+        if pieceSpriteKey is not None:
+            self.gameSurface.blit(self.pieceSpriteDict[pieceSpriteKey], self.findSquareCoordinates(squareIndex, self.bufferDistance))
+        if moveMarker == "capture":
+            self.gameSurface.blit(self.findOverlay("redBorder", BoardRenderer.moveMarkerAlpha), squareRect.topleft)
+        elif moveMarker == "dot":
+            self.gameSurface.blit(self.findOverlay("greenDot", BoardRenderer.moveMarkerAlpha),
+                                  self.findSquareCoordinates(squareIndex, self.dotBufferDistance))
+        return squareRect
+
+    def render(self, gameBoard, selectedPiece=None):
+        # Draws the squares that changed since the last frame and updates only those parts of the display. Returns the
+        # number of squares redrawn.
+        squareStateDict = self.buildSquareStates(gameBoard, selectedPiece)
+        if not self.drawnSquareStateDict:
+            dirtySquareSet = set(gameClasses.bitboardSquareToSquareIndexList)
+        else:
+            dirtySquareSet = {squareIndex for squareIndex in squareStateDict.keys() | self.drawnSquareStateDict.keys()
+                              if squareStateDict.get(squareIndex) != self.drawnSquareStateDict.get(squareIndex)}
+        if not dirtySquareSet:
+            return 0
+
+        dirtyRectList = [self.drawSquare(squareIndex, squareStateDict.get(squareIndex)) for squareIndex in dirtySquareSet]
+        self.drawnSquareStateDict = squareStateDict
+        pygame.display.update(dirtyRectList)
+        return len(dirtyRectList)
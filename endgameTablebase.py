@@ -0,0 +1,446 @@
+import argparse
+import itertools
+import logging
+import os
+import struct
+
+import bitboardBackend
+import gameClasses
+
+logger = logging.getLogger(__name__)
+
+# Tables cover a lone king against a king and at most two other pieces. Within a table the side with the extra
+# pieces is always White; positions where Black has them are probed with the board mirrored and the colors swapped.
+# Squares are numbered 0 (a1) to 63 (h8), like the bitboard backend.
+maxPieceCount = 4
+pieceLetterOrder = "QRBNP"
+defaultMaterialList = ["KQK", "KRK", "KPK", "KBNK"]
+defaultTablebaseDirectory = "tablebases"
+
+# A table file is a header followed by one byte per position with White to move, then one per position with Black
+# to move. A byte is 0 for a draw and 255 for an impossible position, otherwise the number of plies to mate plus one.
+# An odd number of plies to mate means the side to move is mating, an even number that it is being mated.
+tablebaseMagic = b"CHTB"
+tablebaseVersion = 1
+headerFormat = struct.Struct("<4sHI")
+drawValue = 0
+illegalValue = 255
+
+kingTargetSquareLists = [bitboardBackend.findSquaresInBitboard(kingAttacks) for kingAttacks in bitboardBackend.kingAttackList]
+
+
+def buildMaterialKey(pieceLetterList):
+    # Like "KBNK" for a king, bishop and knight against a lone king
+    return "K" + "".join(sorted(pieceLetterList, key=pieceLetterOrder.index)) + "K"
+
+
+def checkIfMaterialIsDrawn(pieceLetterList):
+    # A lone king, or a king and a single minor piece, can never force mate
+    return len(pieceLetterList) == 0 or (len(pieceLetterList) == 1 and pieceLetterList[0] in "BN")
+
+
+def findPieceAttacks(pieceLetter, square, occupancy):
+    if pieceLetter == "Q":
+        return bitboardBackend.findRookAttacks(square, occupancy) | bitboardBackend.findBishopAttacks(square, occupancy)
+    if pieceLetter == "R":
+        return bitboardBackend.findRookAttacks(square, occupancy)
+    if pieceLetter == "B":
+        return bitboardBackend.findBishopAttacks(square, occupancy)
+    if pieceLetter == "N":
+        return bitboardBackend.knightAttackList[square]
+    return bitboardBackend.pawnAttackLists[bitboardBackend.whiteColor][square]
+
+
+class TablebaseTable:
+    # One material set's tables. Positions are indexed by the White king's square, reduced by symmetry, then the
+    # Black king's square and the extra pieces' squares in material key order as base 64 digits. Without pawns the
+    # board can be mirrored horizontally, vertically and along the a1-h8 diagonal, which leaves the White king on one
+    # of 10 squares; with pawns only the horizontal mirror is allowed, which leaves 32. A White king on the diagonal
+    # leaves two mirror images of a position, and only the one with the lower squares is used.
+    def __init__(self, materialKey, whiteToMoveValues=None, blackToMoveValues=None):
+        self.materialKey = materialKey
+        self.pieceLetterList = list(materialKey[1:-1])
+        if len(self.pieceLetterList) + 2 > maxPieceCount or buildMaterialKey(self.pieceLetterList) != materialKey or \
+                any(pieceLetter not in pieceLetterOrder for pieceLetter in self.pieceLetterList):
+            raise ValueError(f"Unsupported tablebase material: {materialKey}")
+        self.hasPawns = "P" in self.pieceLetterList
+        self.kingSquareList = [square for square in range(64) if (square & 7) <= 3 and
+                               (self.hasPawns or (square >> 3) <= (square & 7))]
+        self.kingIndexList = [-1] * 64
+        for kingIndex, square in enumerate(self.kingSquareList):
+            self.kingIndexList[square] = kingIndex
+        self.squareCount = len(self.pieceLetterList) + 2
+        self.positionCount = len(self.kingSquareList) * 64 ** (self.squareCount - 1)
+        self.whiteToMoveValues = whiteToMoveValues if whiteToMoveValues is not None else bytearray(self.positionCount)
+        self.blackToMoveValues = blackToMoveValues if blackToMoveValues is not None else bytearray(self.positionCount)
+
+    def findIndex(self, squareTuple):
+        # squareTuple is (White king, Black king, extra pieces...) in any orientation
+        if squareTuple[0] & 7 > 3:
+            squareTuple = [square ^ 7 for square in squareTuple]
+        if not self.hasPawns:
+            if squareTuple[0] > 31:
+                squareTuple = [square ^ 56 for square in squareTuple]
+            if squareTuple[0] >> 3 >= squareTuple[0] & 7:
+                mirroredSquareList = [((square & 7) << 3) | (square >> 3) for square in squareTuple]
+                if squareTuple[0] >> 3 > squareTuple[0] & 7 or mirroredSquareList < list(squareTuple):
+                    squareTuple = mirroredSquareList
+        positionIndex = self.kingIndexList[squareTuple[0]]
+        for square in squareTuple[1:]:
+            positionIndex = (positionIndex << 6) | square
+        return positionIndex
+
+    def findSquares(self, positionIndex):
+        squareList = []
+        for _ in range(self.squareCount - 1):
+            squareList.append(positionIndex & 63)
+            positionIndex >>= 6
+        squareList.append(self.kingSquareList[positionIndex])
+        squareList.reverse()
+        return squareList
+
+    def probeValue(self, squareTuple, isWhiteToMove):
+        valueList = self.whiteToMoveValues if isWhiteToMove else self.blackToMoveValues
+        return valueList[self.findIndex(squareTuple)]
+
+    def save(self, tablePath):
+        temporaryPath = f"{tablePath}.tmp"
+        with open(temporaryPath, "wb") as tableFile:
+            tableFile.write(headerFormat.pack(tablebaseMagic, tablebaseVersion, self.positionCount))
+            tableFile.write(self.whiteToMoveValues)
+            tableFile.write(self.blackToMoveValues)
+        os.replace(temporaryPath, tablePath)
+
+    @classmethod
+    def load(cls, tablePath, materialKey):
+        with open(tablePath, "rb") as tableFile:
+            tableData = tableFile.read()
+        table = cls(materialKey, b"", b"")
+        magic, version, positionCount = headerFormat.unpack_from(tableData, 0) if len(tableData) >= headerFormat.size \
+            else (None, None, None)
+        if magic != tablebaseMagic or version != tablebaseVersion or positionCount != table.positionCount or \
+                len(tableData) != headerFormat.size + 2 * positionCount:
+            raise ValueError(f"Not a {materialKey} tablebase file, or a different version: {tablePath}")
+        table.whiteToMoveValues = tableData[headerFormat.size:headerFormat.size + positionCount]
+        table.blackToMoveValues = tableData[headerFormat.size + positionCount:]
+        return table
+
+
+class TablebaseGenerator:
+    # Retrograde analysis of one material set. Every position where Black is mated is found first. From the
+    # positions Black loses in n plies, unmaking White moves finds the positions White wins in n + 1, and unmaking
+    # Black king moves from those gives the candidates Black loses in n + 2, each confirmed by checking that all of
+    # its moves now lead to a White win. Captures and promotions lead into smaller tables, which must already exist.
+    def __init__(self, materialKey, tableDict):
+        self.table = TablebaseTable(materialKey)
+        self.tableDict = tableDict
+        self.pieceLetterList = self.table.pieceLetterList
+
+    def checkIfAttackedByWhite(self, targetSquare, squareTuple, occupancy, capturedPieceIndex=None):
+        if bitboardBackend.kingAttackList[squareTuple[0]] >> targetSquare & 1:
+            return True
+        for pieceIndex, pieceLetter in enumerate(self.pieceLetterList, 2):
+            if pieceIndex != capturedPieceIndex and \
+                    findPieceAttacks(pieceLetter, squareTuple[pieceIndex], occupancy) >> targetSquare & 1:
+                return True
+        return False
+
+    def findSmallerTableValue(self, pieceLetterList, squareList, isWhiteToMove):
+        # squareList is (White king, Black king, extra pieces...) for the extra pieces in pieceLetterList
+        if checkIfMaterialIsDrawn(pieceLetterList):
+            return drawValue
+        materialKey = buildMaterialKey(pieceLetterList)
+        table = self.tableDict.get(materialKey)
+        if table is None:
+            raise ValueError(f"{self.table.materialKey} needs the {materialKey} tablebase to be generated first")
+        orderedPieceSquares = [square for _, square in sorted(zip(pieceLetterList, squareList[2:]),
+                                                               key=lambda pieceAndSquare: pieceLetterOrder.index(pieceAndSquare[0]))]
+        return table.probeValue(squareList[:2] + orderedPieceSquares, isWhiteToMove)
+
+    def findCaptureValue(self, squareList, capturedPieceIndex, targetSquare):
+        # The value for White to move after the Black king captures on targetSquare
+        return self.findSmallerTableValue(
+            [pieceLetter for pieceIndex, pieceLetter in enumerate(self.pieceLetterList, 2) if pieceIndex != capturedPieceIndex],
+            [squareList[0], targetSquare] + [square for pieceIndex, square in enumerate(squareList[2:], 2) if pieceIndex != capturedPieceIndex],
+            True)
+
+    def findBlackMoves(self, squareList, occupancy):
+        # Yields (target square, captured piece index or None) for every legal Black king move
+        blackKingSquare = squareList[1]
+        occupancyWithoutKing = occupancy & ~(1 << blackKingSquare)
+        whiteKingAttacks = bitboardBackend.kingAttackList[squareList[0]]
+        for targetSquare in kingTargetSquareLists[blackKingSquare]:
+            if whiteKingAttacks >> targetSquare & 1:
+                continue
+            capturedPieceIndex = squareList.index(targetSquare, 2) if occupancy >> targetSquare & 1 else None
+            if not self.checkIfAttackedByWhite(targetSquare, squareList, occupancyWithoutKing, capturedPieceIndex):
+                yield targetSquare, capturedPieceIndex
+
+    def checkIfBlackIsLost(self, positionIndex):
+        # True if Black to move has a legal move and every legal move leads to a White win
+        squareList = self.table.findSquares(positionIndex)
+        occupancy = 0
+        for square in squareList:
+            occupancy |= 1 << square
+        hasLegalMove = False
+        for targetSquare, capturedPieceIndex in self.findBlackMoves(squareList, occupancy):
+            hasLegalMove = True
+            if capturedPieceIndex is None:
+                childValue = self.table.whiteToMoveValues[self.table.findIndex([squareList[0], targetSquare] + squareList[2:])]
+            else:
+                childValue = self.findCaptureValue(squareList, capturedPieceIndex, targetSquare)
+            if childValue == drawValue or childValue == illegalValue:
+                return False
+        return hasLegalMove
+
+    def findWhitePredecessors(self, positionIndex):
+        # Yields the indices of the positions with White to move that reach this one with a White move
+        table = self.table
+        squareList = table.findSquares(positionIndex)
+        blackKingSquare = squareList[1]
+        occupancy = 0
+        for square in squareList:
+            occupancy |= 1 << square
+        for pieceIndex, pieceSquare in enumerate(squareList):
+            if pieceIndex == 1:
+                continue
+            if pieceIndex == 0:
+                originSquareList = [square for square in kingTargetSquareLists[pieceSquare] if not occupancy >> square & 1
+                                    and not bitboardBackend.kingAttackList[blackKingSquare] >> square & 1]
+            elif self.pieceLetterList[pieceIndex - 2] == "P":
+                originSquareList = []
+                if pieceSquare >> 3 >= 2 and not occupancy >> (pieceSquare - 8) & 1:
+                    originSquareList.append(pieceSquare - 8)
+                    if pieceSquare >> 3 == 3 and not occupancy >> (pieceSquare - 16) & 1:
+                        originSquareList.append(pieceSquare - 16)
+            else:
+                originAttacks = findPieceAttacks(self.pieceLetterList[pieceIndex - 2], pieceSquare, occupancy & ~(1 << pieceSquare))
+                originSquareList = bitboardBackend.findSquaresInBitboard(originAttacks & ~occupancy)
+            for originSquare in originSquareList:
+                predecessorSquareList = squareList[:]
+                predecessorSquareList[pieceIndex] = originSquare
+                predecessorOccupancy = occupancy & ~(1 << pieceSquare) | (1 << originSquare)
+                # Black can not be in check with White to move
+                if not self.checkIfAttackedByWhite(blackKingSquare, predecessorSquareList, predecessorOccupancy):
+                    yield table.findIndex(predecessorSquareList)
+
+    def findBlackPredecessors(self, positionIndex):
+        # Yields the indices of the positions with Black to move that reach this one with a Black king move
+        table = self.table
+        squareList = table.findSquares(positionIndex)
+        occupancy = 0
+        for square in squareList:
+            occupancy |= 1 << square
+        whiteKingAttacks = bitboardBackend.kingAttackList[squareList[0]]
+        for originSquare in kingTargetSquareLists[squareList[1]]:
+            if not occupancy >> originSquare & 1 and not whiteKingAttacks >> originSquare & 1:
+                yield table.findIndex([squareList[0], originSquare] + squareList[2:])
+
+    def generate(self):
+        table = self.table
+        whiteToMoveValues = table.whiteToMoveValues
+        blackToMoveValues = table.blackToMoveValues
+        pieceSquareCount = table.squareCount - 2
+        pawnIndexList = [pieceIndex for pieceIndex, pieceLetter in enumerate(self.pieceLetterList, 2) if pieceLetter == "P"]
+        blackLostList = []
+        # White wins found by promoting, and Black positions with a capture into a lost smaller ending, keyed by the
+        # plies to mate at which they have to be looked at again
+        promotionWinDict = {}
+        captureRecheckDict = {}
+
+        positionIndex = 0
+        for whiteKingSquare in table.kingSquareList:
+            whiteKingAttacks = bitboardBackend.kingAttackList[whiteKingSquare]
+            for otherSquares in itertools.product(range(64), repeat=pieceSquareCount + 1):
+                squareList = [whiteKingSquare, *otherSquares]
+                occupancy = 0
+                for square in squareList:
+                    occupancy |= 1 << square
+                if bin(occupancy).count("1") != len(squareList) or whiteKingAttacks >> otherSquares[0] & 1 or \
+                        any(squareList[pieceIndex] >> 3 in (0, 7) for pieceIndex in pawnIndexList) or \
+                        (whiteKingSquare >> 3 == whiteKingSquare & 7 and table.findIndex(squareList) != positionIndex):
+                    whiteToMoveValues[positionIndex] = blackToMoveValues[positionIndex] = illegalValue
+                    positionIndex += 1
+                    continue
+
+                blackKingSquare = otherSquares[0]
+                isBlackInCheck = self.checkIfAttackedByWhite(blackKingSquare, squareList, occupancy)
+                if isBlackInCheck:
+                    whiteToMoveValues[positionIndex] = illegalValue
+
+                hasLegalMove = False
+                worstCaptureValue = 0
+                for targetSquare, capturedPieceIndex in self.findBlackMoves(squareList, occupancy):
+                    hasLegalMove = True
+                    if capturedPieceIndex is not None:
+                        captureValue = self.findCaptureValue(squareList, capturedPieceIndex, targetSquare)
+                        worstCaptureValue = max(worstCaptureValue, captureValue) if captureValue != drawValue else illegalValue
+                if not hasLegalMove and isBlackInCheck:
+                    blackToMoveValues[positionIndex] = 1
+                    blackLostList.append(positionIndex)
+                elif drawValue < worstCaptureValue < illegalValue:
+                    captureRecheckDict.setdefault(worstCaptureValue, []).append(positionIndex)
+
+                if not isBlackInCheck:
+                    bestPromotionValue = illegalValue
+                    for pieceIndex in pawnIndexList:
+                        pawnSquare = squareList[pieceIndex]
+                        if pawnSquare >> 3 != 6 or occupancy >> (pawnSquare + 8) & 1:
+                            continue
+                        for promotionLetter in "QRBN":
+                            promotionLetterList = self.pieceLetterList[:]
+                            promotionLetterList[pieceIndex - 2] = promotionLetter
+                            promotionSquareList = squareList[:]
+                            promotionSquareList[pieceIndex] = pawnSquare + 8
+                            promotionValue = self.findSmallerTableValue(promotionLetterList, promotionSquareList, False)
+                            # Black being mated after the promotion
+                            if drawValue < promotionValue < illegalValue and (promotionValue - 1) % 2 == 0:
+                                bestPromotionValue = min(bestPromotionValue, promotionValue + 1)
+                    if bestPromotionValue != illegalValue:
+                        promotionWinDict.setdefault(bestPromotionValue - 1, []).append(positionIndex)
+                positionIndex += 1
+
+        pliesToMate = 0
+        while blackLostList or any(plies > pliesToMate for plies in list(promotionWinDict) + list(captureRecheckDict)):
+            if pliesToMate + 3 >= illegalValue:
+                raise ValueError(f"{table.materialKey} has mates too long to store")
+            whiteWonList = []
+            for positionIndex in blackLostList:
+                for predecessorIndex in self.findWhitePredecessors(positionIndex):
+                    if whiteToMoveValues[predecessorIndex] == drawValue:
+                        whiteToMoveValues[predecessorIndex] = pliesToMate + 2
+                        whiteWonList.append(predecessorIndex)
+            for positionIndex in promotionWinDict.pop(pliesToMate + 1, []):
+                if whiteToMoveValues[positionIndex] == drawValue:
+                    whiteToMoveValues[positionIndex] = pliesToMate + 2
+                    whiteWonList.append(positionIndex)
+
+            candidateIndexSet = set(captureRecheckDict.pop(pliesToMate + 2, []))
+            for positionIndex in whiteWonList:
+                candidateIndexSet.update(self.findBlackPredecessors(positionIndex))
+            blackLostList = [positionIndex for positionIndex in candidateIndexSet
+                             if blackToMoveValues[positionIndex] == drawValue and self.checkIfBlackIsLost(positionIndex)]
+            for positionIndex in blackLostList:
+                blackToMoveValues[positionIndex] = pliesToMate + 3
+            pliesToMate += 2
+        return table
+
+
+def findRequiredMaterialKeys(materialKey):
+    # The smaller tables a capture or promotion can lead to, which have to be generated first
+    pieceLetterList = list(materialKey[1:-1])
+    requiredKeySet = set()
+    for pieceIndex, pieceLetter in enumerate(pieceLetterList):
+        childLetterLists = [pieceLetterList[:pieceIndex] + pieceLetterList[pieceIndex + 1:]]
+        if pieceLetter == "P":
+            childLetterLists += [pieceLetterList[:pieceIndex] + [promotionLetter] + pieceLetterList[pieceIndex + 1:]
+                                 for promotionLetter in "QRBN"]
+        for childLetterList in childLetterLists:
+            if not checkIfMaterialIsDrawn(childLetterList):
+                requiredKeySet.add(buildMaterialKey(childLetterList))
+    return sorted(requiredKeySet)
+
+
+def generateTablebases(materialKeyList=None, directory=defaultTablebaseDirectory):
+    # Generates the tables for materialKeyList and every smaller table they depend on, skipping tables already in
+    # directory. Returns the list of material keys that were generated.
+    os.makedirs(directory, exist_ok=True)
+    tableDict = {}
+    generatedKeyList = []
+
+    def generateWithDependencies(materialKey):
+        if materialKey in tableDict:
+            return
+        for requiredKey in findRequiredMaterialKeys(materialKey):
+            generateWithDependencies(requiredKey)
+        tablePath = os.path.join(directory, f"{materialKey}.tb")
+        if os.path.exists(tablePath):
+            tableDict[materialKey] = TablebaseTable.load(tablePath, materialKey)
+            return
+        logger.info("Generating %s", materialKey)
+        tableDict[materialKey] = TablebaseGenerator(materialKey, tableDict).generate()
+        tableDict[materialKey].save(tablePath)
+        generatedKeyList.append(materialKey)
+
+    for materialKey in materialKeyList or defaultMaterialList:
+        generateWithDependencies(materialKey)
+    return generatedKeyList
+
+
+class EndgameTablebase:
+    # Probes the tables in a directory, loading each one the first time a position with its material is probed
+    def __init__(self, directory=defaultTablebaseDirectory):
+        self.directory = directory
+        self.tableDict = {}
+
+    def findTable(self, materialKey):
+        if materialKey not in self.tableDict:
+            tablePath = os.path.join(self.directory, f"{materialKey}.tb")
+            self.tableDict[materialKey] = TablebaseTable.load(tablePath, materialKey) if os.path.exists(tablePath) else None
+        return self.tableDict[materialKey]
+
+    def probe(self, gameBoard):
+        # Returns (result, plies to mate) for the side to move, with result 1 for a win, 0 for a draw and -1 for a
+        # loss and plies to mate None for a draw. Returns None if the position is not in the tables.
+        if len(gameBoard.pieceList) > maxPieceCount or gameBoard.findCastlingRights():
+            return None
+        pieceListByColor = {"White": [], "Black": []}
+        for chessPiece in gameBoard.pieceList:
+            if not isinstance(chessPiece, gameClasses.KingPiece):
+                pieceListByColor[chessPiece.playerColor].append(chessPiece)
+        if pieceListByColor["White"] and pieceListByColor["Black"]:
+            return None
+        strongerColor = "White" if pieceListByColor["White"] else "Black"
+        pieceLetterList = [chessPiece.notationLetter for chessPiece in pieceListByColor[strongerColor]]
+        if checkIfMaterialIsDrawn(pieceLetterList):
+            return 0, None
+        table = self.findTable(buildMaterialKey(pieceLetterList))
+        if table is None:
+            return None
+
+        # The stronger side plays White in the tables, so a Black stronger side is mirrored onto White's half
+        mirrorMask = 0 if strongerColor == "White" else 56
+        strongerKing, weakerKing = (gameBoard.whiteKing, gameBoard.blackKing) if strongerColor == "White" else \
+            (gameBoard.blackKing, gameBoard.whiteKing)
+        squareList = [gameClasses.squareIndexToBitboardSquareList[kingPiece.squareIndex] ^ mirrorMask
+                      for kingPiece in (strongerKing, weakerKing)]
+        for chessPiece in sorted(pieceListByColor[strongerColor], key=lambda piece: pieceLetterOrder.index(piece.notationLetter)):
+            squareList.append(gameClasses.squareIndexToBitboardSquareList[chessPiece.squareIndex] ^ mirrorMask)
+        tableValue = table.probeValue(squareList, gameBoard.playerToMoveNext == strongerColor)
+        if tableValue == illegalValue:
+            return None
+        if tableValue == drawValue:
+            return 0, None
+        pliesToMate = tableValue - 1
+        return (1 if pliesToMate % 2 else -1), pliesToMate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate endgame tablebases, or look up a position in them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generateParser = subparsers.add_parser("generate")
+    generateParser.add_argument("materialKeys", nargs="*", help=f"like KQK or KBNK, {' '.join(defaultMaterialList)} by default")
+    generateParser.add_argument("--directory", default=defaultTablebaseDirectory)
+    probeParser = subparsers.add_parser("probe")
+    probeParser.add_argument("fen")
+    probeParser.add_argument("--directory", default=defaultTablebaseDirectory)
+    arguments = parser.parse_args()
+
+    if arguments.command == "generate":
+        generatedKeyList = generateTablebases(arguments.materialKeys, arguments.directory)
+        print(f"Generated {' '.join(generatedKeyList) or 'nothing, every table already exists'}")
+        return 0
+
+    gameBoard = gameClasses.GameBoard(fenString=arguments.fen, tablebase=EndgameTablebase(arguments.directory))
+    probeResult = gameBoard.probeTablebase()
+    if probeResult is None:
+        print("Position not in the tablebases")
+    elif probeResult[0] == 0:
+        print("Draw")
+    else:
+        print(f"{'Win' if probeResult[0] == 1 else 'Loss'} for the side to move, mate in {probeResult[1]} plies")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
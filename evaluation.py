@@ -0,0 +1,179 @@
+import bitboardBackend
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Piece values in centipawns, indexed by the bitboard backend's piece type numbers
+pieceValueList = [100, 320, 330, 500, 900, 0]
+
+# Piece-square tables from White's point of view, written as the board is seen from White's side: the first row is
+# rank 8 and the last is rank 1. Black uses the same tables mirrored vertically.
+pawnSquareTable = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0]
+knightSquareTable = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+bishopSquareTable = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+rookSquareTable = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0]
+queenSquareTable = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20]
+kingSquareTable = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20]
+pieceSquareTableList = [pawnSquareTable, knightSquareTable, bishopSquareTable, rookSquareTable, queenSquareTable,
+                        kingSquareTable]
+
+# Material plus piece-square score of a piece on a square, signed so that White's pieces count positively. Indexed by
+# [color][piece type][square], with squares in the bitboard backend's numbering, 0 (a1) to 63 (h8).
+pieceSquareScoreTable = [[[0] * 64 for _ in range(6)] for _ in range(2)]
+for pieceType in range(6):
+    for square in range(64):
+        rankIndex, fileIndex = square >> 3, square & 7
+        pieceSquareScoreTable[bitboardBackend.whiteColor][pieceType][square] = \
+            pieceValueList[pieceType] + pieceSquareTableList[pieceType][8 * (7 - rankIndex) + fileIndex]
+        pieceSquareScoreTable[bitboardBackend.blackColor][pieceType][square] = \
+            -(pieceValueList[pieceType] + pieceSquareTableList[pieceType][8 * rankIndex + fileIndex])
+
+# The same scores indexed by the GameBoard's 10x12 mailbox squares, which is what makeMove updates incrementally
+mailboxPieceSquareScoreTable = [[[0] * 120 for _ in range(6)] for _ in range(2)]
+for color in range(2):
+    for pieceType in range(6):
+        for square in range(64):
+            mailboxPieceSquareScoreTable[color][pieceType][21 + 10 * (square >> 3) + (square & 7)] = \
+                pieceSquareScoreTable[color][pieceType][square]
+
+# Centipawns per square attacked by a knight, bishop, rook or queen
+mobilityWeightList = [0, 4, 3, 2, 1, 0]
+# Centipawns for each attack on a square next to the enemy king, and for each pawn sheltering a castled king
+kingZoneAttackWeight = 8
+pawnShieldWeight = 10
+
+
+def findPieceSquareScore(chessPiece, squareIndex=None):
+    return mailboxPieceSquareScoreTable[chessPiece.colorIndex][chessPiece.pieceType][
+        chessPiece.squareIndex if squareIndex is None else squareIndex]
+
+
+def computeMaterialAndPositionScore(gameBoard):
+    # Recomputes from the piece list what GameBoard.materialAndPositionScore keeps incrementally
+    materialAndPositionScore = 0
+    for chessPiece in gameBoard.pieceList:
+        materialAndPositionScore += findPieceSquareScore(chessPiece)
+    return materialAndPositionScore
+
+
+def evaluateMobilityAndKingSafety(gameBoard):
+    # Returns White's mobility and king safety score minus Black's. Mobility counts the squares each knight, bishop,
+    # rook and queen attacks. Those attacks also count against the enemy king when they land next to it, and a king
+    # still on its first two ranks is rewarded for each pawn directly in front of it while the enemy has a queen.
+    squareList = gameBoard.squareList
+    kingZoneSetByColor = {}
+    for kingPiece in [gameBoard.whiteKing, gameBoard.blackKing]:
+        kingZoneSetByColor[kingPiece.playerColor] = {square for movementRay in kingPiece.movementRayTable[kingPiece.squareIndex]
+                                                     for square in movementRay}
+
+    score = 0
+    for chessPiece in gameBoard.pieceList:
+        mobilityWeight = mobilityWeightList[chessPiece.pieceType]
+        if not mobilityWeight:
+            continue
+        enemyKingZoneSet = kingZoneSetByColor["Black" if chessPiece.playerColor == "White" else "White"]
+        pieceScore = 0
+        for movementRay in chessPiece.movementRayTable[chessPiece.squareIndex]:
+            for square in movementRay:
+                pieceScore += mobilityWeight
+                if square in enemyKingZoneSet:
+                    pieceScore += kingZoneAttackWeight
+                if squareList[square]:
+                    break
+        score += pieceScore if chessPiece.playerColor == "White" else -pieceScore
+
+    for kingPiece, forwardOffset, enemyQueenCount, sign in \
+            [(gameBoard.whiteKing, 10, gameBoard.blackQueenCount, 1), (gameBoard.blackKing, -10, gameBoard.whiteQueenCount, -1)]:
+        homeRankIndex = 0 if forwardOffset > 0 else 7
+        if not enemyQueenCount or abs(kingPiece.squareIndex // 10 - 2 - homeRankIndex) > 1:
+            continue
+        for horizontalOffset in [-1, 0, 1]:
+            shieldPiece = squareList[kingPiece.squareIndex + forwardOffset + horizontalOffset]
+            if shieldPiece and shieldPiece.pieceType == bitboardBackend.pawnType and shieldPiece.playerColor == kingPiece.playerColor:
+                score += sign * pawnShieldWeight
+    return score
+
+
+def evaluatePosition(gameBoard):
+    # Score in centipawns from the point of view of the side to move
+    score = gameBoard.materialAndPositionScore + evaluateMobilityAndKingSafety(gameBoard)
+    return score if gameBoard.playerToMoveNext == "White" else -score
+
+
+def evaluateMany(positionList):
+    # Material and piece-square scores of many positions at once, from the point of view of each side to move.
+    # positionList holds GameBoards or their 32 byte toBinary() encodings. The encodings are decoded with NumPy
+    # array operations, so the only per-position Python work is encoding boards that are passed in as objects.
+    if numpy is None:
+        raise ImportError("evaluateMany needs NumPy")
+    encodedPositionList = [position if isinstance(position, bytes) else position.toBinary() for position in positionList]
+    if not encodedPositionList:
+        return numpy.zeros(0, dtype=numpy.int32)
+    encodedPositionArray = numpy.frombuffer(b"".join(encodedPositionList), dtype=numpy.uint8).reshape(-1, 32)
+
+    # Occupied squares, one row of 64 per position
+    occupancyArray = numpy.unpackbits(encodedPositionArray[:, :8], axis=1, bitorder="little").astype(bool)
+    # The 4 bit piece codes, in the order of the occupied squares
+    packedPieceCodeArray = encodedPositionArray[:, 8:24]
+    pieceCodeArray = numpy.empty((len(encodedPositionList), 32), dtype=numpy.int64)
+    pieceCodeArray[:, 0::2] = packedPieceCodeArray & 15
+    pieceCodeArray[:, 1::2] = packedPieceCodeArray >> 4
+    # The n-th occupied square of a position holds its n-th piece code
+    pieceOrdinalArray = numpy.clip(numpy.cumsum(occupancyArray, axis=1) - 1, 0, 31)
+    squarePieceCodeArray = numpy.take_along_axis(pieceCodeArray, pieceOrdinalArray, axis=1)
+
+    flatScoreArray = numpy.array(pieceSquareScoreTable, dtype=numpy.int32).reshape(12 * 64)
+    scoreIndexArray = squarePieceCodeArray * 64 + numpy.arange(64)
+    scoreArray = numpy.where(occupancyArray, flatScoreArray[scoreIndexArray], 0).sum(axis=1)
+    isBlackToMoveArray = (encodedPositionArray[:, 24] & 1).astype(bool)
+    return numpy.where(isBlackToMoveArray, -scoreArray, scoreArray).astype(numpy.int32)
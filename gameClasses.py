@@ -1,57 +1,164 @@
-import copy
+import logging
+import re
+import struct
+
+import bitboardBackend
+import evaluation
+import instrumentation
+import zobristHashing
+
+logger = logging.getLogger(__name__)
+
+# Squares are stored in a 10x12 mailbox: a1 is square 21 and h8 is square 98. The border is wide enough that a single
+# step or knight jump from any square on the board still lands inside the list, so checking whether a square is on the
+# board is a single lookup. Algebraic positions like "e4" are only used at the GUI and notation edges.
+squareIsOnBoardList = [False] * 120
+squareIndexToPositionList = [None] * 120
+positionToSquareIndexDict = {}
+# The bitboard backend numbers squares 0 (a1) to 63 (h8)
+squareIndexToBitboardSquareList = [None] * 120
+bitboardSquareToSquareIndexList = [None] * 64
+for rankIndex in range(8):
+    for fileIndex in range(8):
+        squareIndex = 21 + 10 * rankIndex + fileIndex
+        position = f"{'abcdefgh'[fileIndex]}{rankIndex + 1}"
+        squareIsOnBoardList[squareIndex] = True
+        squareIndexToPositionList[squareIndex] = position
+        positionToSquareIndexDict[position] = squareIndex
+        squareIndexToBitboardSquareList[squareIndex] = 8 * rankIndex + fileIndex
+        bitboardSquareToSquareIndexList[8 * rankIndex + fileIndex] = squareIndex
+
+
+def convertPositionToSquareIndex(positionToConvert):
+    return positionToSquareIndexDict[positionToConvert]
+
+
+def convertSquareIndexToPosition(squareIndexToConvert):
+    return squareIndexToPositionList[squareIndexToConvert]
+
+
+def convertMoveToCoordinateNotation(chessPiece, legalMove):
+    # Long algebraic notation as used by UCI, like "e2e4" or "a7a8q". The piece must still be on its origin square.
+    moveNotation = chessPiece.position + convertSquareIndexToPosition(legalMove[0])
+    if legalMove[3]:
+        moveNotation += legalMove[3].notationLetter.lower()
+    return moveNotation
+
+
+def convertBinaryToFEN(encodedPosition):
+    # Decodes GameBoard.toBinary's 32 byte encoding
+    if len(encodedPosition) != GameBoard.binaryEncodingFormat.size:
+        raise ValueError(f"Encoded positions are {GameBoard.binaryEncodingFormat.size} bytes, not {len(encodedPosition)}")
+    occupancy, packedPieceCodes, sideAndCastlingRights, enPassantFile, halfmoveClock, fullMoveNumber = \
+        GameBoard.binaryEncodingFormat.unpack(encodedPosition)
+
+    pieceLetterList = [None] * 64
+    pieceCodeIndex = 0
+    for bitboardSquare in bitboardBackend.findSquaresInBitboard(occupancy):
+        pieceCode = (packedPieceCodes[pieceCodeIndex >> 1] >> (4 * (pieceCodeIndex & 1))) & 15
+        if pieceCode >= 12:
+            raise ValueError(f"Invalid piece code in encoded position: {pieceCode}")
+        pieceLetter = GameBoard.pieceClassList[pieceCode % 6].notationLetter
+        pieceLetterList[bitboardSquare] = pieceLetter if pieceCode < 6 else pieceLetter.lower()
+        pieceCodeIndex += 1
+
+    rankStringList = []
+    for rankIndex in range(7, -1, -1):
+        rankString = ""
+        emptySquareCount = 0
+        for pieceLetter in pieceLetterList[8 * rankIndex:8 * rankIndex + 8]:
+            if pieceLetter is None:
+                emptySquareCount += 1
+                continue
+            if emptySquareCount:
+                rankString += str(emptySquareCount)
+                emptySquareCount = 0
+            rankString += pieceLetter
+        if emptySquareCount:
+            rankString += str(emptySquareCount)
+        rankStringList.append(rankString)
+
+    isBlackToMove = sideAndCastlingRights & 1
+    castlingRights = sideAndCastlingRights >> 1
+    castlingString = "".join(castlingLetter for castlingLetter, castlingRight in
+                             [("K", bitboardBackend.whiteKingSideCastle), ("Q", bitboardBackend.whiteQueenSideCastle),
+                              ("k", bitboardBackend.blackKingSideCastle), ("q", bitboardBackend.blackQueenSideCastle)]
+                             if castlingRights & castlingRight) or "-"
+    enPassantTarget = f"{'abcdefgh'[enPassantFile - 1]}{3 if isBlackToMove else 6}" if 0 < enPassantFile <= 8 else "-"
+    return f"{'/'.join(rankStringList)} {'b' if isBlackToMove else 'w'} {castlingString} {enPassantTarget} " \
+           f"{halfmoveClock} {fullMoveNumber}"
+
+
+def findFileIndexOfSquare(squareIndexToCheck):
+    return squareIndexToCheck % 10 - 1
+
+
+def findRankIndexOfSquare(squareIndexToCheck):
+    return squareIndexToCheck // 10 - 2
+
+
+def convertMovementPatternListsToOffsets(movementPatternLists):
+    return [[horizontalAmountOfSquares + 10 * verticalAmountOfSquares
+             for horizontalAmountOfSquares, verticalAmountOfSquares in movementPatternList]
+            for movementPatternList in movementPatternLists]
+
+
+def buildMovementRayTable(movementOffsetLists):
+    # For every mailbox square, the squares along each line of movement up to the edge of the board. Lines that leave
+    # the board straight away are left out, so walking a ray never needs an on-board check.
+    movementRayTable = [()] * 120
+    for squareIndex in range(120):
+        if not squareIsOnBoardList[squareIndex]:
+            continue
+        movementRayList = []
+        for movementOffsetList in movementOffsetLists:
+            movementRay = []
+            for movementOffset in movementOffsetList:
+                if not squareIsOnBoardList[squareIndex + movementOffset]:
+                    break
+                movementRay.append(squareIndex + movementOffset)
+            if movementRay:
+                movementRayList.append(tuple(movementRay))
+        movementRayTable[squareIndex] = tuple(movementRayList)
+    return tuple(movementRayTable)
+
 
 class ChessPiece:
+    # Pieces have no instance __dict__. Movement patterns, offsets and rays are shared per piece class.
+    __slots__ = ("squareIndex", "gameBoard", "playerColor", "colorIndex", "isAtStartingPosition",
+                 "positionsBeingAttackedByPiece")
     horizontalSquareOrderList = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
+    movementOffsetLists = None
+    movementRayTable = None
 
-    def __init__(self, startPosition, gameBoard, playerColor, movementPatternLists):
-        self.position = startPosition
+    def __init__(self, startPosition, gameBoard, playerColor):
+        self.squareIndex = convertPositionToSquareIndex(startPosition)
         self.gameBoard = gameBoard
         self.playerColor = playerColor
-        # Movement patterns are organized in a list of lists. The nested lists are a line of movement, like all of a Rook's
-        # movement along one file in one direction. A rook would have 4 nested lists. A queen would have 8.
-        self.movementPatternLists = movementPatternLists
-        self.gameBoard.positionMap[self.position] = self
+        # The bitboard backend's color number, used for hashing
+        self.colorIndex = bitboardBackend.whiteColor if playerColor == "White" else bitboardBackend.blackColor
+        self.isAtStartingPosition = True
+        self.gameBoard.squareList[self.squareIndex] = self
         self.positionsBeingAttackedByPiece = []
 
-    def movePiece(self, positionToMoveTo, pieceCollidedWith=False, castlingMove=False):
-        self.gameBoard.whiteInCheck = False
-        self.gameBoard.blackInCheck = False
-        self.isAtStartingPosition = False
-        self.gameBoard.pawnMovedDoubleLastTurn = False
-        originalPosition = self.position if isinstance(self, PawnPiece) and pieceCollidedWith else False
+    def findHashKey(self, squareIndex=None):
+        if squareIndex is None:
+            squareIndex = self.squareIndex
+        return zobristHashing.pieceSquareKeyLists[self.colorIndex][self.pieceType][squareIndexToBitboardSquareList[squareIndex]]
 
-        if isinstance(self, PawnPiece):
-            if abs(int(self.position[1]) - int(positionToMoveTo[1])) == 2:
-                self.gameBoard.pawnMovedDoubleLastTurn = self
+    @property
+    def position(self):
+        return squareIndexToPositionList[self.squareIndex]
 
-        if castlingMove:
-            self.gameBoard.positionMap[castlingMove] = pieceCollidedWith
-            pieceCollidedWith.position = castlingMove
-        elif pieceCollidedWith:
-            self.gameBoard.pieceList.remove(pieceCollidedWith)
-            self.gameBoard.updatePieceCounters(pieceCollidedWith)
-        del(self.gameBoard.positionMap[self.position])
-        self.gameBoard.positionMap[positionToMoveTo] = self
-        self.position = positionToMoveTo
-
-        if isinstance(self, PawnPiece):
-            promotionRank = "8" if self.playerColor == "White" else "1"
-            if self.position[1] == promotionRank:
-                self.promotePawn()
-                if self.playerColor == "White":
-                    self.gameBoard.whiteQueenCount += 1
-                else:
-                    self.gameBoard.blackQueenCount += 1
+    @position.setter
+    def position(self, positionToMoveTo):
+        self.squareIndex = convertPositionToSquareIndex(positionToMoveTo)
 
-        oppositeKing = (self.gameBoard.blackKing if self.playerColor == "White" else self.gameBoard.whiteKing)
-        if oppositeKing.checkIfInCheck():
-           if self.playerColor == "White":
-               self.gameBoard.blackInCheck = True
-           else:
-               self.gameBoard.whiteInCheck = True
+    def movePiece(self, squareToMoveTo, pieceCollidedWith=False, castlingMove=False, promotionPiece=False):
+        originalPosition = self.position if isinstance(self, PawnPiece) and pieceCollidedWith else False
 
-        for chessPiece in self.gameBoard.pieceList:
-            chessPiece.positionsBeingAttackedByPiece = chessPiece.findPotentialMoves()
+        undoRecord = self.gameBoard.makeMove(self, (squareToMoveTo, pieceCollidedWith, castlingMove, promotionPiece), updateCheckFlags=False)
+        self.gameBoard.updateAfterMove(undoRecord)
 
         if self.gameBoard.checkIfDraw():
             self.gameBoard.isDraw = True
@@ -71,261 +178,168 @@ class ChessPiece:
                 if self.gameBoard.checkIfStalemate("White"):
                     self.gameBoard.isDraw = True
 
-        self.gameBoard.addMoveToMoveList(self, (positionToMoveTo, pieceCollidedWith, castlingMove), originalPosition=originalPosition)
-        print(self.gameBoard.moveList)
+        self.gameBoard.addMoveToMoveList(self, (squareToMoveTo, pieceCollidedWith, castlingMove, promotionPiece), originalPosition=originalPosition)
+        logger.debug("Move list: %s", self.gameBoard.moveList)
 
-        if pieceCollidedWith or isinstance(self, PawnPiece):
-            self.gameBoard.movesSinceLastCaptureOrPawnMove = 0
-        else:
-            self.gameBoard.movesSinceLastCaptureOrPawnMove += 1
         if self.gameBoard.movesSinceLastCaptureOrPawnMove >= 100:
             self.gameBoard.isDraw = True
 
         return
 
-    def checkCollisionWithOtherPiece(self, positionToCheck):
-        for chessPiece in self.gameBoard.pieceList:
-            if chessPiece.position == positionToCheck:
-                return chessPiece
-        return False
-
-    def findNewPositionAfterMovement(self, horizontalAmountOfSquares, verticalAmountOfSquares, startPosition=None):
-        if startPosition is None:
-            startPosition = self.position
-        xPosition = startPosition[0]
-        xPositionIndex = ChessPiece.horizontalSquareOrderList.index(xPosition)
-        xPositionIndex += horizontalAmountOfSquares
-        if xPositionIndex > 7 or xPositionIndex < 0:
-            return False
-        xPosition = ChessPiece.horizontalSquareOrderList[xPositionIndex]
-
-        yPosition = int(startPosition[1])
-        yPosition += verticalAmountOfSquares
-        if yPosition > 8 or yPosition < 1:
-            return False
-
-        return f"{xPosition}{yPosition}"
-
-    def findPotentialMoves(self, startPosition=None, checkIfInCheck=True):
-        if startPosition is None:
-            startPosition = self.position
-        potentialMoveList = []
-        for movementPatternList in self.movementPatternLists:
-            for movementPattern in movementPatternList:
-                potentialMove = self.findNewPositionAfterMovement(movementPattern[0], movementPattern[1], startPosition=startPosition)
-                if potentialMove:
-                    collidedPiece = self.checkCollisionWithOtherPiece(potentialMove)
-                    if collidedPiece:
-                        if self.playerColor == collidedPiece.playerColor:
-                            break
-                        kingToCheck = (self.gameBoard.whiteKing if self.playerColor == "White" else self.gameBoard.blackKing)
-                        if kingToCheck.checkIfInCheckAfterMove(self, (potentialMove, collidedPiece)):
-                            break
-                        else:
-                            potentialMoveList.append((potentialMove, collidedPiece, False))
-                            break
-                    else:
-                        kingToCheck = (self.gameBoard.whiteKing if self.playerColor == "White" else self.gameBoard.blackKing)
-                        if kingToCheck.checkIfInCheckAfterMove(self, (potentialMove, collidedPiece)):
-                            continue
-                        else:
-                            potentialMoveList.append((potentialMove, collidedPiece, False))
-                else:
+    def checkCollisionWithOtherPiece(self, squareToCheck):
+        return self.gameBoard.squareList[squareToCheck] or False
+
+    def findAttackedSquares(self):
+        # Squares this piece attacks or defends, ignoring whether moving there would be legal
+        squareList = self.gameBoard.squareList
+        attackedSquareSet = set()
+        for movementRay in self.movementRayTable[self.squareIndex]:
+            for square in movementRay:
+                attackedSquareSet.add(square)
+                if squareList[square]:
                     break
-
-        # Check if castling is a potential move
-        if isinstance(self, KingPiece) and \
-                self.isAtStartingPosition and \
-                not (self.gameBoard.whiteInCheck if self.playerColor == "White" else self.gameBoard.blackInCheck):
-            for chessPiece in self.gameBoard.pieceList:
-                if isinstance(chessPiece, RookPiece) and \
-                        chessPiece.playerColor == self.playerColor and \
-                        chessPiece.isAtStartingPosition:
-
-                    canCastle = True
-                    castleRank = "1" if self.playerColor == "White" else "8"
-                    if chessPiece.position[0] == 'a':
-                        positionsToCheck = [f"c{castleRank}", f"d{castleRank}"]
-                        # For queen-side castling, the b-file must be checked for a piece, but not for attacking pieces
-                        positionToCheckForCollision = [f"b{castleRank}"]
-                        kingPositionAfterCastle = f"c{castleRank}"
-                        rookPositionAfterCastle = f"d{castleRank}"
-                    elif chessPiece.position[0] == 'h':
-                        positionsToCheck = [f"f{castleRank}", f"g{castleRank}"]
-                        positionToCheckForCollision = []
-                        kingPositionAfterCastle = f"g{castleRank}"
-                        rookPositionAfterCastle = f"f{castleRank}"
-
-                    for position in positionsToCheck:
-                        for piece in self.gameBoard.pieceList:
-                            if piece.position == position:
-                                canCastle = False
-                            if position in piece.positionsBeingAttackedByPiece:
-                                canCastle = False
-                    for position in positionToCheckForCollision:
-                        if piece.position == position:
-                            canCastle = False
-
-                    if canCastle:
-                        potentialMoveList.append((kingPositionAfterCastle, chessPiece, rookPositionAfterCastle))
-
-
-        return potentialMoveList
+        return attackedSquareSet
+
+    def findPotentialMoves(self):
+        # This piece's legal moves
+        return [legalMove for _, legalMove in self.gameBoard.findLegalMovesOfPieces(self.playerColor, [self])]
+
+    def findPseudoLegalMoves(self):
+        # Moves along the piece's rays that do not land on a friendly piece, before the king's safety is considered
+        squareList = self.gameBoard.squareList
+        playerColor = self.playerColor
+        pseudoLegalMoveList = []
+        for movementRay in self.movementRayTable[self.squareIndex]:
+            for potentialMove in movementRay:
+                collidedPiece = squareList[potentialMove]
+                if collidedPiece:
+                    if collidedPiece.playerColor != playerColor:
+                        pseudoLegalMoveList.append((potentialMove, collidedPiece, False, False))
+                    break
+                pseudoLegalMoveList.append((potentialMove, False, False, False))
+        return pseudoLegalMoveList
 
 
 class PawnPiece(ChessPiece):
-    def __init__(self, startPosition, gameBoard, playerColor):
-        super(PawnPiece, self).__init__(startPosition, gameBoard, playerColor, None)
-        self.isAtStartingPosition = True
+    __slots__ = ()
+    pieceType = bitboardBackend.pawnType
+    notationLetter = "P"
+    # The squares a pawn of each color attacks from every square
+    captureSquareTableByColor = {playerColor: tuple(tuple(movementRay[0] for movementRay in movementRayList)
+                                                    for movementRayList in buildMovementRayTable(captureOffsetLists))
+                                 for playerColor, captureOffsetLists in [("White", [[9], [11]]), ("Black", [[-11], [-9]])]}
 
-    def findPotentialMoves(self, startPosition=None, checkIfInCheck=True):
-        if startPosition is None:
-            startPosition = self.position
-
-        potentialMoveList = []
-        if self.playerColor == "White":
-            forwardDirection = 1
+    def __init__(self, startPosition, gameBoard, playerColor):
+        super(PawnPiece, self).__init__(startPosition, gameBoard, playerColor)
+
+    def findPseudoLegalMoves(self):
+        startSquare = self.squareIndex
+        squareList = self.gameBoard.squareList
+        forwardOffset = 10 if self.playerColor == "White" else -10
+        pseudoLegalMoveList = []
+
+        potentialMove = startSquare + forwardOffset
+        if not squareList[potentialMove]:
+            self.appendPawnMove(pseudoLegalMoveList, potentialMove, False)
+            if self.isAtStartingPosition and not squareList[potentialMove + forwardOffset]:
+                pseudoLegalMoveList.append((potentialMove + forwardOffset, False, False, False))
+
+        for potentialMove in PawnPiece.captureSquareTableByColor[self.playerColor][startSquare]:
+            collidedPiece = squareList[potentialMove]
+            if collidedPiece and collidedPiece.playerColor != self.playerColor:
+                self.appendPawnMove(pseudoLegalMoveList, potentialMove, collidedPiece)
+
+        pawnMovedDoubleLastTurn = self.gameBoard.pawnMovedDoubleLastTurn
+        if pawnMovedDoubleLastTurn and pawnMovedDoubleLastTurn.playerColor != self.playerColor:
+            # The mailbox border keeps the a- and h-files from wrapping onto each other
+            if abs(pawnMovedDoubleLastTurn.squareIndex - startSquare) == 1:
+                pseudoLegalMoveList.append((pawnMovedDoubleLastTurn.squareIndex + forwardOffset, pawnMovedDoubleLastTurn, False, False))
+
+        return pseudoLegalMoveList
+
+    def findAttackedSquares(self):
+        return set(PawnPiece.captureSquareTableByColor[self.playerColor][self.squareIndex])
+
+    def appendPawnMove(self, potentialMoveList, squareToMoveTo, pieceCollidedWith):
+        # A pawn reaching the last rank may promote to any of these, so each choice is a separate move
+        if findRankIndexOfSquare(squareToMoveTo) in [0, 7]:
+            for promotionPiece in [QueenPiece, RookPiece, BishopPiece, KnightPiece]:
+                potentialMoveList.append((squareToMoveTo, pieceCollidedWith, False, promotionPiece))
         else:
-            forwardDirection = -1
-        potentialMove = self.findNewPositionAfterMovement(0, 1 * forwardDirection, startPosition=startPosition)
-        if potentialMove:
-            isCollision = self.checkCollisionWithOtherPiece(potentialMove)
-            if not isCollision:
-                kingToCheck = (self.gameBoard.whiteKing if self.playerColor == "White" else self.gameBoard.blackKing)
-                if kingToCheck.checkIfInCheckAfterMove(self, (potentialMove, isCollision)):
-                    pass
-                else:
-                    potentialMoveList.append((potentialMove, isCollision, False))
-
-                if self.isAtStartingPosition:
-                    potentialMove = self.findNewPositionAfterMovement(0, 2 * forwardDirection, startPosition=startPosition)
-                    if potentialMove:
-                        isCollision = self.checkCollisionWithOtherPiece(potentialMove)
-                        if not isCollision:
-                            kingToCheck = (self.gameBoard.whiteKing if self.playerColor == "White" else self.gameBoard.blackKing)
-                            if kingToCheck.checkIfInCheckAfterMove(self, (potentialMove, isCollision)):
-                                pass
-                            else:
-                                potentialMoveList.append((potentialMove, isCollision, False))
-
-        for horizontalSquaresAwayFromPosition in [-1, 1]:
-            potentialMove = self.findNewPositionAfterMovement(horizontalSquaresAwayFromPosition, 1 * forwardDirection, startPosition=startPosition)
-            if potentialMove:
-                isCollision = self.checkCollisionWithOtherPiece(potentialMove)
-                if isCollision:
-                    if self.playerColor == isCollision.playerColor:
-                        continue
-                    kingToCheck = (self.gameBoard.whiteKing if self.playerColor == "White" else self.gameBoard.blackKing)
-                    if kingToCheck.checkIfInCheckAfterMove(self, (potentialMove, isCollision)):
-                        continue
-                    else:
-                        potentialMoveList.append((potentialMove, isCollision, False))
-
-        if self.gameBoard.pawnMovedDoubleLastTurn:
-            positionOfDoubleMovedPawn = self.gameBoard.pawnMovedDoubleLastTurn.position
-            indexOfFile = ChessPiece.horizontalSquareOrderList.index(positionOfDoubleMovedPawn[0])
-            for horizontalSquaresAwayFromPosition in [-1, 1]:
-                if f"{ChessPiece.horizontalSquareOrderList[indexOfFile - horizontalSquaresAwayFromPosition]}{positionOfDoubleMovedPawn[1]}" == self.position:
-                    potentialMove = self.findNewPositionAfterMovement(horizontalSquaresAwayFromPosition,
-                                                                  1 * forwardDirection, startPosition=startPosition)
-                    potentialMoveList.append((potentialMove, self.gameBoard.pawnMovedDoubleLastTurn, False))
-
-        return potentialMoveList
+            potentialMoveList.append((squareToMoveTo, pieceCollidedWith, False, False))
 
-    def promotePawn(self):
+    def promotePawn(self, promotionPiece=False):
+        if not promotionPiece:
+            promotionPiece = QueenPiece
+        promotedPiece = promotionPiece(self.position, self.gameBoard, self.playerColor)
         self.gameBoard.pieceList.remove(self)
-        self.gameBoard.pieceList.append(QueenPiece(self.position, self.gameBoard, self.playerColor))
+        self.gameBoard.pieceList.append(promotedPiece)
 
-        return
+        return promotedPiece
 
 
 class KingPiece(ChessPiece):
+    __slots__ = ()
+    pieceType = bitboardBackend.kingType
+    notationLetter = "K"
     movementPattern = [[(0, 1)], [(1, 1)], [(1, 0)], [(1, -1)],
                         [(0, -1)], [(-1, -1)], [(-1, 0)], [(-1, 1)]]
 
-    def __init__(self, startPosition, gameBoard, playerColor):
-        super(KingPiece, self).__init__(startPosition, gameBoard, playerColor, KingPiece.movementPattern)
-        self.isAtStartingPosition = True
-
-    def checkIfInCheck(self):
-        for movementPattern in QueenPiece.movementPattern:
-            collidedPiece = self.checkIfCollisionAlongMovementPattern(self.position, movementPattern)
-            if isinstance(collidedPiece, QueenPiece):
-                return True
-        for movementPattern in RookPiece.movementPattern:
-            collidedPiece = self.checkIfCollisionAlongMovementPattern(self.position, movementPattern)
-            if isinstance(collidedPiece, RookPiece):
-                return True
-        for movementPattern in BishopPiece.movementPattern:
-            collidedPiece = self.checkIfCollisionAlongMovementPattern(self.position, movementPattern)
-            if isinstance(collidedPiece, BishopPiece):
-                return True
-        for movementPattern in KnightPiece.movementPattern:
-            collidedPiece = self.checkIfCollisionAlongMovementPattern(self.position, movementPattern)
-            if isinstance(collidedPiece, KnightPiece):
-                return True
-        for movementPattern in KingPiece.movementPattern:
-            collidedPiece = self.checkIfCollisionAlongMovementPattern(self.position, movementPattern)
-            if isinstance(collidedPiece, KingPiece):
-                return True
-        if self.playerColor == "White":
-            for movementPattern in [[(-1, 1)], [(1, 1)]]:
-                collidedPiece = self.checkIfCollisionAlongMovementPattern(self.position, movementPattern)
-                if isinstance(collidedPiece, PawnPiece):
-                    return True
-        else:
-            for movementPattern in [[(-1, -1)], [(1, -1)]]:
-                collidedPiece = self.checkIfCollisionAlongMovementPattern(self.position, movementPattern)
-                if isinstance(collidedPiece, PawnPiece):
-                    return True
-
-    def checkIfCollisionAlongMovementPattern(self, startPosition, movementPattern):
-        horizontalPosition = ChessPiece.horizontalSquareOrderList.index(startPosition[0])
-        verticalPosition = int(startPosition[1])
-
-        for move in movementPattern:
-            horizontalPositionToCheck = horizontalPosition + move[0]
-            verticalPositionToCheck = verticalPosition + move[1]
-            if horizontalPositionToCheck < 0 or \
-                horizontalPositionToCheck > 7 or \
-                verticalPositionToCheck < 1 or \
-                verticalPositionToCheck > 8:
-                break
-            positionToCheck = f"{ChessPiece.horizontalSquareOrderList[horizontalPositionToCheck]}{verticalPositionToCheck}"
-            for piece in self.gameBoard.pieceList:
-                if piece.position == positionToCheck:
-                    if piece.playerColor != self.playerColor:
-                        return piece
-                    return False
+    movementOffsetLists = convertMovementPatternListsToOffsets(movementPattern)
+    movementRayTable = buildMovementRayTable(movementOffsetLists)
 
-        return False
+    def __init__(self, startPosition, gameBoard, playerColor):
+        super(KingPiece, self).__init__(startPosition, gameBoard, playerColor)
+
+    def findCastlingMoves(self):
+        # Castling moves, assuming the king is not in check. The king may not pass through or land on an attacked
+        # square, and every square between the king and rook must be empty.
+        castlingMoveList = []
+        if not self.isAtStartingPosition:
+            return castlingMoveList
+        squareList = self.gameBoard.squareList
+        enemyColor = "Black" if self.playerColor == "White" else "White"
+        castleRankSquare = 21 if self.playerColor == "White" else 91
+        # Rook square, squares the king crosses, other squares that must be empty, king and rook squares afterwards
+        for rookSquare, squaresToCheck, squareToCheckForCollision, kingSquareAfterCastle, rookSquareAfterCastle in \
+                [(castleRankSquare, [castleRankSquare + 2, castleRankSquare + 3], [castleRankSquare + 1],
+                  castleRankSquare + 2, castleRankSquare + 3),
+                 (castleRankSquare + 7, [castleRankSquare + 5, castleRankSquare + 6], [],
+                  castleRankSquare + 6, castleRankSquare + 5)]:
+            rookPiece = squareList[rookSquare]
+            if not isinstance(rookPiece, RookPiece) or rookPiece.playerColor != self.playerColor or \
+                    not rookPiece.isAtStartingPosition:
+                continue
+            canCastle = True
+            for square in squaresToCheck:
+                if squareList[square] or self.gameBoard.isSquareAttacked(square, enemyColor):
+                    canCastle = False
+            for square in squareToCheckForCollision:
+                if squareList[square]:
+                    canCastle = False
+            if canCastle:
+                castlingMoveList.append((kingSquareAfterCastle, rookPiece, rookSquareAfterCastle, False))
+        return castlingMoveList
+
+    def checkIfInCheck(self, squareToCheck=None):
+        # Checking a square other than the king's own tells whether the king would be attacked there, which is
+        # what castling needs for the squares the king passes through
+        if squareToCheck is None:
+            squareToCheck = self.squareIndex
+        return self.gameBoard.isSquareAttacked(squareToCheck, "Black" if self.playerColor == "White" else "White")
 
     def checkIfInCheckAfterMove(self, pieceToMove, potentialMove):
-        gameBoard = copy.deepcopy(self.gameBoard)
-        pieceList = gameBoard.pieceList
-        collidedPiece = False
-        for chessPiece in pieceList:
-            if chessPiece.position == pieceToMove.position:
-                pieceToMove = chessPiece
-            if potentialMove[1]:
-                if chessPiece.position == potentialMove[1].position:
-                    collidedPiece = chessPiece
-
-        if collidedPiece:
-            pieceList.remove(collidedPiece)
-        pieceToMove.position = potentialMove[0]
-
-        if self.playerColor == "White":
-            kingPiece = gameBoard.whiteKing
-        else:
-            kingPiece = gameBoard.blackKing
-
-        result = kingPiece.checkIfInCheck()
+        undoRecord = self.gameBoard.makeMove(pieceToMove, potentialMove, updateCheckFlags=False)
+        result = self.checkIfInCheck()
+        self.gameBoard.unmakeMove(undoRecord)
 
         return result
 
 
 class KnightPiece(ChessPiece):
+    __slots__ = ()
+    pieceType = bitboardBackend.knightType
+    notationLetter = "N"
     movementPattern = [[(1, 2)],
                          [(2, 1)],
                          [(2, -1)],
@@ -334,32 +348,47 @@ class KnightPiece(ChessPiece):
                          [(-2, -1)],
                          [(-2, 1)],
                          [(-1, 2)]]
+    movementOffsetLists = convertMovementPatternListsToOffsets(movementPattern)
+    movementRayTable = buildMovementRayTable(movementOffsetLists)
+
     def __init__(self, startPosition, gameBoard, playerColor):
-        super(KnightPiece, self).__init__(startPosition, gameBoard, playerColor, KnightPiece.movementPattern)
-        self.isAtStartingPosition = True
+        super(KnightPiece, self).__init__(startPosition, gameBoard, playerColor)
 
 
 class BishopPiece(ChessPiece):
+    __slots__ = ()
+    pieceType = bitboardBackend.bishopType
+    notationLetter = "B"
     movementPattern = [[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7)],
                      [(1, -1), (2, -2), (3, -3), (4, -4), (5, -5), (6, -6), (7, -7)],
                      [(-1, -1), (-2, -2), (-3, -3), (-4, -4), (-5, -5), (-6, -6), (-7, -7)],
                      [(-1, 1), (-2, 2), (-3, 3), (-4, 4), (-5, 5), (-6, 6), (-7, 7)]]
+    movementOffsetLists = convertMovementPatternListsToOffsets(movementPattern)
+    movementRayTable = buildMovementRayTable(movementOffsetLists)
+
     def __init__(self, startPosition, gameBoard, playerColor):
-        super(BishopPiece, self).__init__(startPosition, gameBoard, playerColor, BishopPiece.movementPattern)
-        self.isAtStartingPosition = True
+        super(BishopPiece, self).__init__(startPosition, gameBoard, playerColor)
 
 
 class RookPiece(ChessPiece):
+    __slots__ = ()
+    pieceType = bitboardBackend.rookType
+    notationLetter = "R"
     movementPattern = [[(0, 1), (0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7)],
                      [(1, 0), (2, 0), (3, 0), (4, 0), (5, 0), (6, 0), (7, 0)],
                      [(0, -1), (0, -2), (0, -3), (0, -4), (0, -5), (0, -6), (0, -7)],
                      [(-1, 0), (-2, 0), (-3, 0), (-4, 0), (-5, 0), (-6, 0), (-7, 0)]]
+    movementOffsetLists = convertMovementPatternListsToOffsets(movementPattern)
+    movementRayTable = buildMovementRayTable(movementOffsetLists)
+
     def __init__(self, startPosition, gameBoard, playerColor):
-        super(RookPiece, self).__init__(startPosition, gameBoard, playerColor, RookPiece.movementPattern)
-        self.isAtStartingPosition = True
+        super(RookPiece, self).__init__(startPosition, gameBoard, playerColor)
 
 
 class QueenPiece(ChessPiece):
+    __slots__ = ()
+    pieceType = bitboardBackend.queenType
+    notationLetter = "Q"
     movementPattern = [[(0, 1), (0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7)],
                      [(1, 0), (2, 0), (3, 0), (4, 0), (5, 0), (6, 0), (7, 0)],
                      [(0, -1), (0, -2), (0, -3), (0, -4), (0, -5), (0, -6), (0, -7)],
@@ -368,99 +397,785 @@ class QueenPiece(ChessPiece):
                      [(1, -1), (2, -2), (3, -3), (4, -4), (5, -5), (6, -6), (7, -7)],
                      [(-1, -1), (-2, -2), (-3, -3), (-4, -4), (-5, -5), (-6, -6), (-7, -7)],
                      [(-1, 1), (-2, 2), (-3, 3), (-4, 4), (-5, 5), (-6, 6),  (-7, 7)]]
+    movementOffsetLists = convertMovementPatternListsToOffsets(movementPattern)
+    movementRayTable = buildMovementRayTable(movementOffsetLists)
+
     def __init__(self, startPosition, gameBoard, playerColor):
-        super(QueenPiece, self).__init__(startPosition, gameBoard, playerColor, QueenPiece.movementPattern)
-        self.isAtStartingPosition = True
+        super(QueenPiece, self).__init__(startPosition, gameBoard, playerColor)
+
+
+# Attack tables for GameBoard.isSquareAttacked. Each slider ray out from a square is paired with the piece types that
+# attack along it, so every direction is walked once. Leapers are a fixed list of squares per square.
+slidingAttackRayTable = tuple(tuple([(movementRay, frozenset([RookPiece.pieceType, QueenPiece.pieceType]))
+                                     for movementRay in RookPiece.movementRayTable[squareIndex]] +
+                                    [(movementRay, frozenset([BishopPiece.pieceType, QueenPiece.pieceType]))
+                                     for movementRay in BishopPiece.movementRayTable[squareIndex]])
+                              for squareIndex in range(120))
+knightAttackSquareTable = tuple(tuple(movementRay[0] for movementRay in movementRayList)
+                                for movementRayList in KnightPiece.movementRayTable)
+kingAttackSquareTable = tuple(tuple(movementRay[0] for movementRay in movementRayList)
+                              for movementRayList in KingPiece.movementRayTable)
 
 
 class GameBoard:
-    def __init__(self):
+    backendList = ["object", "bitboard"]
+    # The packed binary encoding is 32 bytes: the occupied squares as a bitboard, a 4 bit piece code (color * 6 + piece
+    # type) for each occupied square from a1 to h8, the side to move and castling rights, the en passant file plus
+    # one, the halfmove clock and the full move number, then padding
+    binaryEncodingFormat = struct.Struct("<Q16sBBBH3x")
+    # Piece letter, origin file and rank for disambiguation, target square and promotion piece of a SAN move
+    sanMovePattern = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+    # Indexed by the bitboard backend's piece type numbers
+    pieceClassList = [PawnPiece, KnightPiece, BishopPiece, RookPiece, QueenPiece, KingPiece]
+
+    def __init__(self, backend="object", fenString=None, legalMoveCache=None, openingBook=None, tablebase=None):
+        if backend not in GameBoard.backendList:
+            raise ValueError(f"Unknown move generation backend: {backend}")
+        self.backend = backend
+        # An optional legalMoveCache.LegalMoveCache, which may be shared between boards
+        self.legalMoveCache = legalMoveCache
+        # An optional openingBook.OpeningBook, consulted by findBookMoves
+        self.openingBook = openingBook
+        # An optional endgameTablebase.EndgameTablebase, consulted by probeTablebase
+        self.tablebase = tablebase
         self.boardDepth = 1
         self.moveList = []
         self.pieceList = []
         self.playerToMoveNext = "White"
-        self.positionMap = {}
+        self.squareList = [None] * 120
         self.whiteInCheck = False
         self.blackInCheck = False
         self.isWhiteInCheckmate = False
         self.isBlackInCheckmate = False
         self.isDraw = False
         self.movesSinceLastCaptureOrPawnMove = 0
+        self.fullMoveNumber = 1
         self.pawnMovedDoubleLastTurn = False
 
-        self.whitePawnCount = 8
-        self.whiteRookCount = 2
-        self.whiteKnightCount = 2
-        self.whiteBishopCount = 2
-        self.whiteQueenCount = 1
-        self.blackPawnCount = 8
-        self.blackRookCount = 2
-        self.blackKnightCount = 2
-        self.blackBishopCount = 2
-        self.blackQueenCount = 1
-
-        self.initializePieces()
+        self.whitePawnCount = 0
+        self.whiteRookCount = 0
+        self.whiteKnightCount = 0
+        self.whiteBishopCount = 0
+        self.whiteQueenCount = 0
+        self.blackPawnCount = 0
+        self.blackRookCount = 0
+        self.blackKnightCount = 0
+        self.blackBishopCount = 0
+        self.blackQueenCount = 0
+
+        if fenString is None:
+            self.initializePieces()
+        else:
+            self.initializePiecesFromFEN(fenString)
 
         for chessPiece in self.pieceList:
+            self.updatePieceCounters(chessPiece, counterChange=1)
             if isinstance(chessPiece, KingPiece):
                 if chessPiece.playerColor == "White":
                     self.whiteKing = chessPiece
                 else:
                     self.blackKing = chessPiece
 
+        # Material plus piece-square score with White's pieces counting positively, kept up to date by makeMove
+        self.materialAndPositionScore = evaluation.computeMaterialAndPositionScore(self)
+        self.zobristHash = self.computeZobristHash()
+        # How many times each position hash has occurred in this game, for repetition detection
+        self.positionCountDict = {self.zobristHash: 1}
+
+        self.rebuildDerivedState()
+
+    def rebuildDerivedState(self):
+        # Recomputes the attack map, check flags, pins and every piece's legal moves from the pieces on the board.
+        # makeMove leaves these alone, so a board moved with makeMove alone needs this before movePiece or the
+        # interface use it.
+        self.buildAttackMap()
+        self.whiteInCheck = self.checkIfSquareAttacked(self.whiteKing.squareIndex, "Black")
+        self.blackInCheck = self.checkIfSquareAttacked(self.blackKing.squareIndex, "White")
+        self.pinnedPiecesByColor = {"White": self.findPinnedPieces("White"), "Black": self.findPinnedPieces("Black")}
+        self.updatePositionsBeingAttackedByPieces()
+
+    @classmethod
+    def fromFEN(cls, fenString, backend="object", legalMoveCache=None, openingBook=None, tablebase=None):
+        return cls(backend=backend, fenString=fenString, legalMoveCache=legalMoveCache, openingBook=openingBook,
+                   tablebase=tablebase)
+
+    def toFEN(self):
+        rankStringList = []
+        for rankIndex in range(7, -1, -1):
+            rankString = ""
+            emptySquareCount = 0
+            for fileIndex in range(8):
+                chessPiece = self.squareList[21 + 10 * rankIndex + fileIndex]
+                if chessPiece is None:
+                    emptySquareCount += 1
+                    continue
+                if emptySquareCount:
+                    rankString += str(emptySquareCount)
+                    emptySquareCount = 0
+                rankString += chessPiece.notationLetter if chessPiece.playerColor == "White" else chessPiece.notationLetter.lower()
+            if emptySquareCount:
+                rankString += str(emptySquareCount)
+            rankStringList.append(rankString)
+
+        castlingRights = self.findCastlingRights()
+        castlingString = "".join(castlingLetter for castlingLetter, castlingRight in
+                                 [("K", bitboardBackend.whiteKingSideCastle), ("Q", bitboardBackend.whiteQueenSideCastle),
+                                  ("k", bitboardBackend.blackKingSideCastle), ("q", bitboardBackend.blackQueenSideCastle)]
+                                 if castlingRights & castlingRight) or "-"
+        enPassantTarget = "-"
+        if self.pawnMovedDoubleLastTurn:
+            pawnSquare = self.pawnMovedDoubleLastTurn.squareIndex
+            enPassantTarget = convertSquareIndexToPosition(pawnSquare - 10 if self.pawnMovedDoubleLastTurn.playerColor == "White" else pawnSquare + 10)
+
+        return f"{'/'.join(rankStringList)} {'w' if self.playerToMoveNext == 'White' else 'b'} {castlingString} " \
+               f"{enPassantTarget} {self.movesSinceLastCaptureOrPawnMove} {self.fullMoveNumber}"
+
+    @classmethod
+    def fromBinary(cls, encodedPosition, backend="object", legalMoveCache=None, openingBook=None, tablebase=None):
+        return cls(backend=backend, fenString=convertBinaryToFEN(encodedPosition), legalMoveCache=legalMoveCache,
+                   openingBook=openingBook, tablebase=tablebase)
+
+    def toBinary(self):
+        occupancy = 0
+        pieceCodeList = []
+        for bitboardSquare, squareIndex in enumerate(bitboardSquareToSquareIndexList):
+            chessPiece = self.squareList[squareIndex]
+            if chessPiece is not None:
+                occupancy |= 1 << bitboardSquare
+                pieceCodeList.append((bitboardBackend.whiteColor if chessPiece.playerColor == "White" else bitboardBackend.blackColor) * 6
+                                     + chessPiece.pieceType)
+        if len(pieceCodeList) > 32:
+            raise ValueError(f"Only positions with at most 32 pieces can be encoded, not {len(pieceCodeList)}")
+        pieceCodeList += [0] * (32 - len(pieceCodeList))
+        packedPieceCodes = bytes(pieceCodeList[nibbleIndex] | (pieceCodeList[nibbleIndex + 1] << 4) for nibbleIndex in range(0, 32, 2))
+
+        sideAndCastlingRights = (0 if self.playerToMoveNext == "White" else 1) | (self.findCastlingRights() << 1)
+        enPassantFile = findFileIndexOfSquare(self.pawnMovedDoubleLastTurn.squareIndex) + 1 if self.pawnMovedDoubleLastTurn else 0
+        return GameBoard.binaryEncodingFormat.pack(occupancy, packedPieceCodes, sideAndCastlingRights, enPassantFile,
+                                                   min(self.movesSinceLastCaptureOrPawnMove, 255), min(self.fullMoveNumber, 65535))
+
+    def generateLegalMoves(self, playerColor=None):
+        # Returns (piece, move) pairs for every legal move of one side, from the legal move cache when the position
+        # has been seen before
+        if playerColor is None:
+            playerColor = self.playerToMoveNext
+        if self.legalMoveCache is None:
+            return self.findLegalMoves(playerColor)
+
+        cacheKey = (self.zobristHash, playerColor)
+        encodedMoveTuple = self.legalMoveCache.lookup(cacheKey)
+        if encodedMoveTuple is not None:
+            return self.decodeCachedMoves(encodedMoveTuple)
+        legalMoveList = self.findLegalMoves(playerColor)
+        self.legalMoveCache.store(cacheKey, self.encodeMovesForCache(legalMoveList))
+        return legalMoveList
+
+    def findLegalMoves(self, playerColor):
+        # Generates the legal moves of one side with the board's selected backend, bypassing the cache
+        if self.backend == "bitboard":
+            bitboardPosition = self.convertToBitboardPosition(playerColor)
+            return [self.convertBitboardMove(bitboardMove) for bitboardMove in bitboardPosition.generateLegalMoves()]
+
+        return self.findLegalMovesOfPieces(playerColor)
+
+    def findLegalMovesOfPieces(self, playerColor, chessPieceList=None):
+        # Checkers and pins are found once, then each piece's pseudo-legal moves are limited to squares that block or
+        # capture a single checker and to its pin line. Only king moves and en passant need the position tested.
+        kingPiece = self.whiteKing if playerColor == "White" else self.blackKing
+        enemyColor = "Black" if playerColor == "White" else "White"
+        checkingPieceCount, evasionSquareSet, pinLineDict = self.findChecksAndPins(playerColor)
+        squareList = self.squareList
+
+        legalMoveList = []
+        for chessPiece in self.pieceList if chessPieceList is None else chessPieceList:
+            if chessPiece.playerColor != playerColor:
+                continue
+            if chessPiece is kingPiece:
+                # The king is lifted off the board so it does not hide squares behind it from sliding attackers
+                squareList[kingPiece.squareIndex] = None
+                for potentialMove in kingPiece.findPseudoLegalMoves():
+                    if not self.isSquareAttacked(potentialMove[0], enemyColor):
+                        legalMoveList.append((kingPiece, potentialMove))
+                squareList[kingPiece.squareIndex] = kingPiece
+                if not checkingPieceCount:
+                    for castlingMove in kingPiece.findCastlingMoves():
+                        legalMoveList.append((kingPiece, castlingMove))
+                continue
+            if checkingPieceCount > 1:
+                continue
+
+            pinLineSet = pinLineDict.get(chessPiece)
+            for potentialMove in chessPiece.findPseudoLegalMoves():
+                pieceCollidedWith = potentialMove[1]
+                if pieceCollidedWith and pieceCollidedWith.squareIndex != potentialMove[0]:
+                    # En passant removes two pawns from a rank at once, which can uncover an attack no pin covers
+                    if not kingPiece.checkIfInCheckAfterMove(chessPiece, potentialMove):
+                        legalMoveList.append((chessPiece, potentialMove))
+                    continue
+                if evasionSquareSet is not None and potentialMove[0] not in evasionSquareSet:
+                    continue
+                if pinLineSet is not None and potentialMove[0] not in pinLineSet:
+                    continue
+                legalMoveList.append((chessPiece, potentialMove))
+        return legalMoveList
+
+    def findChecksAndPins(self, playerColor):
+        # Returns the number of pieces checking playerColor's king, the squares that block or capture the checker
+        # when there is exactly one (None otherwise), and for each pinned piece the squares of its pin line
+        kingSquare = (self.whiteKing if playerColor == "White" else self.blackKing).squareIndex
+        squareList = self.squareList
+        checkingPieceCount = 0
+        evasionSquareSet = None
+        pinLineDict = {}
+        for movementRay, attackingPieceTypes in slidingAttackRayTable[kingSquare]:
+            pinnedPiece = None
+            for rayIndex, square in enumerate(movementRay):
+                chessPiece = squareList[square]
+                if not chessPiece:
+                    continue
+                if chessPiece.playerColor == playerColor:
+                    if pinnedPiece is not None:
+                        break
+                    pinnedPiece = chessPiece
+                    continue
+                if chessPiece.pieceType in attackingPieceTypes:
+                    if pinnedPiece is None:
+                        checkingPieceCount += 1
+                        evasionSquareSet = set(movementRay[:rayIndex + 1])
+                    else:
+                        pinLineDict[pinnedPiece] = set(movementRay[:rayIndex + 1])
+                break
+
+        for attackSquareTable, attackingPieceType in \
+                [(knightAttackSquareTable[kingSquare], KnightPiece.pieceType),
+                 (PawnPiece.captureSquareTableByColor[playerColor][kingSquare], PawnPiece.pieceType)]:
+            for square in attackSquareTable:
+                chessPiece = squareList[square]
+                if chessPiece and chessPiece.playerColor != playerColor and chessPiece.pieceType == attackingPieceType:
+                    checkingPieceCount += 1
+                    evasionSquareSet = {square}
+
+        if checkingPieceCount != 1:
+            evasionSquareSet = None
+        return checkingPieceCount, evasionSquareSet, pinLineDict
+
+    def findBookMoves(self):
+        # Returns (piece, move, weight, count) for every opening book move of the side to move. The book is searched
+        # by position hash, so no moves are generated; an empty list means the position is out of book.
+        if self.openingBook is None:
+            return []
+        return self.openingBook.findBookMoves(self)
+
+    def chooseBookMove(self, randomGenerator=None):
+        # A (piece, move) pair picked from the book moves in proportion to their weights, or None out of book
+        if self.openingBook is None:
+            return None
+        return self.openingBook.chooseMove(self, randomGenerator)
+
+    def probeTablebase(self):
+        # Returns (result, plies to mate) for the side to move from the endgame tablebase, where result is 1 for a
+        # win, 0 for a draw and -1 for a loss, or None if the position is not covered
+        if self.tablebase is None or len(self.pieceList) > 4:
+            return None
+        return self.tablebase.probe(self)
+
+    def findMoveFromSAN(self, sanMove):
+        # Returns the (piece, move) pair of the side to move matching a standard algebraic notation move like "Nbd7",
+        # "exd8=Q+" or "O-O", or None if no single legal move matches
+        sanMove = sanMove.rstrip("+#!?")
+        legalMoveList = self.generateLegalMoves()
+        if sanMove in ["O-O", "0-0", "O-O-O", "0-0-0"]:
+            isQueenSide = len(sanMove) == 5
+            for chessPiece, legalMove in legalMoveList:
+                if legalMove[2] and (findFileIndexOfSquare(legalMove[2]) == 3) == isQueenSide:
+                    return chessPiece, legalMove
+            return None
+
+        sanMatch = GameBoard.sanMovePattern.match(sanMove)
+        if sanMatch is None:
+            return None
+        pieceLetter, originFile, originRank, targetPosition, promotionLetter = sanMatch.groups()
+        pieceLetter = pieceLetter or PawnPiece.notationLetter
+        targetSquare = convertPositionToSquareIndex(targetPosition)
+        matchingMoveList = []
+        for chessPiece, legalMove in legalMoveList:
+            if chessPiece.notationLetter != pieceLetter or legalMove[0] != targetSquare or legalMove[2]:
+                continue
+            if (legalMove[3].notationLetter if legalMove[3] else None) != promotionLetter:
+                continue
+            piecePosition = chessPiece.position
+            if (originFile and piecePosition[0] != originFile) or (originRank and piecePosition[1] != originRank):
+                continue
+            matchingMoveList.append((chessPiece, legalMove))
+        return matchingMoveList[0] if len(matchingMoveList) == 1 else None
+
+    def findMoveFromCoordinateNotation(self, moveNotation):
+        # Returns the (piece, move) pair of the side to move for a long algebraic notation move like "e2e4" or "e7e8q",
+        # or None if that move is not legal
+        moveNotation = moveNotation.strip().lower()
+        for chessPiece, legalMove in self.generateLegalMoves():
+            if convertMoveToCoordinateNotation(chessPiece, legalMove) == moveNotation:
+                return chessPiece, legalMove
+        return None
+
+    def findGameStatus(self, legalMoveList=None):
+        # "checkmate", "stalemate", "draw" or "ongoing" for the side to move. Draws are by insufficient material,
+        # threefold repetition or the fifty move rule.
+        playerColor = self.playerToMoveNext
+        if legalMoveList is None:
+            legalMoveList = self.generateLegalMoves(playerColor)
+        if self.checkIfCheckmate(playerColor, legalMoveList):
+            return "checkmate"
+        if self.checkIfStalemate(playerColor, legalMoveList):
+            return "stalemate"
+        if self.checkIfDraw() or self.movesSinceLastCaptureOrPawnMove >= 100:
+            return "draw"
+        return "ongoing"
+
+    @staticmethod
+    def stats():
+        # Call counts and latency histograms of the hot methods, keyed by "Class.method". They only count while
+        # instrumentation is enabled, with instrumentation.enable() or the instrumentation.instrumented() block.
+        return instrumentation.collectStats()
+
+    def updatePositionsBeingAttackedByPieces(self, chessPieceList=None):
+        # Without a piece list every piece is recomputed. The bitboard backend always recomputes everything, since
+        # one pass over its bitboards is cheaper than the object backend's per-piece work. A position already in the
+        # legal move cache is filled in from the cache instead.
+        if self.legalMoveCache is not None:
+            whiteMoveTuple = self.legalMoveCache.lookup((self.zobristHash, "White"))
+            blackMoveTuple = self.legalMoveCache.lookup((self.zobristHash, "Black")) if whiteMoveTuple is not None else None
+            if blackMoveTuple is not None:
+                for chessPiece in self.pieceList:
+                    chessPiece.positionsBeingAttackedByPiece = []
+                for encodedMoveTuple in [whiteMoveTuple, blackMoveTuple]:
+                    for chessPiece, legalMove in self.decodeCachedMoves(encodedMoveTuple):
+                        chessPiece.positionsBeingAttackedByPiece.append(legalMove)
+                return
+
+        if chessPieceList is not None and self.backend == "object":
+            for chessPiece in chessPieceList:
+                chessPiece.positionsBeingAttackedByPiece = []
+            for playerColor in ["White", "Black"]:
+                for chessPiece, legalMove in self.findLegalMovesOfPieces(playerColor, chessPieceList):
+                    chessPiece.positionsBeingAttackedByPiece.append(legalMove)
+        else:
+            for chessPiece in self.pieceList:
+                chessPiece.positionsBeingAttackedByPiece = []
+            for playerColor in ["White", "Black"]:
+                for chessPiece, legalMove in self.findLegalMoves(playerColor):
+                    chessPiece.positionsBeingAttackedByPiece.append(legalMove)
+
+        if self.legalMoveCache is not None:
+            for playerColor in ["White", "Black"]:
+                legalMoveList = [(chessPiece, legalMove) for chessPiece in self.pieceList if chessPiece.playerColor == playerColor
+                                 for legalMove in chessPiece.positionsBeingAttackedByPiece]
+                self.legalMoveCache.store((self.zobristHash, playerColor), self.encodeMovesForCache(legalMoveList))
+
+    @staticmethod
+    def encodeMovesForCache(legalMoveList):
+        # Pieces are replaced by the squares they stand on, so cached moves can be used by any board in the position
+        return tuple((chessPiece.squareIndex, targetSquare, pieceCollidedWith.squareIndex if pieceCollidedWith else 0,
+                      castlingMove, promotionPiece)
+                     for chessPiece, (targetSquare, pieceCollidedWith, castlingMove, promotionPiece) in legalMoveList)
+
+    def decodeCachedMoves(self, encodedMoveTuple):
+        squareList = self.squareList
+        return [(squareList[originSquare], (targetSquare, squareList[collidedSquare] if collidedSquare else False,
+                                            castlingMove, promotionPiece))
+                for originSquare, targetSquare, collidedSquare, castlingMove, promotionPiece in encodedMoveTuple]
+
+    def buildAttackMap(self):
+        # The attack map records which squares every piece attacks and, for every square, which pieces attack it.
+        # It is kept up to date by updateAfterMove, so a move only recomputes the pieces whose lines it touched.
+        self.attackedSquaresByPiece = {}
+        # Squares off the board share one empty tuple, since nothing ever attacks them
+        self.attackersOfSquareList = [set() if squareIsOnBoard else () for squareIsOnBoard in squareIsOnBoardList]
         for chessPiece in self.pieceList:
-            chessPiece.positionsBeingAttackedByPiece = chessPiece.findPotentialMoves()
+            self.updateAttacksOfPiece(chessPiece)
+
+    def updateAttacksOfPiece(self, chessPiece, isOnBoard=True):
+        for square in self.attackedSquaresByPiece.pop(chessPiece, ()):
+            self.attackersOfSquareList[square].discard(chessPiece)
+        if isOnBoard:
+            attackedSquareSet = chessPiece.findAttackedSquares()
+            self.attackedSquaresByPiece[chessPiece] = attackedSquareSet
+            for square in attackedSquareSet:
+                self.attackersOfSquareList[square].add(chessPiece)
+
+    def isSquareAttacked(self, squareToCheck, byColor):
+        # Computed from the pieces on the board, so unlike checkIfSquareAttacked it stays correct between makeMove
+        # and unmakeMove
+        squareList = self.squareList
+        for movementRay, attackingPieceTypes in slidingAttackRayTable[squareToCheck]:
+            for square in movementRay:
+                chessPiece = squareList[square]
+                if chessPiece:
+                    if chessPiece.playerColor == byColor and chessPiece.pieceType in attackingPieceTypes:
+                        return True
+                    break
+        for square in knightAttackSquareTable[squareToCheck]:
+            chessPiece = squareList[square]
+            if chessPiece and chessPiece.playerColor == byColor and chessPiece.pieceType == KnightPiece.pieceType:
+                return True
+        for square in kingAttackSquareTable[squareToCheck]:
+            chessPiece = squareList[square]
+            if chessPiece and chessPiece.playerColor == byColor and chessPiece.pieceType == KingPiece.pieceType:
+                return True
+        # An attacking pawn stands where a pawn of the other color on the square would capture
+        for square in PawnPiece.captureSquareTableByColor["White" if byColor == "Black" else "Black"][squareToCheck]:
+            chessPiece = squareList[square]
+            if chessPiece and chessPiece.playerColor == byColor and chessPiece.pieceType == PawnPiece.pieceType:
+                return True
+        return False
+
+    def checkIfSquareAttacked(self, squareToCheck, byColor):
+        # Answers from the incremental attack map, which is only up to date after updateAfterMove
+        for attackingPiece in self.attackersOfSquareList[squareToCheck]:
+            if attackingPiece.playerColor == byColor:
+                return True
+        return False
+
+    def findPinnedPieces(self, playerColor):
+        # A piece is pinned if it is the first piece on a line out from its king and an enemy slider of the right
+        # kind attacks it from further along the same line
+        kingPiece = self.whiteKing if playerColor == "White" else self.blackKing
+        pinnedPieceSet = set()
+        for movementOffsetList in QueenPiece.movementOffsetLists:
+            directionOffset = movementOffsetList[0]
+            pinningPieceClasses = (RookPiece, QueenPiece) if directionOffset in [-10, -1, 1, 10] else (BishopPiece, QueenPiece)
+            square = kingPiece.squareIndex + directionOffset
+            while squareIsOnBoardList[square] and not self.squareList[square]:
+                square += directionOffset
+            if not squareIsOnBoardList[square] or self.squareList[square].playerColor != playerColor:
+                continue
+            for attackingPiece in self.attackersOfSquareList[square]:
+                squareDifference = attackingPiece.squareIndex - square
+                if attackingPiece.playerColor != playerColor and isinstance(attackingPiece, pinningPieceClasses) and \
+                        squareDifference % directionOffset == 0 and 0 < squareDifference // directionOffset <= 7:
+                    pinnedPieceSet.add(self.squareList[square])
+        return pinnedPieceSet
+
+    def updateAfterMove(self, undoRecord):
+        # Brings the attack map, check flags, pins and every affected piece's legal moves up to date after a move
+        # applied with makeMove. Only pieces whose moves can have changed are recomputed:
+        #   - pieces that moved, were promoted, or attack a square the move emptied or filled
+        #   - pawns that could push onto one of those squares
+        #   - both kings, whose moves depend on every enemy attack
+        #   - every piece of a side that is, or just was, in check
+        #   - pieces pinned before or after the move, and pawns next to an en passant pawn before or after the move
+        pieceToMove, move, originalSquare, _, previousPawnMovedDoubleLastTurn, wasWhiteInCheck, wasBlackInCheck, \
+            _, _, capturedPieceIndex, rookOriginalSquare, _, promotedPiece, _, _, _ = undoRecord
+        squareToMoveTo, pieceCollidedWith, castlingMove, _ = move
+
+        changedSquareList = [originalSquare, squareToMoveTo]
+        changedPieceSet = {pieceToMove}
+        if castlingMove:
+            changedSquareList += [rookOriginalSquare, castlingMove]
+            changedPieceSet.add(pieceCollidedWith)
+        elif pieceCollidedWith:
+            changedSquareList.append(pieceCollidedWith.squareIndex)
+            self.updateAttacksOfPiece(pieceCollidedWith, isOnBoard=False)
+        if promotedPiece:
+            self.updateAttacksOfPiece(pieceToMove, isOnBoard=False)
+            changedPieceSet.discard(pieceToMove)
+            changedPieceSet.add(promotedPiece)
+
+        for square in changedSquareList:
+            changedPieceSet.update(self.attackersOfSquareList[square])
+        for chessPiece in changedPieceSet:
+            self.updateAttacksOfPiece(chessPiece)
+
+        self.whiteInCheck = self.checkIfSquareAttacked(self.whiteKing.squareIndex, "Black")
+        self.blackInCheck = self.checkIfSquareAttacked(self.blackKing.squareIndex, "White")
+        previousPinnedPiecesByColor = self.pinnedPiecesByColor
+        self.pinnedPiecesByColor = {"White": self.findPinnedPieces("White"), "Black": self.findPinnedPieces("Black")}
+
+        piecesToUpdate = set(changedPieceSet)
+        piecesToUpdate.update([self.whiteKing, self.blackKing])
+        for square in changedSquareList:
+            for pawnOffset in [-20, -10, 10, 20]:
+                if isinstance(self.squareList[square + pawnOffset], PawnPiece):
+                    piecesToUpdate.add(self.squareList[square + pawnOffset])
+        for playerColor, wasInCheck, isInCheck in [("White", wasWhiteInCheck, self.whiteInCheck),
+                                                   ("Black", wasBlackInCheck, self.blackInCheck)]:
+            if wasInCheck or isInCheck:
+                piecesToUpdate.update(chessPiece for chessPiece in self.pieceList if chessPiece.playerColor == playerColor)
+            piecesToUpdate.update(previousPinnedPiecesByColor[playerColor])
+            piecesToUpdate.update(self.pinnedPiecesByColor[playerColor])
+        for pawnMovedDouble in [previousPawnMovedDoubleLastTurn, self.pawnMovedDoubleLastTurn]:
+            if pawnMovedDouble:
+                for horizontalOffset in [-1, 1]:
+                    if isinstance(self.squareList[pawnMovedDouble.squareIndex + horizontalOffset], PawnPiece):
+                        piecesToUpdate.add(self.squareList[pawnMovedDouble.squareIndex + horizontalOffset])
+
+        self.updatePositionsBeingAttackedByPieces([chessPiece for chessPiece in self.pieceList if chessPiece in piecesToUpdate])
+
+        return
 
-    def checkIfPlayerHasNoPotentialMoves(self, playerColor):
+    def convertToBitboardPosition(self, playerColor=None):
+        if playerColor is None:
+            playerColor = self.playerToMoveNext
+        bitboardPosition = bitboardBackend.BitboardPosition()
+        for chessPiece in self.pieceList:
+            bitboardPosition.placePiece(squareIndexToBitboardSquareList[chessPiece.squareIndex],
+                                        bitboardBackend.whiteColor if chessPiece.playerColor == "White" else bitboardBackend.blackColor,
+                                        chessPiece.pieceType)
+        bitboardPosition.sideToMove = bitboardBackend.whiteColor if playerColor == "White" else bitboardBackend.blackColor
+        bitboardPosition.castlingRights = self.findCastlingRights()
+
+        if self.pawnMovedDoubleLastTurn and self.pawnMovedDoubleLastTurn.playerColor != playerColor:
+            squareBehindPawn = self.pawnMovedDoubleLastTurn.squareIndex + (-10 if playerColor == "Black" else 10)
+            bitboardPosition.enPassantSquare = squareIndexToBitboardSquareList[squareBehindPawn]
+
+        return bitboardPosition
+
+    def findCastlingRights(self):
+        # Castling rights as the bitboard backend's bit flags, derived from which kings and rooks have not moved
+        castlingRights = 0
+        for kingPiece, homeSquare, kingSideRight, queenSideRight in \
+                [(self.whiteKing, 25, bitboardBackend.whiteKingSideCastle, bitboardBackend.whiteQueenSideCastle),
+                 (self.blackKing, 95, bitboardBackend.blackKingSideCastle, bitboardBackend.blackQueenSideCastle)]:
+            if kingPiece.isAtStartingPosition and kingPiece.squareIndex == homeSquare:
+                for rookSquare, castlingRight in [(homeSquare + 3, kingSideRight), (homeSquare - 4, queenSideRight)]:
+                    rookPiece = self.squareList[rookSquare]
+                    if isinstance(rookPiece, RookPiece) and rookPiece.playerColor == kingPiece.playerColor and \
+                            rookPiece.isAtStartingPosition:
+                        castlingRights |= castlingRight
+        return castlingRights
+
+    def findEnPassantHashKey(self):
+        # The en passant file only distinguishes positions when an enemy pawn could actually make the capture
+        pawnMovedDoubleLastTurn = self.pawnMovedDoubleLastTurn
+        if not pawnMovedDoubleLastTurn:
+            return 0
+        for horizontalOffset in [-1, 1]:
+            adjacentPiece = self.squareList[pawnMovedDoubleLastTurn.squareIndex + horizontalOffset]
+            if isinstance(adjacentPiece, PawnPiece) and adjacentPiece.playerColor != pawnMovedDoubleLastTurn.playerColor:
+                return zobristHashing.enPassantFileKeyList[findFileIndexOfSquare(pawnMovedDoubleLastTurn.squareIndex)]
+        return 0
+
+    def computeZobristHash(self):
+        zobristHash = 0
+        for chessPiece in self.pieceList:
+            zobristHash ^= chessPiece.findHashKey()
+        if self.playerToMoveNext == "Black":
+            zobristHash ^= zobristHashing.blackToMoveKey
+        zobristHash ^= zobristHashing.castlingRightsKeyList[self.findCastlingRights()]
+        zobristHash ^= self.findEnPassantHashKey()
+        return zobristHash
+
+    def convertBitboardMove(self, bitboardMove):
+        originSquare = bitboardSquareToSquareIndexList[bitboardBackend.findMoveOrigin(bitboardMove)]
+        targetSquare = bitboardSquareToSquareIndexList[bitboardBackend.findMoveTarget(bitboardMove)]
+        moveFlag = bitboardBackend.findMoveFlag(bitboardMove)
+        pieceToMove = self.squareList[originSquare]
+        if moveFlag == bitboardBackend.castlingFlag:
+            if targetSquare > originSquare:
+                return (pieceToMove, (targetSquare, self.squareList[originSquare + 3], originSquare + 1, False))
+            return (pieceToMove, (targetSquare, self.squareList[originSquare - 4], originSquare - 1, False))
+        if moveFlag == bitboardBackend.enPassantFlag:
+            return (pieceToMove, (targetSquare, self.pawnMovedDoubleLastTurn, False, False))
+        promotionType = bitboardBackend.findMovePromotionType(bitboardMove)
+        promotionPiece = GameBoard.pieceClassList[promotionType] if promotionType else False
+        return (pieceToMove, (targetSquare, self.squareList[targetSquare] or False, False, promotionPiece))
+
+    def convertToBitboardMove(self, chessPiece, legalMove):
+        # The inverse of convertBitboardMove, for storing a move independently of the board's piece objects
+        targetSquare, pieceCollidedWith, castlingMove, promotionPiece = legalMove
+        bitboardMove = squareIndexToBitboardSquareList[chessPiece.squareIndex] | (squareIndexToBitboardSquareList[targetSquare] << 6)
+        if castlingMove:
+            return bitboardMove | (bitboardBackend.castlingFlag << 16)
+        if pieceCollidedWith and pieceCollidedWith.squareIndex != targetSquare:
+            return bitboardMove | (bitboardBackend.enPassantFlag << 16)
+        if isinstance(chessPiece, PawnPiece) and abs(targetSquare - chessPiece.squareIndex) == 20:
+            return bitboardMove | (bitboardBackend.doublePawnPushFlag << 16)
+        if promotionPiece:
+            return bitboardMove | (promotionPiece.pieceType << 12)
+        return bitboardMove
+
+    def checkIfPlayerHasNoPotentialMoves(self, playerColor, legalMoveList=None):
+        # A freshly generated legalMoveList can be passed in when the pieces' move lists are not up to date, like
+        # inside a search that only uses makeMove and unmakeMove
+        if legalMoveList is not None:
+            return len(legalMoveList) == 0
         for chessPiece in self.pieceList:
             if chessPiece.playerColor == playerColor:
                 if len(chessPiece.positionsBeingAttackedByPiece) > 0:
                     return False
         return True
 
-    def checkIfCheckmate(self, playerColor):
+    def checkIfCheckmate(self, playerColor, legalMoveList=None):
         if playerColor == "White":
             inCheck = self.whiteInCheck
         else:
             inCheck = self.blackInCheck
         if inCheck:
-            if self.checkIfPlayerHasNoPotentialMoves(playerColor):
+            if self.checkIfPlayerHasNoPotentialMoves(playerColor, legalMoveList):
                 return True
         return False
 
-    def checkIfStalemate(self, playerColor):
+    def checkIfStalemate(self, playerColor, legalMoveList=None):
         if playerColor == "White":
             inCheck = self.whiteInCheck
         else:
             inCheck = self.blackInCheck
         if not inCheck:
-            if self.checkIfPlayerHasNoPotentialMoves(playerColor):
+            if self.checkIfPlayerHasNoPotentialMoves(playerColor, legalMoveList):
                 return True
         return False
 
-    def updatePieceCounters(self, pieceBeingRemoved):
+    def updatePieceCounters(self, pieceBeingRemoved, counterChange=-1):
         if pieceBeingRemoved.playerColor == "White":
             if isinstance(pieceBeingRemoved, PawnPiece):
-                self.whitePawnCount -= 1
+                self.whitePawnCount += counterChange
             if isinstance(pieceBeingRemoved, RookPiece):
-                self.whiteRookCount -= 1
+                self.whiteRookCount += counterChange
             if isinstance(pieceBeingRemoved, KnightPiece):
-                self.whiteKnightCount -= 1
+                self.whiteKnightCount += counterChange
             if isinstance(pieceBeingRemoved, BishopPiece):
-                self.whiteBishopCount -= 1
+                self.whiteBishopCount += counterChange
             if isinstance(pieceBeingRemoved, QueenPiece):
-                self.whiteQueenCount -= 1
+                self.whiteQueenCount += counterChange
         elif pieceBeingRemoved.playerColor == "Black":
             if isinstance(pieceBeingRemoved, PawnPiece):
-                self.blackPawnCount -= 1
+                self.blackPawnCount += counterChange
             if isinstance(pieceBeingRemoved, RookPiece):
-                self.blackRookCount -= 1
+                self.blackRookCount += counterChange
             if isinstance(pieceBeingRemoved, KnightPiece):
-                self.blackKnightCount -= 1
+                self.blackKnightCount += counterChange
             if isinstance(pieceBeingRemoved, BishopPiece):
-                self.blackBishopCount -= 1
+                self.blackBishopCount += counterChange
             if isinstance(pieceBeingRemoved, QueenPiece):
-                self.blackQueenCount -= 1
+                self.blackQueenCount += counterChange
+
+        return
+
+    def makeMove(self, pieceToMove, move, updateCheckFlags=True):
+        # Applies a move in place and returns everything unmakeMove needs to restore the board exactly, so that
+        # legality checks and searches never have to copy the whole board.
+        squareToMoveTo, pieceCollidedWith, castlingMove, promotionPiece = move
+        undoRecord = (pieceToMove, move, pieceToMove.squareIndex, pieceToMove.isAtStartingPosition,
+                      self.pawnMovedDoubleLastTurn, self.whiteInCheck, self.blackInCheck,
+                      self.movesSinceLastCaptureOrPawnMove, self.playerToMoveNext)
+        capturedPieceIndex = None
+        rookOriginalSquare = None
+        wasRookAtStartingPosition = None
+        promotedPiece = None
+        promotedPawnIndex = None
+
+        previousZobristHash = self.zobristHash
+        zobristHash = previousZobristHash ^ zobristHashing.blackToMoveKey ^ self.findEnPassantHashKey() ^ \
+            pieceToMove.findHashKey()
+        # Castling rights can only change when a king or rook moves or a rook is captured
+        castlingRightsCanChange = isinstance(pieceToMove, (KingPiece, RookPiece)) or isinstance(pieceCollidedWith, RookPiece)
+        if castlingRightsCanChange:
+            zobristHash ^= zobristHashing.castlingRightsKeyList[self.findCastlingRights()]
+        previousMaterialAndPositionScore = self.materialAndPositionScore
+        materialAndPositionScore = previousMaterialAndPositionScore - evaluation.findPieceSquareScore(pieceToMove)
+
+        self.pawnMovedDoubleLastTurn = False
+        if isinstance(pieceToMove, PawnPiece):
+            if abs(pieceToMove.squareIndex - squareToMoveTo) == 20:
+                self.pawnMovedDoubleLastTurn = pieceToMove
+
+        if castlingMove:
+            rookOriginalSquare = pieceCollidedWith.squareIndex
+            wasRookAtStartingPosition = pieceCollidedWith.isAtStartingPosition
+            self.squareList[rookOriginalSquare] = None
+            self.squareList[castlingMove] = pieceCollidedWith
+            pieceCollidedWith.squareIndex = castlingMove
+            pieceCollidedWith.isAtStartingPosition = False
+            zobristHash ^= pieceCollidedWith.findHashKey(rookOriginalSquare) ^ pieceCollidedWith.findHashKey()
+            materialAndPositionScore += evaluation.findPieceSquareScore(pieceCollidedWith) - \
+                evaluation.findPieceSquareScore(pieceCollidedWith, rookOriginalSquare)
+        elif pieceCollidedWith:
+            zobristHash ^= pieceCollidedWith.findHashKey()
+            materialAndPositionScore -= evaluation.findPieceSquareScore(pieceCollidedWith)
+            capturedPieceIndex = self.pieceList.index(pieceCollidedWith)
+            del(self.pieceList[capturedPieceIndex])
+            self.updatePieceCounters(pieceCollidedWith)
+            # An en passant capture removes a pawn that is not on the square being moved to
+            self.squareList[pieceCollidedWith.squareIndex] = None
+
+        self.squareList[pieceToMove.squareIndex] = None
+        self.squareList[squareToMoveTo] = pieceToMove
+        pieceToMove.squareIndex = squareToMoveTo
+        pieceToMove.isAtStartingPosition = False
+
+        if isinstance(pieceToMove, PawnPiece):
+            promotionRankIndex = 7 if pieceToMove.playerColor == "White" else 0
+            if findRankIndexOfSquare(squareToMoveTo) == promotionRankIndex:
+                promotedPawnIndex = self.pieceList.index(pieceToMove)
+                promotedPiece = pieceToMove.promotePawn(promotionPiece)
+                self.updatePieceCounters(pieceToMove)
+                self.updatePieceCounters(promotedPiece, counterChange=1)
+
+        if pieceCollidedWith and not castlingMove or isinstance(pieceToMove, PawnPiece):
+            self.movesSinceLastCaptureOrPawnMove = 0
+        else:
+            self.movesSinceLastCaptureOrPawnMove += 1
+        self.playerToMoveNext = "Black" if pieceToMove.playerColor == "White" else "White"
+        if pieceToMove.playerColor == "Black":
+            self.fullMoveNumber += 1
+
+        zobristHash ^= (promotedPiece or pieceToMove).findHashKey() ^ self.findEnPassantHashKey()
+        if castlingRightsCanChange:
+            zobristHash ^= zobristHashing.castlingRightsKeyList[self.findCastlingRights()]
+        self.zobristHash = zobristHash
+        self.positionCountDict[zobristHash] = self.positionCountDict.get(zobristHash, 0) + 1
+        self.materialAndPositionScore = materialAndPositionScore + evaluation.findPieceSquareScore(promotedPiece or pieceToMove)
+
+        if updateCheckFlags:
+            oppositeKing = (self.blackKing if pieceToMove.playerColor == "White" else self.whiteKing)
+            oppositeKingInCheck = bool(oppositeKing.checkIfInCheck())
+            if pieceToMove.playerColor == "White":
+                self.whiteInCheck = False
+                self.blackInCheck = oppositeKingInCheck
+            else:
+                self.whiteInCheck = oppositeKingInCheck
+                self.blackInCheck = False
+
+        return undoRecord + (capturedPieceIndex, rookOriginalSquare, wasRookAtStartingPosition,
+                             promotedPiece, promotedPawnIndex, previousZobristHash, previousMaterialAndPositionScore)
+
+    def unmakeMove(self, undoRecord):
+        pieceToMove, move, originalSquare, wasAtStartingPosition, \
+            self.pawnMovedDoubleLastTurn, self.whiteInCheck, self.blackInCheck, \
+            self.movesSinceLastCaptureOrPawnMove, self.playerToMoveNext, \
+            capturedPieceIndex, rookOriginalSquare, wasRookAtStartingPosition, \
+            promotedPiece, promotedPawnIndex, previousZobristHash, self.materialAndPositionScore = undoRecord
+        squareToMoveTo, pieceCollidedWith, castlingMove, promotionPiece = move
+
+        positionCount = self.positionCountDict[self.zobristHash]
+        if positionCount == 1:
+            del(self.positionCountDict[self.zobristHash])
+        else:
+            self.positionCountDict[self.zobristHash] = positionCount - 1
+        self.zobristHash = previousZobristHash
+        if pieceToMove.playerColor == "Black":
+            self.fullMoveNumber -= 1
+
+        if promotedPiece:
+            self.pieceList.remove(promotedPiece)
+            self.pieceList.insert(promotedPawnIndex, pieceToMove)
+            self.updatePieceCounters(promotedPiece)
+            self.updatePieceCounters(pieceToMove, counterChange=1)
+
+        self.squareList[squareToMoveTo] = None
+        self.squareList[originalSquare] = pieceToMove
+        pieceToMove.squareIndex = originalSquare
+        pieceToMove.isAtStartingPosition = wasAtStartingPosition
+
+        if castlingMove:
+            self.squareList[castlingMove] = None
+            self.squareList[rookOriginalSquare] = pieceCollidedWith
+            pieceCollidedWith.squareIndex = rookOriginalSquare
+            pieceCollidedWith.isAtStartingPosition = wasRookAtStartingPosition
+        elif pieceCollidedWith:
+            self.pieceList.insert(capturedPieceIndex, pieceCollidedWith)
+            self.squareList[pieceCollidedWith.squareIndex] = pieceCollidedWith
+            self.updatePieceCounters(pieceCollidedWith, counterChange=1)
 
         return
 
@@ -491,16 +1206,15 @@ class GameBoard:
                 isDraw = True
 
         # Check for threefold repetition
-        if len(self.moveList) >= 12:
-            if self.moveList[-2] + self.moveList[-1] == self.moveList[-6] + self.moveList[-5] == self.moveList[-10] + self.moveList[-9]:
-                isDraw = True
+        if self.positionCountDict[self.zobristHash] >= 3:
+            isDraw = True
 
         return isDraw
 
     def addMoveToMoveList(self, pieceBeingMoved, moveToAdd, originalPosition=False):
         moveNotation = ""
         if moveToAdd[2]:
-            if moveToAdd[2][0] == 'd':
+            if findFileIndexOfSquare(moveToAdd[2]) == 3:
                 moveNotation = "0-0-0"
             else:
                 moveNotation = "0-0"
@@ -524,7 +1238,10 @@ class GameBoard:
         if moveToAdd[1]:
             moveNotation += "x"
 
-        moveNotation += moveToAdd[0]
+        moveNotation += convertSquareIndexToPosition(moveToAdd[0])
+
+        if moveToAdd[3]:
+            moveNotation += "=" + moveToAdd[3].notationLetter
 
         if self.isWhiteInCheckmate or self.isBlackInCheckmate:
             moveNotation += "#"
@@ -567,4 +1284,76 @@ class GameBoard:
                           KingPiece("e8", self, "Black"),
                           BishopPiece("f8", self, "Black"),
                           KnightPiece("g8", self, "Black"),
-                          RookPiece("h8", self, "Black")]
\ No newline at end of file
+                          RookPiece("h8", self, "Black")]
+
+    def initializePiecesFromFEN(self, fenString):
+        fenFieldList = fenString.split()
+        if len(fenFieldList) < 4:
+            raise ValueError(f"FEN needs at least four fields: {fenString}")
+        piecePlacement, sideToMove, castlingRights, enPassantTarget = fenFieldList[:4]
+        rankStringList = piecePlacement.split("/")
+        if len(rankStringList) != 8 or sideToMove not in ["w", "b"]:
+            raise ValueError(f"Invalid FEN: {fenString}")
+
+        self.pieceList = []
+        for rankIndex, rankString in zip(range(7, -1, -1), rankStringList):
+            fileIndex = 0
+            for character in rankString:
+                if character.isdigit():
+                    fileIndex += int(character)
+                    continue
+                pieceClass = None
+                for candidatePieceClass in GameBoard.pieceClassList:
+                    if candidatePieceClass.notationLetter == character.upper():
+                        pieceClass = candidatePieceClass
+                if pieceClass is None or fileIndex > 7:
+                    raise ValueError(f"Invalid FEN: {fenString}")
+                if pieceClass is PawnPiece and rankIndex in [0, 7]:
+                    raise ValueError(f"FEN has a pawn on the first or last rank: {fenString}")
+                playerColor = "White" if character.isupper() else "Black"
+                squareIndex = 21 + 10 * rankIndex + fileIndex
+                chessPiece = pieceClass(convertSquareIndexToPosition(squareIndex), self, playerColor)
+                if isinstance(chessPiece, PawnPiece):
+                    chessPiece.isAtStartingPosition = rankIndex == (1 if playerColor == "White" else 6)
+                elif isinstance(chessPiece, KingPiece):
+                    homeSquare = 25 if playerColor == "White" else 95
+                    castlingLetters = "KQ" if playerColor == "White" else "kq"
+                    chessPiece.isAtStartingPosition = squareIndex == homeSquare and \
+                        any(castlingLetter in castlingRights for castlingLetter in castlingLetters)
+                elif isinstance(chessPiece, RookPiece):
+                    rookCastlingSquareDict = {21: "Q", 28: "K", 91: "q", 98: "k"}
+                    castlingLetter = rookCastlingSquareDict.get(squareIndex)
+                    chessPiece.isAtStartingPosition = castlingLetter is not None and \
+                        (castlingLetter.isupper() == (playerColor == "White")) and castlingLetter in castlingRights
+                self.pieceList.append(chessPiece)
+                fileIndex += 1
+            if fileIndex != 8:
+                raise ValueError(f"Invalid FEN: {fenString}")
+
+        kingColorList = [chessPiece.playerColor for chessPiece in self.pieceList if isinstance(chessPiece, KingPiece)]
+        if sorted(kingColorList) != ["Black", "White"]:
+            raise ValueError(f"FEN must have exactly one king per side: {fenString}")
+
+        self.playerToMoveNext = "White" if sideToMove == "w" else "Black"
+        if enPassantTarget != "-":
+            # The pawn that just moved two squares stands one rank past the en passant target square
+            targetSquare = convertPositionToSquareIndex(enPassantTarget)
+            pawnSquare = targetSquare - 10 if self.playerToMoveNext == "White" else targetSquare + 10
+            if isinstance(self.squareList[pawnSquare], PawnPiece):
+                self.pawnMovedDoubleLastTurn = self.squareList[pawnSquare]
+        if len(fenFieldList) > 4:
+            self.movesSinceLastCaptureOrPawnMove = int(fenFieldList[4])
+        if len(fenFieldList) > 5:
+            self.fullMoveNumber = int(fenFieldList[5])
+
+        return
+
+
+# Timed while instrumentation is enabled. Searches and perft spend most of their time in the board methods, the GUI in
+# movePiece and the per-piece ones. Legality checks use makeMove and unmakeMove, not copies of the board.
+for instrumentedClass, instrumentedMethodName in [(ChessPiece, "movePiece"), (ChessPiece, "findPotentialMoves"),
+                                                  (KingPiece, "checkIfInCheck"), (KingPiece, "checkIfInCheckAfterMove"),
+                                                  (GameBoard, "findLegalMoves"), (GameBoard, "makeMove"),
+                                                  (GameBoard, "unmakeMove"), (GameBoard, "checkIfDraw")]:
+    instrumentation.registerMethod(instrumentedClass, instrumentedMethodName,
+                                   f"{instrumentedClass.__name__}.{instrumentedMethodName}")
@@ -1,9 +1,21 @@
-import gameClasses
-import pygame
-import tkinter as tk
-from tkinter import *
+import logging
 import os
 import platform
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import *
+
+import pygame
+
+import boardRenderer
+import endgameTablebase
+import gameClasses
+import legalMoveCache
+import openingBook
+import searchEngine
+import spriteAtlas
+
+logger = logging.getLogger(__name__)
 
 class ChessGame():
     positionToCoordinateMultipleDict = {'a': 0,
@@ -22,14 +34,27 @@ class ChessGame():
                                         '3': 5,
                                         '2': 6,
                                         '1': 7}
-
-    def __init__(self, screenSize):
+    # Frames are drawn at most this often, and with nothing to do the loop sleeps in pygame.event.wait for up to
+    # idleEventTimeout milliseconds before letting tkinter handle its own events
+    frameRateCap = 60
+    idleEventTimeout = 100
+    # Posted by the worker thread when a move and its analysis are finished
+    moveFinishedEventType = pygame.USEREVENT
+
+    def __init__(self, screenSize, computerColor=None, computerMoveTime=1.0, openingBookPath=None, tablebaseDirectory=None):
         self.screenSize = screenSize
+        # The side played by the search engine, "White" or "Black", or None for two human players
+        self.computerColor = computerColor
+        self.computerMoveTime = computerMoveTime
+        self.searchEngine = searchEngine.SearchEngine()
+        # The computer plays its first moves from this book file when one is given
+        self.openingBook = openingBook.OpeningBook(openingBookPath) if openingBookPath else None
+        # Endgames covered by the tablebases in this directory are played perfectly
+        self.tablebase = endgameTablebase.EndgameTablebase(tablebaseDirectory) if tablebaseDirectory else None
         self.guiWidth = self.screenSize // 3
         self.blockSize = int(self.screenSize / 8)
-        self.spriteSize = self.blockSize - int(self.blockSize * 0.2)
+        self.spriteSize = spriteAtlas.findSpriteSize(self.blockSize)
         self.bufferDistance = (self.blockSize - self.spriteSize) / 2
-        self.dotSpriteSize = int(self.blockSize / 2)
         self.dotBufferDistance = int(self.blockSize / 4)
 
         self.mainWin = tk.Tk()
@@ -43,27 +68,23 @@ class ChessGame():
             os.environ['SDL_VIDEODRIVER'] = 'windib'
 
         pygame.init()
-        self.gameBoard = gameClasses.GameBoard()
+        self.gameBoard = gameClasses.GameBoard(legalMoveCache=legalMoveCache.LegalMoveCache(), openingBook=self.openingBook,
+                                              tablebase=self.tablebase)
         self.gameSurface = pygame.display.set_mode((screenSize, screenSize))
         pygame.display.set_caption("Chess")
         self.gameOver = False
-
-        self.backgroundChessBoard = pygame.transform.scale(pygame.image.load("assets/chessBoard.png"), (self.screenSize, self.screenSize))
-        self.whitePawnSprite = pygame.transform.scale(pygame.image.load("assets/whitePawn.png"), (self.spriteSize, self.spriteSize))
-        self.whiteRookSprite = pygame.transform.scale(pygame.image.load("assets/whiteRook.png"), (self.spriteSize, self.spriteSize))
-        self.whiteKnightSprite = pygame.transform.scale(pygame.image.load("assets/whiteKnight.png"), (self.spriteSize, self.spriteSize))
-        self.whiteBishopSprite = pygame.transform.scale(pygame.image.load("assets/whiteBishop.png"), (self.spriteSize, self.spriteSize))
-        self.whiteQueenSprite = pygame.transform.scale(pygame.image.load("assets/whiteQueen.png"), (self.spriteSize, self.spriteSize))
-        self.whiteKingSprite = pygame.transform.scale(pygame.image.load("assets/whiteKing.png"), (self.spriteSize, self.spriteSize))
-        self.blackPawnSprite = pygame.transform.scale(pygame.image.load("assets/blackPawn.png"), (self.spriteSize, self.spriteSize))
-        self.blackRookSprite = pygame.transform.scale(pygame.image.load("assets/blackRook.png"), (self.spriteSize, self.spriteSize))
-        self.blackKnightSprite = pygame.transform.scale(pygame.image.load("assets/blackKnight.png"), (self.spriteSize, self.spriteSize))
-        self.blackBishopSprite = pygame.transform.scale(pygame.image.load("assets/blackBishop.png"), (self.spriteSize, self.spriteSize))
-        self.blackQueenSprite = pygame.transform.scale(pygame.image.load("assets/blackQueen.png"), (self.spriteSize, self.spriteSize))
-        self.blackKingSprite = pygame.transform.scale(pygame.image.load("assets/blackKing.png"), (self.spriteSize, self.spriteSize))
-        self.greenDotSprite = pygame.transform.scale(pygame.image.load("assets/greenDot.png"), (self.dotSpriteSize, self.dotSpriteSize))
-        self.redBorderSprite = pygame.transform.scale(pygame.image.load("assets/redBorder.png"), (self.blockSize, self.blockSize))
-        self.greenSquareSprite = pygame.transform.scale(pygame.image.load("assets/greenSquare.png"), (self.blockSize, self.blockSize))
+        # The result is logged once when the game ends, not on every frame after it
+        self.gameResultLogged = False
+
+        self.spriteAtlas = spriteAtlas.SpriteAtlas(self.screenSize)
+        self.backgroundChessBoard = self.spriteAtlas.backgroundSurface
+        self.boardRenderer = boardRenderer.BoardRenderer(self.gameSurface, self.backgroundChessBoard, self.blockSize,
+                                                         self.spriteAtlas.pieceSpriteDict, self.spriteAtlas.overlaySpriteDict,
+                                                         self.bufferDistance, self.dotBufferDistance)
+        self.clock = pygame.time.Clock()
+        # Moves are played and analysed on this thread, so the window keeps responding in the meantime
+        self.moveExecutor = ThreadPoolExecutor(max_workers=1)
+        self.pendingMove = None
 
         self.gameLoop()
 
@@ -74,113 +95,106 @@ class ChessGame():
         turnMap = {True: "White", False: "Black"}
         playerTurn = True
         lastClickedPiece = None
-        kingInCheck = False
 
         while not self.gameOver:
-            for event in pygame.event.get():
+            eventList = pygame.event.get()
+            if not eventList:
+                eventList = [pygame.event.wait(ChessGame.idleEventTimeout)]
+            for event in eventList:
                 if event.type == pygame.QUIT:
                     self.gameOver = True
 
-                if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.type == pygame.VIDEOEXPOSE:
+                    self.boardRenderer.invalidate()
+
+                if event.type == ChessGame.moveFinishedEventType:
+                    if self.finishMoveComputation():
+                        playerTurn = not playerTurn
+
+                # The board belongs to the worker thread while a move is being computed
+                if event.type == pygame.MOUSEBUTTONDOWN and self.pendingMove is None:
                     mouseClickPosition = pygame.mouse.get_pos()
                     clickedBoardPosition = self.convertScreenCoordinatesToBoardPosition(mouseClickPosition)
+                    clickedSquareIndex = gameClasses.convertPositionToSquareIndex(clickedBoardPosition)
 
                     if lastClickedPiece:
                         for potentialMove in lastClickedPiece.positionsBeingAttackedByPiece:
-                            if clickedBoardPosition in potentialMove:
-                                lastClickedPiece.movePiece(clickedBoardPosition, pieceCollidedWith=potentialMove[1], castlingMove=potentialMove[2])
-                                playerTurn = not playerTurn
-                                if playerTurn:
-                                    self.gameBoard.whiteInCheck = self.gameBoard.whiteKing.checkIfInCheck()
-                                else:
-                                    self.gameBoard.blackInCheck = self.gameBoard.blackKing.checkIfInCheck()
+                            if clickedSquareIndex == potentialMove[0]:
+                                # Promotion squares appear once per promotion piece; the queen comes first
+                                self.startMoveComputation(self.playMove, lastClickedPiece, potentialMove)
                                 lastClickedPiece = None
-                    if lastClickedPiece == self.gameBoard.positionMap.get(clickedBoardPosition, None):
+                                break
+                    if self.pendingMove is not None:
+                        continue
+                    if lastClickedPiece == self.gameBoard.squareList[clickedSquareIndex]:
                         lastClickedPiece = None
                         continue
                     else:
-                        lastClickedPiece = self.gameBoard.positionMap.get(clickedBoardPosition, None)
+                        lastClickedPiece = self.gameBoard.squareList[clickedSquareIndex]
                         if lastClickedPiece:
                             if lastClickedPiece.playerColor != turnMap[playerTurn]:
                                 lastClickedPiece = None
                                 continue
 
-            self.gameSurface.blit(self.backgroundChessBoard, (0, 0))
-
-            if self.gameBoard.whiteInCheck:
-                kingInCheck = self.gameBoard.whiteKing
-            elif self.gameBoard.blackInCheck:
-                kingInCheck = self.gameBoard.blackKing
-
-            if kingInCheck:
-                borderCoordinates = self.convertBoardPositionToScreenCoordinates(kingInCheck.position, 0)
-                transparentSurface = pygame.Surface((self.blockSize, self.blockSize)).convert()
-                transparentSurface.blit(self.gameSurface, (-borderCoordinates[0], -borderCoordinates[1]))
-                transparentSurface.blit(self.redBorderSprite, (0, 0))
-                transparentSurface.set_alpha(200)
-
-                self.gameSurface.blit(transparentSurface, borderCoordinates)
-            kingInCheck = False
-
-            if lastClickedPiece:
-                pieceCoordinates = self.convertBoardPositionToScreenCoordinates(lastClickedPiece.position, 0)
-                transparentSurface = pygame.Surface((self.blockSize, self.blockSize)).convert()
-                transparentSurface.blit(self.gameSurface, (-pieceCoordinates[0], -pieceCoordinates[1]))
-                transparentSurface.blit(self.greenSquareSprite, (0, 0))
-                transparentSurface.set_alpha(90)
-
-                self.gameSurface.blit(transparentSurface, pieceCoordinates)
-
-            for chessPiece in self.gameBoard.pieceList:
-                pieceCoordinates = self.convertBoardPositionToScreenCoordinates(chessPiece.position, self.bufferDistance)
-                playerColor = chessPiece.playerColor
-                if isinstance(chessPiece, gameClasses.PawnPiece):
-                    pieceSprite = (self.whitePawnSprite if playerColor == "White" else self.blackPawnSprite)
-                elif isinstance(chessPiece, gameClasses.RookPiece):
-                    pieceSprite = (self.whiteRookSprite if playerColor == "White" else self.blackRookSprite)
-                elif isinstance(chessPiece, gameClasses.KnightPiece):
-                    pieceSprite = (self.whiteKnightSprite if playerColor == "White" else self.blackKnightSprite)
-                elif isinstance(chessPiece, gameClasses.BishopPiece):
-                    pieceSprite = (self.whiteBishopSprite if playerColor == "White" else self.blackBishopSprite)
-                elif isinstance(chessPiece, gameClasses.QueenPiece):
-                    pieceSprite = (self.whiteQueenSprite if playerColor == "White" else self.blackQueenSprite)
-                elif isinstance(chessPiece, gameClasses.KingPiece):
-                    pieceSprite = (self.whiteKingSprite if playerColor == "White" else self.blackKingSprite)
-
-                self.gameSurface.blit(pieceSprite, pieceCoordinates)
-
-            if lastClickedPiece:
-                for potentialMove in lastClickedPiece.positionsBeingAttackedByPiece:
-                    if potentialMove[1] and not potentialMove[2]:
-                        dotSprite = self.redBorderSprite
-                    else:
-                        dotSprite = self.greenDotSprite
-                    bufferDistance = 0 if potentialMove[1] and not potentialMove[2] else self.dotBufferDistance
-                    dotCoordinates = self.convertBoardPositionToScreenCoordinates(potentialMove[0], bufferDistance)
-
-                    transparentSurface = pygame.Surface((dotSprite.get_width(), dotSprite.get_height())).convert()
-                    transparentSurface.blit(self.gameSurface, (-dotCoordinates[0], -dotCoordinates[1]))
-                    transparentSurface.blit(dotSprite, (0, 0))
-                    transparentSurface.set_alpha(150)
-
-                    self.gameSurface.blit(transparentSurface, dotCoordinates)
-
-            if self.gameBoard.isWhiteInCheckmate:
-                print("Black wins!")
-                #return
-                #Closes the window instantly, not desireable
-            elif self.gameBoard.isBlackInCheckmate:
-                print("White wins!")
-                #return
-            elif self.gameBoard.isDraw:
-                print("Draw")
-                #return
-
-            pygame.display.update()
+            # While the worker thread is moving, the last frame stays on screen
+            if self.pendingMove is None:
+                self.boardRenderer.render(self.gameBoard, lastClickedPiece)
+
+                # The window stays open after the game ends
+                if not self.gameResultLogged:
+                    if self.gameBoard.isWhiteInCheckmate:
+                        logger.info("Black wins!")
+                        self.gameResultLogged = True
+                    elif self.gameBoard.isBlackInCheckmate:
+                        logger.info("White wins!")
+                        self.gameResultLogged = True
+                    elif self.gameBoard.isDraw:
+                        logger.info("Draw")
+                        self.gameResultLogged = True
+
+                if self.computerColor == turnMap[playerTurn] and not \
+                        (self.gameBoard.isWhiteInCheckmate or self.gameBoard.isBlackInCheckmate or self.gameBoard.isDraw):
+                    lastClickedPiece = None
+                    self.startMoveComputation(self.playComputerMove)
+
             self.mainWin.update()
+            self.clock.tick(ChessGame.frameRateCap)
 
+        if self.pendingMove is not None:
+            self.searchEngine.stop()
+        self.moveExecutor.shutdown(wait=True)
         return
 
+    def startMoveComputation(self, moveFunction, *arguments):
+        # Runs moveFunction on the worker thread and shows the thinking state until it posts its finished event
+        self.pendingMove = self.moveExecutor.submit(moveFunction, *arguments)
+        self.pendingMove.add_done_callback(lambda _: pygame.event.post(pygame.event.Event(ChessGame.moveFinishedEventType)))
+        pygame.display.set_caption("Chess - thinking...")
+
+    def finishMoveComputation(self):
+        # Hands the board back to the interface thread. The worker's changes all become visible together here, as
+        # nothing reads the board between startMoveComputation and this call. Returns whether a move was played.
+        movePlayed = self.pendingMove.result()
+        self.pendingMove = None
+        pygame.display.set_caption("Chess")
+        return movePlayed
+
+    def playMove(self, chessPiece, potentialMove):
+        # Runs on the worker thread: plays the move, then checks for check, mate and draws
+        chessPiece.movePiece(potentialMove[0], pieceCollidedWith=potentialMove[1], castlingMove=potentialMove[2], promotionPiece=potentialMove[3])
+        if self.gameBoard.playerToMoveNext == "White":
+            self.gameBoard.whiteInCheck = self.gameBoard.whiteKing.checkIfInCheck()
+        else:
+            self.gameBoard.blackInCheck = self.gameBoard.blackKing.checkIfInCheck()
+        return True
+
+    def playComputerMove(self):
+        # Runs on the worker thread
+        searchResult = self.searchEngine.search(self.gameBoard, timeLimit=self.computerMoveTime)
+        if not searchResult.bestMove:
+            return False
+        return self.playMove(*searchResult.bestMove)
+
     def convertBoardPositionToScreenCoordinates(self, positionToConvert, bufferDistance):
         horizontalPosition = positionToConvert[0]
         horizontalCoordinate = int(self.blockSize * ChessGame.positionToCoordinateMultipleDict[horizontalPosition] + bufferDistance)
@@ -230,4 +244,5 @@ class ChessGame():
         return f"{horizontalPosition}{verticalPosition}"
 
 
+logging.basicConfig(level=logging.INFO)
 ChessGame(640)
\ No newline at end of file
@@ -0,0 +1,268 @@
+import argparse
+import logging
+import os
+import random
+import struct
+import time
+
+import gameClasses
+
+logger = logging.getLogger(__name__)
+
+# A journal file is a header followed by records that are only ever appended. Each record starts with its type:
+#   move:     the move in the bitboard backend's packed format and the Zobrist hash of the position after it
+#   snapshot: the ply it was taken at, the position's hash and GameBoard.toBinary's encoding of the position
+# The first record is always a snapshot of the starting position at ply 0. The hashes let a resumed game rebuild its
+# repetition counts, and catch a journal that does not match the moves being replayed from it.
+journalMagic = b"CHJL"
+journalVersion = 1
+headerFormat = struct.Struct("<4sH2x")
+moveRecordType = 1
+snapshotRecordType = 2
+moveRecordFormat = struct.Struct("<BIQ")
+snapshotRecordFormat = struct.Struct(f"<BIQ{gameClasses.GameBoard.binaryEncodingFormat.size}s")
+recordFormatDict = {moveRecordType: moveRecordFormat, snapshotRecordType: snapshotRecordFormat}
+defaultSnapshotInterval = 64
+
+
+class JournalContents:
+    # Everything read from a journal file. positionHashList[ply] is the hash of the position after ply moves.
+    def __init__(self, bitboardMoveList, positionHashList, snapshotDict, validLength):
+        self.bitboardMoveList = bitboardMoveList
+        self.positionHashList = positionHashList
+        # Ply -> encoded position
+        self.snapshotDict = snapshotDict
+        # Bytes up to the end of the last complete record. Anything after it was cut off by a crash.
+        self.validLength = validLength
+
+    @property
+    def plyCount(self):
+        return len(self.bitboardMoveList)
+
+
+def readJournal(journalPath):
+    with open(journalPath, "rb") as journalFile:
+        journalData = journalFile.read()
+    if len(journalData) < headerFormat.size:
+        raise ValueError(f"Not a game journal file: {journalPath}")
+    magic, version = headerFormat.unpack_from(journalData, 0)
+    if magic != journalMagic or version != journalVersion:
+        raise ValueError(f"Not a game journal file, or a different version: {journalPath}")
+
+    bitboardMoveList = []
+    positionHashList = []
+    snapshotDict = {}
+    offset = headerFormat.size
+    while offset < len(journalData):
+        recordFormat = recordFormatDict.get(journalData[offset])
+        if recordFormat is None:
+            raise ValueError(f"Unknown record type {journalData[offset]} at byte {offset} of {journalPath}")
+        if offset + recordFormat.size > len(journalData):
+            logger.warning("Ignoring an incomplete record at the end of %s", journalPath)
+            break
+        if recordFormat is moveRecordFormat:
+            _, bitboardMove, zobristHash = moveRecordFormat.unpack_from(journalData, offset)
+            bitboardMoveList.append(bitboardMove)
+            positionHashList.append(zobristHash)
+        else:
+            _, plyNumber, zobristHash, encodedPosition = snapshotRecordFormat.unpack_from(journalData, offset)
+            if plyNumber != len(bitboardMoveList):
+                raise ValueError(f"Snapshot for ply {plyNumber} found after {len(bitboardMoveList)} moves in {journalPath}")
+            if plyNumber == 0:
+                positionHashList.append(zobristHash)
+            snapshotDict[plyNumber] = encodedPosition
+        offset += recordFormat.size
+    if 0 not in snapshotDict:
+        raise ValueError(f"Game journal has no starting position: {journalPath}")
+    return JournalContents(bitboardMoveList, positionHashList, snapshotDict, offset)
+
+
+def loadGameBoard(journalContents, plyNumber=None, **boardOptions):
+    # Rebuilds the game after plyNumber moves, or after every move, from the nearest snapshot at or before it plus the
+    # moves that follow. boardOptions are passed on to GameBoard, like legalMoveCache.
+    if plyNumber is None:
+        plyNumber = journalContents.plyCount
+    if not 0 <= plyNumber <= journalContents.plyCount:
+        raise ValueError(f"The journal has {journalContents.plyCount} moves, not {plyNumber}")
+    snapshotPly = max(snapshotPly for snapshotPly in journalContents.snapshotDict if snapshotPly <= plyNumber)
+    gameBoard = gameClasses.GameBoard.fromBinary(journalContents.snapshotDict[snapshotPly], **boardOptions)
+    if gameBoard.zobristHash != journalContents.positionHashList[snapshotPly]:
+        raise ValueError(f"The snapshot at ply {snapshotPly} does not match its hash")
+
+    # Only positions since the last capture or pawn move can be repeated, and the journal has their hashes
+    positionCountDict = {}
+    for positionHash in journalContents.positionHashList[max(0, snapshotPly - gameBoard.movesSinceLastCaptureOrPawnMove):snapshotPly + 1]:
+        positionCountDict[positionHash] = positionCountDict.get(positionHash, 0) + 1
+    gameBoard.positionCountDict = positionCountDict
+
+    for replayedPly in range(snapshotPly, plyNumber):
+        chessPiece, legalMove = gameBoard.convertBitboardMove(journalContents.bitboardMoveList[replayedPly])
+        if chessPiece is None or chessPiece.playerColor != gameBoard.playerToMoveNext:
+            raise ValueError(f"Move {replayedPly + 1} of the journal cannot be played")
+        gameBoard.makeMove(chessPiece, legalMove)
+        if gameBoard.zobristHash != journalContents.positionHashList[replayedPly + 1]:
+            raise ValueError(f"Move {replayedPly + 1} of the journal does not lead to its recorded position")
+    if plyNumber > snapshotPly:
+        gameBoard.rebuildDerivedState()
+    updateGameEndFlags(gameBoard)
+    return gameBoard
+
+
+def updateGameEndFlags(gameBoard):
+    # makeMove leaves the checkmate and draw flags the interface reads to movePiece, so they are set here
+    gameStatus = gameBoard.findGameStatus()
+    gameBoard.isWhiteInCheckmate = gameStatus == "checkmate" and gameBoard.playerToMoveNext == "White"
+    gameBoard.isBlackInCheckmate = gameStatus == "checkmate" and gameBoard.playerToMoveNext == "Black"
+    gameBoard.isDraw = gameStatus in ["stalemate", "draw"]
+
+
+class GameJournal:
+    # Appends every move of one game to a journal file, with a snapshot of the board every snapshotInterval plies.
+    # Each record reaches the operating system as soon as it is written, so the game survives the process crashing.
+    # fsyncPolicy decides when it is also forced onto the disk, to survive the machine crashing: after every move
+    # ("always"), at each snapshot ("snapshot") or never ("never").
+    fsyncPolicyList = ["always", "snapshot", "never"]
+
+    def __init__(self, journalPath, gameBoard, snapshotInterval=defaultSnapshotInterval, fsyncPolicy="snapshot",
+                 resumeFrom=None):
+        # Starts a new journal for gameBoard, replacing any file at journalPath. Use resume to continue an existing one.
+        if fsyncPolicy not in GameJournal.fsyncPolicyList:
+            raise ValueError(f"Unknown fsync policy: {fsyncPolicy}")
+        if snapshotInterval < 0:
+            raise ValueError(f"The snapshot interval must not be negative: {snapshotInterval}")
+        self.journalPath = journalPath
+        self.gameBoard = gameBoard
+        # Zero takes no snapshots besides the starting position
+        self.snapshotInterval = snapshotInterval
+        self.fsyncPolicy = fsyncPolicy
+        if resumeFrom is None:
+            self.journalFile = open(journalPath, "wb", buffering=0)
+            self.journalFile.write(headerFormat.pack(journalMagic, journalVersion))
+            self.plyCount = 0
+            self.writeSnapshot()
+        else:
+            self.journalFile = open(journalPath, "r+b", buffering=0)
+            # A record cut off by a crash is dropped, so new records start on a record boundary
+            self.journalFile.truncate(resumeFrom.validLength)
+            self.journalFile.seek(resumeFrom.validLength)
+            self.plyCount = resumeFrom.plyCount
+
+    @classmethod
+    def resume(cls, journalPath, snapshotInterval=defaultSnapshotInterval, fsyncPolicy="snapshot", **boardOptions):
+        # Reopens a journal after its last complete move and returns the journal with the restored board
+        journalContents = readJournal(journalPath)
+        gameBoard = loadGameBoard(journalContents, **boardOptions)
+        return cls(journalPath, gameBoard, snapshotInterval, fsyncPolicy, resumeFrom=journalContents)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+    def close(self):
+        if not self.journalFile.closed:
+            if self.fsyncPolicy != "never":
+                os.fsync(self.journalFile.fileno())
+            self.journalFile.close()
+
+    def writeSnapshot(self):
+        self.journalFile.write(snapshotRecordFormat.pack(snapshotRecordType, self.plyCount, self.gameBoard.zobristHash,
+                                                         self.gameBoard.toBinary()))
+        if self.fsyncPolicy != "never":
+            os.fsync(self.journalFile.fileno())
+
+    def recordMove(self, bitboardMove):
+        # Call after bitboardMove was played on the board, so the record holds the position it led to
+        self.plyCount += 1
+        self.journalFile.write(moveRecordFormat.pack(moveRecordType, bitboardMove, self.gameBoard.zobristHash))
+        if self.snapshotInterval and self.plyCount % self.snapshotInterval == 0:
+            self.writeSnapshot()
+        elif self.fsyncPolicy == "always":
+            os.fsync(self.journalFile.fileno())
+
+    def playMove(self, chessPiece, legalMove):
+        # Plays a move on the journal's board with movePiece, as the interface does, and records it
+        bitboardMove = self.gameBoard.convertToBitboardMove(chessPiece, legalMove)
+        chessPiece.movePiece(*legalMove)
+        self.recordMove(bitboardMove)
+
+    def makeMove(self, chessPiece, legalMove):
+        # Plays a move with makeMove, which skips movePiece's checkmate and draw detection, and records it
+        bitboardMove = self.gameBoard.convertToBitboardMove(chessPiece, legalMove)
+        self.gameBoard.makeMove(chessPiece, legalMove)
+        self.recordMove(bitboardMove)
+
+
+def playRandomGame(plyCount, randomGenerator):
+    # The bitboard moves of a game of random legal moves, ending early if the game does
+    gameBoard = gameClasses.GameBoard()
+    bitboardMoveList = []
+    for _ in range(plyCount):
+        legalMoveList = gameBoard.generateLegalMoves()
+        if gameBoard.findGameStatus(legalMoveList) != "ongoing":
+            break
+        chessPiece, legalMove = randomGenerator.choice(legalMoveList)
+        bitboardMoveList.append(gameBoard.convertToBitboardMove(chessPiece, legalMove))
+        gameBoard.makeMove(chessPiece, legalMove)
+    return bitboardMoveList
+
+
+def runBenchmark(journalPath, plyCount, snapshotInterval, seed=0):
+    # Journals the same random game under each fsync policy, then resumes it from the end with and without snapshots.
+    # Write throughput counts only the time spent writing records, not playing the moves.
+    bitboardMoveList = playRandomGame(plyCount, random.Random(seed))
+    print(f"random game of {len(bitboardMoveList)} plies, snapshot every {snapshotInterval} plies")
+    for fsyncPolicy in GameJournal.fsyncPolicyList:
+        gameBoard = gameClasses.GameBoard()
+        writeTime = 0.0
+        with GameJournal(journalPath, gameBoard, snapshotInterval, fsyncPolicy) as journal:
+            for bitboardMove in bitboardMoveList:
+                gameBoard.makeMove(*gameBoard.convertBitboardMove(bitboardMove))
+                startTime = time.perf_counter()
+                journal.recordMove(bitboardMove)
+                writeTime += time.perf_counter() - startTime
+        print(f"fsync {fsyncPolicy:<9} {len(bitboardMoveList) / writeTime if writeTime > 0 else 0.0:>10.0f} moves/s  "
+              f"{os.path.getsize(journalPath)} bytes")
+
+    for resumeInterval, resumeLabel in [(snapshotInterval, "from the nearest snapshot"), (0, "replaying every move")]:
+        with GameJournal(journalPath, gameClasses.GameBoard(), resumeInterval, "never") as journal:
+            for bitboardMove in bitboardMoveList:
+                journal.makeMove(*journal.gameBoard.convertBitboardMove(bitboardMove))
+            finalFEN = journal.gameBoard.toFEN()
+        startTime = time.perf_counter()
+        resumedGameBoard = loadGameBoard(readJournal(journalPath))
+        resumeTime = time.perf_counter() - startTime
+        if resumedGameBoard.toFEN() != finalFEN:
+            raise ValueError(f"Resumed position {resumedGameBoard.toFEN()} differs from {finalFEN}")
+        print(f"resume {resumeLabel:<26} {resumeTime * 1000:8.2f} ms")
+    os.remove(journalPath)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect game journals, or benchmark writing and resuming them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    showParser = subparsers.add_parser("show")
+    showParser.add_argument("journalPath")
+    showParser.add_argument("--ply", type=int, help="show the position after this many moves instead of the last one")
+    benchmarkParser = subparsers.add_parser("benchmark")
+    benchmarkParser.add_argument("--journal", default="benchmark.journal", help="scratch file, removed afterwards")
+    benchmarkParser.add_argument("--plies", type=int, default=400)
+    benchmarkParser.add_argument("--snapshot-interval", type=int, default=defaultSnapshotInterval)
+    benchmarkParser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    if arguments.command == "benchmark":
+        runBenchmark(arguments.journal, arguments.plies, arguments.snapshot_interval, arguments.seed)
+        return 0
+
+    journalContents = readJournal(arguments.journalPath)
+    gameBoard = loadGameBoard(journalContents, arguments.ply)
+    print(f"{journalContents.plyCount} moves, snapshots at plies {sorted(journalContents.snapshotDict)}")
+    print(gameBoard.toFEN())
+    print(gameBoard.findGameStatus())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import gameClasses
+
+logger = logging.getLogger(__name__)
+
+defaultHost = "127.0.0.1"
+defaultPort = 8765
+
+# The protocol is one JSON object per line in each direction. Requests carry a "type" and an optional "id", which is
+# copied into the response:
+#   {"type": "newGame", "fen": optional}              -> {"type": "gameCreated", "gameId", "fen", "status"}
+#   {"type": "watchGame", "gameId"}                   -> {"type": "watching", "gameId", "fen", "status"}
+#   {"type": "move", "gameId", "move": "e2e4"}        -> {"type": "moved", "gameId", "move", "fen", "status"}
+#   {"type": "legalMoves", "gameId"}                  -> {"type": "legalMoves", "gameId", "moves"}
+#   {"type": "status", "gameId"}                      -> {"type": "status", "gameId", "fen", "status", "plyCount"}
+#   {"type": "closeGame", "gameId"}                   -> {"type": "gameClosed", "gameId"}
+# Failed requests get {"type": "error", "message"}. Every connection that created or watches a game also receives
+# {"type": "gameEvent", "gameId", "move", "fen", "status"} after each move made in it by another connection.
+
+
+class GameSession:
+    def __init__(self, gameId, gameBoard, status):
+        self.gameId = gameId
+        self.gameBoard = gameBoard
+        # A GameBoard is not safe to use from two threads at once, so work on one game is done one request at a time
+        self.lock = asyncio.Lock()
+        self.watcherSet = set()
+        self.status = status
+        self.plyCount = 0
+
+
+def createGameBoard(fenString):
+    # Runs in the executor. Returns the new board and its game status.
+    gameBoard = gameClasses.GameBoard(fenString=fenString)
+    return gameBoard, gameBoard.findGameStatus()
+
+
+def playMove(gameBoard, moveNotation):
+    # Runs in the executor. Returns the game status after the move.
+    foundMove = gameBoard.findMoveFromCoordinateNotation(moveNotation)
+    if foundMove is None:
+        raise ValueError(f"Illegal move: {moveNotation}")
+    gameBoard.makeMove(*foundMove)
+    return gameBoard.findGameStatus()
+
+
+def findLegalMoveNotations(gameBoard):
+    return [gameClasses.convertMoveToCoordinateNotation(chessPiece, legalMove) for chessPiece, legalMove in gameBoard.generateLegalMoves()]
+
+
+class GameServer:
+    # Hosts any number of games over TCP. Move validation, move generation and board setup run in a thread pool, so
+    # the event loop keeps serving every other game while one position is being worked on.
+    def __init__(self, host=defaultHost, port=defaultPort, workers=None):
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4))
+        self.sessionDict = {}
+        self.gameIdCounter = itertools.count(1)
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handleConnection, self.host, self.port)
+        # With port 0 the operating system picks a free port
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Game server listening on %s:%d", self.host, self.port)
+
+    async def serveForever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def runInExecutor(self, function, *arguments):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *arguments)
+
+    async def handleConnection(self, reader, writer):
+        peerName = writer.get_extra_info("peername")
+        logger.debug("Connection from %s", peerName)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Requests must be JSON objects")
+                    response = await self.handleRequest(request, writer)
+                except (ValueError, KeyError, TypeError) as error:
+                    response = {"type": "error", "message": str(error)}
+                if isinstance(request, dict) and "id" in request:
+                    response["id"] = request["id"]
+                await self.sendMessage(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            for session in self.sessionDict.values():
+                session.watcherSet.discard(writer)
+            writer.close()
+            logger.debug("Connection from %s closed", peerName)
+
+    async def sendMessage(self, writer, message):
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+
+    def findSession(self, request):
+        session = self.sessionDict.get(request["gameId"])
+        if session is None:
+            raise ValueError(f"Unknown game: {request['gameId']}")
+        return session
+
+    async def handleRequest(self, request, writer):
+        requestType = request.get("type")
+        if requestType == "newGame":
+            gameBoard, status = await self.runInExecutor(createGameBoard, request.get("fen"))
+            session = GameSession(next(self.gameIdCounter), gameBoard, status)
+            session.watcherSet.add(writer)
+            self.sessionDict[session.gameId] = session
+            return {"type": "gameCreated", "gameId": session.gameId, "fen": gameBoard.toFEN(), "status": session.status}
+
+        session = self.findSession(request)
+        if requestType == "watchGame":
+            session.watcherSet.add(writer)
+            async with session.lock:
+                return {"type": "watching", "gameId": session.gameId, "fen": session.gameBoard.toFEN(), "status": session.status}
+        if requestType == "move":
+            async with session.lock:
+                if session.status != "ongoing":
+                    raise ValueError(f"Game {session.gameId} is over: {session.status}")
+                session.status = await self.runInExecutor(playMove, session.gameBoard, str(request["move"]))
+                session.plyCount += 1
+                fen = session.gameBoard.toFEN()
+            gameEvent = {"type": "gameEvent", "gameId": session.gameId, "move": request["move"], "fen": fen, "status": session.status}
+            for watcher in list(session.watcherSet):
+                if watcher is not writer:
+                    try:
+                        await self.sendMessage(watcher, gameEvent)
+                    except ConnectionError:
+                        session.watcherSet.discard(watcher)
+            return {"type": "moved", "gameId": session.gameId, "move": request["move"], "fen": fen, "status": session.status}
+        if requestType == "legalMoves":
+            async with session.lock:
+                moveNotationList = await self.runInExecutor(findLegalMoveNotations, session.gameBoard)
+            return {"type": "legalMoves", "gameId": session.gameId, "moves": moveNotationList}
+        if requestType == "status":
+            async with session.lock:
+                return {"type": "status", "gameId": session.gameId, "fen": session.gameBoard.toFEN(), "status": session.status,
+                        "plyCount": session.plyCount}
+        if requestType == "closeGame":
+            del self.sessionDict[session.gameId]
+            return {"type": "gameClosed", "gameId": session.gameId}
+        raise ValueError(f"Unknown request type: {requestType}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve many headless games over a TCP JSON lines protocol.")
+    parser.add_argument("--host", default=defaultHost)
+    parser.add_argument("--port", type=int, default=defaultPort)
+    parser.add_argument("--workers", type=int, help="threads used for move validation")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(GameServer(arguments.host, arguments.port, arguments.workers).serveForever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,165 @@
+import contextlib
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import time
+
+logger = logging.getLogger(__name__)
+
+# Latency histograms have one bucket per power of two nanoseconds, so bucket 11 counts calls of 1024 to 2047ns
+histogramBucketCount = 40
+
+
+class TimingHistogram:
+    def __init__(self, statName):
+        self.statName = statName
+        self.clear()
+
+    def clear(self):
+        self.callCount = 0
+        self.totalTime = 0
+        self.minTime = None
+        self.maxTime = 0
+        self.bucketCountList = [0] * histogramBucketCount
+
+    def record(self, elapsedNanoseconds):
+        self.callCount += 1
+        self.totalTime += elapsedNanoseconds
+        if self.minTime is None or elapsedNanoseconds < self.minTime:
+            self.minTime = elapsedNanoseconds
+        if elapsedNanoseconds > self.maxTime:
+            self.maxTime = elapsedNanoseconds
+        self.bucketCountList[min(elapsedNanoseconds.bit_length(), histogramBucketCount - 1)] += 1
+
+    def findPercentile(self, percentile):
+        # The upper edge of the bucket holding the given percentile, in nanoseconds
+        if not self.callCount:
+            return 0
+        targetCount = self.callCount * percentile / 100
+        cumulativeCount = 0
+        for bucketIndex, bucketCount in enumerate(self.bucketCountList):
+            cumulativeCount += bucketCount
+            if cumulativeCount >= targetCount:
+                return min(1 << bucketIndex, self.maxTime)
+        return self.maxTime
+
+    def toDict(self):
+        # Times are in nanoseconds. The histogram maps each nonempty bucket's upper edge to its call count.
+        return {"calls": self.callCount,
+                "totalTime": self.totalTime,
+                "meanTime": self.totalTime / self.callCount if self.callCount else 0.0,
+                "minTime": self.minTime or 0,
+                "maxTime": self.maxTime,
+                "p50": self.findPercentile(50),
+                "p99": self.findPercentile(99),
+                "histogram": {1 << bucketIndex: bucketCount for bucketIndex, bucketCount in enumerate(self.bucketCountList)
+                              if bucketCount}}
+
+
+# (owner class, method name) -> stat name, for every method that can be instrumented
+registeredMethodDict = {}
+# Stat name -> TimingHistogram
+histogramDict = {}
+# (owner class, method name) -> the original function, while instrumentation is enabled
+originalMethodDict = {}
+
+
+def registerMethod(ownerClass, methodName, statName=None):
+    # Adds a method to the ones timed while instrumentation is enabled. Registering costs nothing until then.
+    statName = statName or methodName
+    registeredMethodDict[(ownerClass, methodName)] = statName
+    histogramDict.setdefault(statName, TimingHistogram(statName))
+    if originalMethodDict:
+        wrapMethod(ownerClass, methodName)
+
+
+def wrapMethod(ownerClass, methodName):
+    originalMethod = ownerClass.__dict__[methodName]
+    histogram = histogramDict[registeredMethodDict[(ownerClass, methodName)]]
+    findTime = time.perf_counter_ns
+
+    @functools.wraps(originalMethod)
+    def timedMethod(*arguments, **keywordArguments):
+        startTime = findTime()
+        try:
+            return originalMethod(*arguments, **keywordArguments)
+        finally:
+            histogram.record(findTime() - startTime)
+
+    originalMethodDict[(ownerClass, methodName)] = originalMethod
+    setattr(ownerClass, methodName, timedMethod)
+
+
+def isEnabled():
+    return bool(originalMethodDict)
+
+
+def enable():
+    # Swaps each registered method for a timed wrapper. While disabled the original methods are in place, so there is
+    # no overhead at all. Counting is not synchronised, so timings from several threads at once may lose a few calls.
+    if isEnabled():
+        return
+    for ownerClass, methodName in registeredMethodDict:
+        wrapMethod(ownerClass, methodName)
+    logger.debug("Instrumentation enabled for %d methods", len(originalMethodDict))
+
+
+def disable():
+    # Puts the original methods back. Collected stats are kept until reset.
+    for (ownerClass, methodName), originalMethod in originalMethodDict.items():
+        setattr(ownerClass, methodName, originalMethod)
+    originalMethodDict.clear()
+
+
+def reset():
+    for histogram in histogramDict.values():
+        histogram.clear()
+
+
+def collectStats():
+    return {statName: histogram.toDict() for statName, histogram in sorted(histogramDict.items())}
+
+
+def formatStats(statDict=None):
+    # One line per instrumented method, with times in microseconds
+    if statDict is None:
+        statDict = collectStats()
+    lineList = [f"{'method':<36}{'calls':>12}{'total ms':>12}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'max us':>10}"]
+    for statName, stats in statDict.items():
+        if stats["calls"]:
+            lineList.append(f"{statName:<36}{stats['calls']:>12}{stats['totalTime'] / 1e6:>12.1f}{stats['meanTime'] / 1e3:>10.1f}"
+                            f"{stats['p50'] / 1e3:>10.1f}{stats['p99'] / 1e3:>10.1f}{stats['maxTime'] / 1e3:>10.1f}")
+    return "\n".join(lineList)
+
+
+@contextlib.contextmanager
+def instrumented(resetStats=True):
+    # Enables instrumentation for the block, then puts it back the way it was
+    wasEnabled = isEnabled()
+    if resetStats:
+        reset()
+    enable()
+    try:
+        yield
+    finally:
+        if not wasEnabled:
+            disable()
+
+
+@contextlib.contextmanager
+def profiled(outputPath=None, sortKey="cumulative", lineCount=30):
+    # Runs the block under cProfile. The profile is written to outputPath for pstats or snakeviz when one is given,
+    # and the top lineCount functions by sortKey are logged either way.
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if outputPath:
+            profiler.dump_stats(outputPath)
+        statStream = io.StringIO()
+        pstats.Stats(profiler, stream=statStream).sort_stats(sortKey).print_stats(lineCount)
+        logger.info("Profile by %s:\n%s", sortKey, statStream.getvalue())
@@ -0,0 +1,76 @@
+import sys
+from collections import OrderedDict
+
+
+class LegalMoveCache:
+    # Least recently used cache of legal move lists, keyed by (position hash, player color). Move lists are stored
+    # in a board independent form of square numbers, so one cache can be shared by any number of GameBoards.
+    # Memory use is an estimate of the stored objects' sizes, which is kept under maxMemoryBytes by evicting the least
+    # recently used entries.
+    entryOverheadBytes = 200
+
+    def __init__(self, maxMemoryBytes=16 * 1024 * 1024):
+        if maxMemoryBytes <= 0:
+            raise ValueError(f"The cache memory ceiling must be positive: {maxMemoryBytes}")
+        self.maxMemoryBytes = maxMemoryBytes
+        self.entryDict = OrderedDict()
+        self.memoryUsed = 0
+        self.hitCount = 0
+        self.missCount = 0
+        self.evictionCount = 0
+
+    def __len__(self):
+        return len(self.entryDict)
+
+    def __contains__(self, cacheKey):
+        return cacheKey in self.entryDict
+
+    def lookup(self, cacheKey):
+        # Returns the stored move tuple, or None on a miss
+        entry = self.entryDict.get(cacheKey)
+        if entry is None:
+            self.missCount += 1
+            return None
+        self.entryDict.move_to_end(cacheKey)
+        self.hitCount += 1
+        return entry[0]
+
+    def store(self, cacheKey, encodedMoveTuple):
+        entrySize = LegalMoveCache.findEntrySize(encodedMoveTuple)
+        if entrySize > self.maxMemoryBytes:
+            return
+        previousEntry = self.entryDict.pop(cacheKey, None)
+        if previousEntry is not None:
+            self.memoryUsed -= previousEntry[1]
+        self.entryDict[cacheKey] = (encodedMoveTuple, entrySize)
+        self.memoryUsed += entrySize
+        while self.memoryUsed > self.maxMemoryBytes:
+            _, (_, evictedEntrySize) = self.entryDict.popitem(last=False)
+            self.memoryUsed -= evictedEntrySize
+            self.evictionCount += 1
+
+    def clear(self):
+        # The counters go too, so stats describe only the cache as it has been since
+        self.entryDict.clear()
+        self.memoryUsed = 0
+        self.hitCount = 0
+        self.missCount = 0
+        self.evictionCount = 0
+
+    def stats(self):
+        lookupCount = self.hitCount + self.missCount
+        return {"entries": len(self.entryDict),
+                "memoryUsed": self.memoryUsed,
+                "maxMemoryBytes": self.maxMemoryBytes,
+                "hits": self.hitCount,
+                "misses": self.missCount,
+                "evictions": self.evictionCount,
+                "hitRate": self.hitCount / lookupCount if lookupCount else 0.0}
+
+    @staticmethod
+    def findEntrySize(encodedMoveTuple):
+        # The squares and promotion classes inside each move are shared objects, so only the tuples are counted
+        entrySize = LegalMoveCache.entryOverheadBytes + sys.getsizeof(encodedMoveTuple)
+        for encodedMove in encodedMoveTuple:
+            entrySize += sys.getsizeof(encodedMove)
+        return entrySize
@@ -0,0 +1,187 @@
+import argparse
+import logging
+import mmap
+import os
+import random
+import struct
+
+import gameClasses
+import legalMoveCache
+import pgnReplay
+
+logger = logging.getLogger(__name__)
+
+# A book file is a header followed by records sorted by position hash. Each record is the Zobrist hash of a position,
+# a move played from it in the bitboard backend's packed format, the move's weight and the number of games it was
+# played in. Moves score two points per win, one per draw and none per loss for the side that played them.
+bookMagic = b"CHBK"
+bookVersion = 1
+headerFormat = struct.Struct("<4sHHI")
+recordFormat = struct.Struct("<QIII")
+hashFormat = struct.Struct("<Q")
+defaultMaxPly = 20
+# Weight given to each side's moves by a game's result
+resultWeightDict = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1), "*": (1, 1)}
+
+
+def buildOpeningBook(pgnFileList, bookPath, maxPly=defaultMaxPly, minCount=1):
+    # Replays the first maxPly plies of every game in the PGN files and writes the book to bookPath. Moves played in
+    # fewer than minCount games are left out. Returns the number of records written.
+    moveStatsDict = {}
+    sharedLegalMoveCache = legalMoveCache.LegalMoveCache()
+    gameCount = 0
+    for pgnFile in pgnFileList:
+        for tagDict, moveText in pgnReplay.readPGNGames(pgnFile):
+            gameCount += 1
+            sanMoveList, resultToken = pgnReplay.splitMoveText(moveText)
+            resultWeights = resultWeightDict.get(resultToken or tagDict.get("Result", "*"), (1, 1))
+            try:
+                gameBoard = gameClasses.GameBoard(fenString=tagDict.get("FEN"), legalMoveCache=sharedLegalMoveCache)
+            except ValueError:
+                logger.debug("Game %d has an invalid FEN tag", gameCount)
+                continue
+            # A position and move repeated within one game still count as one game
+            gameRecordKeySet = set()
+            for sanMove in sanMoveList[:maxPly]:
+                foundMove = gameBoard.findMoveFromSAN(sanMove)
+                if foundMove is None:
+                    logger.debug("Game %d: illegal move %s, the rest of the game is skipped", gameCount, sanMove)
+                    break
+                recordKey = (gameBoard.zobristHash, gameBoard.convertToBitboardMove(*foundMove))
+                if recordKey in gameRecordKeySet:
+                    gameBoard.makeMove(*foundMove)
+                    continue
+                gameRecordKeySet.add(recordKey)
+                moveStats = moveStatsDict.setdefault(recordKey, [0, 0])
+                moveStats[0] += resultWeights[0 if gameBoard.playerToMoveNext == "White" else 1]
+                moveStats[1] += 1
+                gameBoard.makeMove(*foundMove)
+
+    recordList = sorted((zobristHash, bookMove, weight, count) for (zobristHash, bookMove), (weight, count)
+                        in moveStatsDict.items() if count >= minCount)
+    # Written next to the destination and renamed, so a book that is open elsewhere is never seen half written
+    temporaryPath = f"{bookPath}.tmp"
+    with open(temporaryPath, "wb") as bookFile:
+        bookFile.write(headerFormat.pack(bookMagic, bookVersion, recordFormat.size, len(recordList)))
+        for zobristHash, bookMove, weight, count in recordList:
+            bookFile.write(recordFormat.pack(zobristHash, bookMove, min(weight, 0xFFFFFFFF), min(count, 0xFFFFFFFF)))
+    os.replace(temporaryPath, bookPath)
+    logger.info("Wrote %d book moves from %d games to %s", len(recordList), gameCount, bookPath)
+    return len(recordList)
+
+
+class OpeningBook:
+    # Read-only view of a book file. The file is memory mapped rather than loaded, so opening a book costs nothing
+    # and every process using the same file shares the operating system's cached pages. Lookups binary search the
+    # records for the position hash.
+    def __init__(self, bookPath):
+        self.bookPath = bookPath
+        with open(bookPath, "rb") as bookFile:
+            self.bookMap = mmap.mmap(bookFile.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.bookMap) < headerFormat.size:
+            self.close()
+            raise ValueError(f"Not an opening book file: {bookPath}")
+        magic, version, recordSize, recordCount = headerFormat.unpack_from(self.bookMap, 0)
+        if magic != bookMagic or version != bookVersion or recordSize != recordFormat.size or \
+                len(self.bookMap) != headerFormat.size + recordCount * recordSize:
+            self.close()
+            raise ValueError(f"Not an opening book file, or a different version: {bookPath}")
+        self.recordCount = recordCount
+
+    def __len__(self):
+        return self.recordCount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+    def __getstate__(self):
+        # Worker processes map the file themselves instead of receiving a copy of it
+        return {"bookPath": self.bookPath}
+
+    def __setstate__(self, state):
+        self.__init__(state["bookPath"])
+
+    def close(self):
+        self.bookMap.close()
+
+    def findRecordHash(self, recordIndex):
+        return hashFormat.unpack_from(self.bookMap, headerFormat.size + recordIndex * recordFormat.size)[0]
+
+    def lookup(self, zobristHash):
+        # Returns (packed move, weight, count) for every book move of the position
+        lowIndex, highIndex = 0, self.recordCount
+        while lowIndex < highIndex:
+            middleIndex = (lowIndex + highIndex) // 2
+            if self.findRecordHash(middleIndex) < zobristHash:
+                lowIndex = middleIndex + 1
+            else:
+                highIndex = middleIndex
+
+        bookEntryList = []
+        for recordIndex in range(lowIndex, self.recordCount):
+            recordHash, bookMove, weight, count = recordFormat.unpack_from(self.bookMap, headerFormat.size + recordIndex * recordFormat.size)
+            if recordHash != zobristHash:
+                break
+            bookEntryList.append((bookMove, weight, count))
+        return bookEntryList
+
+    def findBookMoves(self, gameBoard):
+        # The book moves of gameBoard's side to move as (piece, move, weight, count). A move whose origin square does
+        # not hold a piece of the side to move can only come from a hash collision and is skipped.
+        bookMoveList = []
+        for bookMove, weight, count in self.lookup(gameBoard.zobristHash):
+            chessPiece, legalMove = gameBoard.convertBitboardMove(bookMove)
+            if chessPiece is None or chessPiece.playerColor != gameBoard.playerToMoveNext:
+                continue
+            bookMoveList.append((chessPiece, legalMove, weight, count))
+        return bookMoveList
+
+    def chooseMove(self, gameBoard, randomGenerator=None):
+        # Picks a book move in proportion to its weight, or by game count when every move has lost. Returns a
+        # (piece, move) pair or None when the position is not in the book.
+        bookMoveList = self.findBookMoves(gameBoard)
+        if not bookMoveList:
+            return None
+        randomGenerator = randomGenerator or random
+        weightList = [weight for _, _, weight, _ in bookMoveList]
+        if not any(weightList):
+            weightList = [count for _, _, _, count in bookMoveList]
+        chessPiece, legalMove, _, _ = randomGenerator.choices(bookMoveList, weights=weightList)[0]
+        return chessPiece, legalMove
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book from PGN files, or list the book moves of a "
+                                                 "position.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    buildParser = subparsers.add_parser("build")
+    buildParser.add_argument("bookPath")
+    buildParser.add_argument("pgnFiles", nargs="+")
+    buildParser.add_argument("--max-ply", type=int, default=defaultMaxPly)
+    buildParser.add_argument("--min-count", type=int, default=1)
+    probeParser = subparsers.add_parser("probe")
+    probeParser.add_argument("bookPath")
+    probeParser.add_argument("--fen", help="the position to look up, the start position by default")
+    arguments = parser.parse_args()
+
+    if arguments.command == "build":
+        recordCount = buildOpeningBook(arguments.pgnFiles, arguments.bookPath, maxPly=arguments.max_ply,
+                                       minCount=arguments.min_count)
+        print(f"{recordCount} book moves written to {arguments.bookPath}")
+        return 0
+
+    with OpeningBook(arguments.bookPath) as bookToProbe:
+        gameBoard = gameClasses.GameBoard(fenString=arguments.fen, openingBook=bookToProbe)
+        bookMoveList = gameBoard.findBookMoves()
+        for chessPiece, legalMove, weight, count in sorted(bookMoveList, key=lambda bookMove: -bookMove[2]):
+            print(f"{gameClasses.convertMoveToCoordinateNotation(chessPiece, legalMove)}  weight {weight}  games {count}")
+        if not bookMoveList:
+            print("Position not in book")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import gameClasses
+
+# Positions used by the speedup benchmark, with the depth each is expanded to
+benchmarkPositionList = [
+    ("Start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 4),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3),
+    ("Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 5),
+]
+
+
+class TreeExpansionResult:
+    def __init__(self, leafCount=0, checkmateCount=0, stalemateCount=0):
+        # Positions exactly depth plies from the root, and how many of those are checkmate or stalemate
+        self.leafCount = leafCount
+        self.checkmateCount = checkmateCount
+        self.stalemateCount = stalemateCount
+        self.elapsedTime = 0.0
+        # The counts below each root move, keyed by coordinate notation
+        self.rootMoveCountDict = {}
+
+    def addCounts(self, leafCount, checkmateCount, stalemateCount):
+        self.leafCount += leafCount
+        self.checkmateCount += checkmateCount
+        self.stalemateCount += stalemateCount
+
+
+def countTerminalLeaves(gameBoard, depth):
+    # Returns (leaf count, checkmate count, stalemate count) for the positions depth plies below the board
+    playerColor = gameBoard.playerToMoveNext
+    legalMoveList = gameBoard.generateLegalMoves(playerColor)
+    if depth == 0:
+        if gameBoard.checkIfCheckmate(playerColor, legalMoveList):
+            return 1, 1, 0
+        if gameBoard.checkIfStalemate(playerColor, legalMoveList):
+            return 1, 0, 1
+        return 1, 0, 0
+    leafCount = checkmateCount = stalemateCount = 0
+    for chessPiece, legalMove in legalMoveList:
+        undoRecord = gameBoard.makeMove(chessPiece, legalMove)
+        childCounts = countTerminalLeaves(gameBoard, depth - 1)
+        gameBoard.unmakeMove(undoRecord)
+        leafCount += childCounts[0]
+        checkmateCount += childCounts[1]
+        stalemateCount += childCounts[2]
+    return leafCount, checkmateCount, stalemateCount
+
+
+def countBitboardTerminalLeaves(bitboardPosition, depth):
+    legalMoveList = bitboardPosition.generateLegalMoves()
+    if depth == 0:
+        if legalMoveList:
+            return 1, 0, 0
+        if bitboardPosition.checkIfInCheck():
+            return 1, 1, 0
+        return 1, 0, 1
+    leafCount = checkmateCount = stalemateCount = 0
+    for legalMove in legalMoveList:
+        undoRecord = bitboardPosition.makeMove(legalMove)
+        childCounts = countBitboardTerminalLeaves(bitboardPosition, depth - 1)
+        bitboardPosition.unmakeMove(legalMove, undoRecord)
+        leafCount += childCounts[0]
+        checkmateCount += childCounts[1]
+        stalemateCount += childCounts[2]
+    return leafCount, checkmateCount, stalemateCount
+
+
+def expandSubtree(encodedPosition, depth, backend="object"):
+    # Runs in a worker process, which rebuilds the position from its 32 byte encoding rather than receiving a
+    # pickled board
+    gameBoard = gameClasses.GameBoard.fromBinary(encodedPosition, backend=backend)
+    if backend == "bitboard":
+        return countBitboardTerminalLeaves(gameBoard.convertToBitboardPosition(), depth)
+    return countTerminalLeaves(gameBoard, depth)
+
+
+def expandTree(gameBoard, depth, workers=1):
+    # Expands the legal move tree of gameBoard to depth plies, splitting the root moves across a pool of worker
+    # processes. With one worker everything runs in this process.
+    if workers < 1:
+        raise ValueError(f"At least one worker is needed: {workers}")
+    if depth < 1:
+        raise ValueError(f"Tree expansion needs a depth of at least one: {depth}")
+    startTime = time.perf_counter()
+    expansionResult = TreeExpansionResult()
+
+    rootMoveList = []
+    for chessPiece, legalMove in gameBoard.generateLegalMoves():
+        moveNotation = gameClasses.convertMoveToCoordinateNotation(chessPiece, legalMove)
+        undoRecord = gameBoard.makeMove(chessPiece, legalMove)
+        rootMoveList.append((moveNotation, gameBoard.toBinary()))
+        gameBoard.unmakeMove(undoRecord)
+
+    encodedPositionList = [encodedPosition for _, encodedPosition in rootMoveList]
+    depthList = [depth - 1] * len(rootMoveList)
+    backendList = [gameBoard.backend] * len(rootMoveList)
+    if workers == 1:
+        subtreeCountsList = list(map(expandSubtree, encodedPositionList, depthList, backendList))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as processPool:
+            subtreeCountsList = list(processPool.map(expandSubtree, encodedPositionList, depthList, backendList))
+
+    for (moveNotation, _), subtreeCounts in zip(rootMoveList, subtreeCountsList):
+        expansionResult.rootMoveCountDict[moveNotation] = subtreeCounts
+        expansionResult.addCounts(*subtreeCounts)
+    expansionResult.elapsedTime = time.perf_counter() - startTime
+    return expansionResult
+
+
+def runSpeedupBenchmark(maxWorkers, backend="object", depthOffset=0, positionList=None):
+    # Expands every benchmark position with 1, 2, 4, ... up to maxWorkers processes and prints the speedup over one
+    # worker. Every run must produce the same counts.
+    if positionList is None:
+        positionList = benchmarkPositionList
+    workerCountList = []
+    workerCount = 1
+    while workerCount < maxWorkers:
+        workerCountList.append(workerCount)
+        workerCount *= 2
+    workerCountList.append(maxWorkers)
+
+    allCountsMatched = True
+    for positionName, fenString, depth in positionList:
+        depth = max(1, depth + depthOffset)
+        singleWorkerTime = None
+        singleWorkerCounts = None
+        for workerCount in workerCountList:
+            expansionResult = expandTree(gameClasses.GameBoard.fromFEN(fenString, backend=backend), depth, workers=workerCount)
+            expansionCounts = (expansionResult.leafCount, expansionResult.checkmateCount, expansionResult.stalemateCount)
+            if singleWorkerTime is None:
+                singleWorkerTime = expansionResult.elapsedTime
+                singleWorkerCounts = expansionCounts
+            allCountsMatched = allCountsMatched and expansionCounts == singleWorkerCounts
+            print(f"{positionName:<16} depth {depth}  workers {workerCount:>3}  leaves {expansionResult.leafCount:>9}  "
+                  f"mates {expansionResult.checkmateCount:>6}  stalemates {expansionResult.stalemateCount:>4}  "
+                  f"{expansionResult.elapsedTime:8.3f}s  speedup {singleWorkerTime / expansionResult.elapsedTime:5.2f}x")
+    return allCountsMatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand the legal move tree across several processes and report the "
+                                                 "speedup over a single process.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backend", choices=gameClasses.GameBoard.backendList, default="bitboard")
+    parser.add_argument("--fen", help="expand a single position instead of running the benchmark")
+    parser.add_argument("--depth", type=int, help="depth for --fen, or an offset to the benchmark depths")
+    arguments = parser.parse_args()
+
+    if arguments.fen:
+        if arguments.depth is None:
+            parser.error("--depth is required with --fen")
+        expansionResult = expandTree(gameClasses.GameBoard.fromFEN(arguments.fen, backend=arguments.backend),
+                                     arguments.depth, workers=arguments.workers)
+        for moveNotation in sorted(expansionResult.rootMoveCountDict):
+            print(f"{moveNotation}: {expansionResult.rootMoveCountDict[moveNotation][0]}")
+        print(f"leaves {expansionResult.leafCount}  mates {expansionResult.checkmateCount}  "
+              f"stalemates {expansionResult.stalemateCount}  time {expansionResult.elapsedTime:.3f}s")
+        return 0
+
+    return 0 if runSpeedupBenchmark(arguments.workers, backend=arguments.backend,
+                                    depthOffset=arguments.depth or 0) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
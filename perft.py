@@ -0,0 +1,170 @@
+import argparse
+import contextlib
+import logging
+import time
+
+import bitboardBackend
+import gameClasses
+import instrumentation
+
+# Reference positions and their published leaf node counts for depths 1, 2, 3, ...
+referencePositionList = [
+    ("Start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609]),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("Position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("Position 4 mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+     [6, 264, 9467, 422333]),
+    ("Position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("Position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def countLeafNodes(gameBoard, depth):
+    if depth == 0:
+        return 1
+    legalMoveList = gameBoard.generateLegalMoves()
+    if depth == 1:
+        return len(legalMoveList)
+    nodeCount = 0
+    for chessPiece, legalMove in legalMoveList:
+        undoRecord = gameBoard.makeMove(chessPiece, legalMove)
+        nodeCount += countLeafNodes(gameBoard, depth - 1)
+        gameBoard.unmakeMove(undoRecord)
+    return nodeCount
+
+
+def countBitboardLeafNodes(bitboardPosition, depth):
+    if depth == 0:
+        return 1
+    legalMoveList = bitboardPosition.generateLegalMoves()
+    if depth == 1:
+        return len(legalMoveList)
+    nodeCount = 0
+    for legalMove in legalMoveList:
+        undoRecord = bitboardPosition.makeMove(legalMove)
+        nodeCount += countBitboardLeafNodes(bitboardPosition, depth - 1)
+        bitboardPosition.unmakeMove(legalMove, undoRecord)
+    return nodeCount
+
+
+def convertBitboardMoveToCoordinateNotation(bitboardMove):
+    moveNotation = gameClasses.convertSquareIndexToPosition(
+        gameClasses.bitboardSquareToSquareIndexList[bitboardBackend.findMoveOrigin(bitboardMove)])
+    moveNotation += gameClasses.convertSquareIndexToPosition(
+        gameClasses.bitboardSquareToSquareIndexList[bitboardBackend.findMoveTarget(bitboardMove)])
+    promotionType = bitboardBackend.findMovePromotionType(bitboardMove)
+    if promotionType:
+        moveNotation += gameClasses.GameBoard.pieceClassList[promotionType].notationLetter.lower()
+    return moveNotation
+
+
+def perft(gameBoard, depth):
+    # Counts the leaf nodes of the legal move tree, using the board's own backend
+    if gameBoard.backend == "bitboard":
+        return countBitboardLeafNodes(gameBoard.convertToBitboardPosition(), depth)
+    return countLeafNodes(gameBoard, depth)
+
+
+def perftDivide(gameBoard, depth):
+    # Returns the leaf node count below each root move, keyed by coordinate notation like "e2e4" or "a7a8q"
+    divideDict = {}
+    if gameBoard.backend == "bitboard":
+        bitboardPosition = gameBoard.convertToBitboardPosition()
+        for legalMove in bitboardPosition.generateLegalMoves():
+            undoRecord = bitboardPosition.makeMove(legalMove)
+            divideDict[convertBitboardMoveToCoordinateNotation(legalMove)] = \
+                countBitboardLeafNodes(bitboardPosition, depth - 1)
+            bitboardPosition.unmakeMove(legalMove, undoRecord)
+        return divideDict
+
+    for chessPiece, legalMove in gameBoard.generateLegalMoves():
+        moveNotation = gameClasses.convertMoveToCoordinateNotation(chessPiece, legalMove)
+        undoRecord = gameBoard.makeMove(chessPiece, legalMove)
+        divideDict[moveNotation] = countLeafNodes(gameBoard, depth - 1)
+        gameBoard.unmakeMove(undoRecord)
+    return divideDict
+
+
+def runPerft(fenString, depth, backend="object", divide=False):
+    gameBoard = gameClasses.GameBoard.fromFEN(fenString, backend=backend)
+    startTime = time.perf_counter()
+    if divide:
+        divideDict = perftDivide(gameBoard, depth)
+        nodeCount = sum(divideDict.values())
+    else:
+        divideDict = None
+        nodeCount = perft(gameBoard, depth)
+    elapsedTime = time.perf_counter() - startTime
+    nodesPerSecond = nodeCount / elapsedTime if elapsedTime > 0 else 0.0
+    return nodeCount, elapsedTime, nodesPerSecond, divideDict
+
+
+def runReferenceSuite(backend="object", maxDepth=None, maxNodes=100000):
+    # Runs every reference position up to the deepest depth whose known count stays within maxNodes.
+    # Returns True if every count matched.
+    allPassed = True
+    for positionName, fenString, expectedNodeCountList in referencePositionList:
+        for depth, expectedNodeCount in enumerate(expectedNodeCountList, start=1):
+            if maxDepth is not None and depth > maxDepth:
+                break
+            if expectedNodeCount > maxNodes and depth > 1:
+                break
+            nodeCount, elapsedTime, nodesPerSecond, _ = runPerft(fenString, depth, backend=backend)
+            passed = nodeCount == expectedNodeCount
+            allPassed = allPassed and passed
+            print(f"{'ok  ' if passed else 'FAIL'} {positionName:<20} depth {depth}  "
+                  f"nodes {nodeCount:>9} (expected {expectedNodeCount:>9})  "
+                  f"{elapsedTime:8.3f}s  {nodesPerSecond:10.0f} nps")
+    return allPassed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count move generator leaf nodes (perft) and check them against "
+                                                 "known reference counts.")
+    parser.add_argument("--fen", help="run a single position instead of the reference suite")
+    parser.add_argument("--depth", type=int, help="search depth (required with --fen)")
+    parser.add_argument("--backend", choices=gameClasses.GameBoard.backendList, default="object")
+    parser.add_argument("--divide", action="store_true", help="print the node count below each root move")
+    parser.add_argument("--max-nodes", type=int, default=100000,
+                        help="skip reference depths whose known count is larger than this")
+    parser.add_argument("--stats", action="store_true", help="time the board's hot methods and print their latencies")
+    parser.add_argument("--profile", nargs="?", const="", metavar="PATH",
+                        help="run under cProfile, print the top functions and optionally save the profile to PATH")
+    arguments = parser.parse_args()
+
+    if arguments.fen and arguments.depth is None:
+        parser.error("--depth is required with --fen")
+    # Stats and the profile cover whichever run was asked for, a single position or the whole suite
+    with contextlib.ExitStack() as exitStack:
+        if arguments.stats:
+            exitStack.enter_context(instrumentation.instrumented())
+        if arguments.profile is not None:
+            logging.basicConfig(level=logging.INFO, format="%(message)s")
+            exitStack.enter_context(instrumentation.profiled(arguments.profile or None))
+        if arguments.fen:
+            nodeCount, elapsedTime, nodesPerSecond, divideDict = runPerft(arguments.fen, arguments.depth,
+                                                                          backend=arguments.backend,
+                                                                          divide=arguments.divide)
+        else:
+            suitePassed = runReferenceSuite(backend=arguments.backend, maxDepth=arguments.depth,
+                                            maxNodes=arguments.max_nodes)
+    if arguments.stats:
+        print(instrumentation.formatStats(gameClasses.GameBoard.stats()))
+    if not arguments.fen:
+        return 0 if suitePassed else 1
+    if divideDict is not None:
+        for moveNotation in sorted(divideDict):
+            print(f"{moveNotation}: {divideDict[moveNotation]}")
+    print(f"nodes {nodeCount}  time {elapsedTime:.3f}s  {nodesPerSecond:.0f} nps")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
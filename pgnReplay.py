@@ -0,0 +1,176 @@
+import argparse
+import logging
+import re
+
+import gameClasses
+
+logger = logging.getLogger(__name__)
+
+pgnTagPattern = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+pgnCommentPattern = re.compile(r"\{[^}]*\}|;[^\n]*")
+pgnVariationPattern = re.compile(r"\([^()]*\)")
+pgnMoveNumberPattern = re.compile(r"^\d+\.+")
+pgnResultList = ["1-0", "0-1", "1/2-1/2", "*"]
+
+
+class GameReplayResult:
+    def __init__(self, gameIndex, tagDict):
+        self.gameIndex = gameIndex
+        self.tagDict = tagDict
+        self.isLegal = True
+        # The first move that could not be played, in SAN, and its ply number counted from one
+        self.illegalMove = None
+        self.illegalMovePly = None
+        self.plyCount = 0
+        # "checkmate", "stalemate", "draw", "ongoing" or "illegal"
+        self.finalStatus = "ongoing"
+        self.isCheckmate = False
+        self.isStalemate = False
+        self.isDraw = False
+        self.finalFEN = None
+        # The result given by the game's movetext or Result tag, like "1-0"
+        self.declaredResult = tagDict.get("Result", "*")
+
+    def __repr__(self):
+        return f"GameReplayResult(gameIndex={self.gameIndex}, finalStatus={self.finalStatus!r}, plyCount={self.plyCount})"
+
+
+def readPGNGames(pgnFile):
+    # Yields (tag dict, movetext) for one game at a time, reading pgnFile line by line, so only the current game is
+    # ever held in memory. pgnFile is a path or an open text file.
+    if isinstance(pgnFile, str):
+        with open(pgnFile, encoding="utf-8", errors="replace") as openedPGNFile:
+            yield from readPGNGames(openedPGNFile)
+        return
+
+    tagDict = {}
+    moveTextLineList = []
+    unclosedCommentCount = 0
+    for line in pgnFile:
+        strippedLine = line.strip()
+        if strippedLine.startswith("%"):
+            continue
+        tagMatch = pgnTagPattern.match(strippedLine)
+        if tagMatch:
+            # A tag after movetext starts the next game
+            if moveTextLineList:
+                yield tagDict, " ".join(moveTextLineList)
+                tagDict = {}
+                moveTextLineList = []
+            tagDict[tagMatch.group(1)] = tagMatch.group(2)
+        elif strippedLine:
+            moveTextLineList.append(strippedLine)
+            unclosedCommentCount += strippedLine.count("{") - strippedLine.count("}")
+            # A result outside of a comment ends the game, even if no tags follow
+            if strippedLine.split()[-1] in pgnResultList and unclosedCommentCount <= 0:
+                yield tagDict, " ".join(moveTextLineList)
+                tagDict = {}
+                moveTextLineList = []
+                unclosedCommentCount = 0
+    if tagDict or moveTextLineList:
+        yield tagDict, " ".join(moveTextLineList)
+
+
+def splitMoveText(moveText):
+    # Returns the SAN moves of the main line and the result token, if any
+    moveText = pgnCommentPattern.sub(" ", moveText)
+    previousMoveText = None
+    while previousMoveText != moveText:
+        previousMoveText = moveText
+        moveText = pgnVariationPattern.sub(" ", moveText)
+
+    sanMoveList = []
+    resultToken = None
+    for token in moveText.split():
+        token = pgnMoveNumberPattern.sub("", token)
+        if not token or token.startswith("$"):
+            continue
+        if token in pgnResultList:
+            resultToken = token
+            continue
+        sanMoveList.append(token)
+    return sanMoveList, resultToken
+
+
+def replayGame(tagDict, moveText, gameIndex=0, backend="object"):
+    replayResult = GameReplayResult(gameIndex, tagDict)
+    sanMoveList, resultToken = splitMoveText(moveText)
+    if resultToken is not None:
+        replayResult.declaredResult = resultToken
+
+    try:
+        gameBoard = gameClasses.GameBoard(backend=backend, fenString=tagDict.get("FEN"))
+    except ValueError:
+        replayResult.isLegal = False
+        replayResult.finalStatus = "illegal"
+        logger.debug("Game %d has an invalid FEN tag", gameIndex)
+        return replayResult
+
+    for sanMove in sanMoveList:
+        foundMove = gameBoard.findMoveFromSAN(sanMove)
+        if foundMove is None:
+            replayResult.isLegal = False
+            replayResult.illegalMove = sanMove
+            replayResult.illegalMovePly = replayResult.plyCount + 1
+            replayResult.finalStatus = "illegal"
+            logger.debug("Game %d: illegal move %s at ply %d", gameIndex, sanMove, replayResult.illegalMovePly)
+            break
+        gameBoard.makeMove(*foundMove)
+        replayResult.plyCount += 1
+
+    replayResult.finalFEN = gameBoard.toFEN()
+    if not replayResult.isLegal:
+        return replayResult
+
+    playerColor = gameBoard.playerToMoveNext
+    legalMoveList = gameBoard.generateLegalMoves(playerColor)
+    if gameBoard.checkIfCheckmate(playerColor, legalMoveList):
+        replayResult.isCheckmate = True
+        replayResult.finalStatus = "checkmate"
+    elif gameBoard.checkIfStalemate(playerColor, legalMoveList):
+        replayResult.isStalemate = True
+        replayResult.isDraw = True
+        replayResult.finalStatus = "stalemate"
+    elif gameBoard.checkIfDraw() or gameBoard.movesSinceLastCaptureOrPawnMove >= 100:
+        replayResult.isDraw = True
+        replayResult.finalStatus = "draw"
+    return replayResult
+
+
+def replayPGNFile(pgnFile, backend="object"):
+    # Yields a GameReplayResult for each game in pgnFile as soon as it has been replayed
+    for gameIndex, (tagDict, moveText) in enumerate(readPGNGames(pgnFile)):
+        yield replayGame(tagDict, moveText, gameIndex=gameIndex, backend=backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay every game of one or more PGN files and check that all of "
+                                                 "their moves are legal.")
+    parser.add_argument("pgnFiles", nargs="+")
+    parser.add_argument("--backend", choices=gameClasses.GameBoard.backendList, default="object")
+    parser.add_argument("--verbose", action="store_true", help="print a line for every game, not just illegal ones")
+    arguments = parser.parse_args()
+
+    gameCount = 0
+    illegalGameCount = 0
+    finalStatusCountDict = {}
+    for pgnFile in arguments.pgnFiles:
+        for replayResult in replayPGNFile(pgnFile, backend=arguments.backend):
+            gameCount += 1
+            finalStatusCountDict[replayResult.finalStatus] = finalStatusCountDict.get(replayResult.finalStatus, 0) + 1
+            if not replayResult.isLegal:
+                illegalGameCount += 1
+            if arguments.verbose or not replayResult.isLegal:
+                gameName = f"{replayResult.tagDict.get('White', '?')} - {replayResult.tagDict.get('Black', '?')}"
+                illegalMoveText = f"  illegal move {replayResult.illegalMove} at ply {replayResult.illegalMovePly}" \
+                    if not replayResult.isLegal else ""
+                print(f"{pgnFile} game {replayResult.gameIndex + 1} ({gameName}): {replayResult.finalStatus}  "
+                      f"{replayResult.plyCount} plies  result {replayResult.declaredResult}{illegalMoveText}")
+
+    statusSummary = "  ".join(f"{finalStatus} {statusCount}" for finalStatus, statusCount in sorted(finalStatusCountDict.items()))
+    print(f"{gameCount} games, {illegalGameCount} illegal  ({statusSummary})")
+    return 1 if illegalGameCount else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,321 @@
+import time
+
+import evaluation
+import gameClasses
+
+mateScore = 100000
+# Scores beyond this are mates, counted in plies from the root
+mateThreshold = mateScore - 1000
+infiniteScore = mateScore + 1
+maxSearchPly = 128
+defaultSearchDepth = 4
+
+exactBound, lowerBound, upperBound = range(3)
+
+# Move ordering scores. Captures are ordered most valuable victim, least valuable attacker first.
+transpositionMoveOrderScore = 1000000
+captureOrderScore = 100000
+promotionOrderScore = 90000
+killerMoveOrderScoreList = [80000, 79000]
+# Quiet moves are ordered by history score, which is kept below the killer moves by halving the whole table whenever
+# one entry reaches this
+maxHistoryScore = 40000
+
+
+def encodeMove(chessPiece, legalMove):
+    # Identifies a move independently of the piece objects, for the transposition table and killer moves
+    return (chessPiece.squareIndex, legalMove[0], legalMove[3])
+
+
+def convertScoreToTable(score, ply):
+    # Mate scores are stored relative to the node rather than the root, so they stay correct at other depths
+    if score >= mateThreshold:
+        return score + ply
+    if score <= -mateThreshold:
+        return score - ply
+    return score
+
+
+def convertScoreFromTable(score, ply):
+    if score >= mateThreshold:
+        return score - ply
+    if score <= -mateThreshold:
+        return score + ply
+    return score
+
+
+class TranspositionTable:
+    # A fixed number of slots indexed by the low bits of the Zobrist hash. Entries are tuples of
+    # (hash, depth, score, bound type, encoded best move, search generation). A slot is overwritten by a search at
+    # least as deep, or by any search once its entry is left over from an earlier one.
+    def __init__(self, entryCount=1 << 20):
+        if entryCount <= 0 or entryCount & (entryCount - 1):
+            raise ValueError(f"Transposition table size must be a power of two: {entryCount}")
+        self.indexMask = entryCount - 1
+        self.entryList = [None] * entryCount
+        self.searchGeneration = 0
+
+    def probe(self, zobristHash):
+        entry = self.entryList[zobristHash & self.indexMask]
+        if entry is not None and entry[0] == zobristHash:
+            return entry
+        return None
+
+    def store(self, zobristHash, depth, score, boundType, encodedMove):
+        tableIndex = zobristHash & self.indexMask
+        entry = self.entryList[tableIndex]
+        if entry is None or depth >= entry[1] or entry[5] != self.searchGeneration:
+            self.entryList[tableIndex] = (zobristHash, depth, score, boundType, encodedMove, self.searchGeneration)
+
+    def clear(self):
+        self.entryList = [None] * len(self.entryList)
+
+
+class SearchResult:
+    def __init__(self, bestMove, principalVariation, score, depth, nodeCount, elapsedTime):
+        # bestMove is a (piece, move) pair that can be played with piece.movePiece(*move), or None without legal moves
+        self.bestMove = bestMove
+        # Coordinate notation moves, like ["e2e4", "e7e5"]
+        self.principalVariation = principalVariation
+        self.score = score
+        self.depth = depth
+        self.nodeCount = nodeCount
+        self.elapsedTime = elapsedTime
+        self.nodesPerSecond = nodeCount / elapsedTime if elapsedTime > 0 else 0.0
+
+    def findMateDistance(self):
+        # Moves until mate, negative when the side to move is being mated, or None if no mate was found
+        if self.score >= mateThreshold:
+            return (mateScore - self.score + 1) // 2
+        if self.score <= -mateThreshold:
+            return -((mateScore + self.score) // 2)
+        return None
+
+
+class SearchEngine:
+    # Iterative deepening negamax alpha-beta search over a GameBoard, using makeMove and unmakeMove. The board is
+    # returned to its original position when the search ends.
+    def __init__(self, transpositionTableSize=1 << 20):
+        self.transpositionTable = TranspositionTable(transpositionTableSize)
+        # Set by stop and cleared only by resetStop, so a stop sent before the search thread gets going is not lost
+        self.stopRequested = False
+        # Set when the current search has to end, by stop or by reaching its time or node limit
+        self.searchAborted = False
+        self.nodeCount = 0
+
+    def stop(self):
+        # Can be called from another thread; the search returns the result of its last completed depth. Searches
+        # started afterwards stop straight away too, until resetStop is called.
+        self.stopRequested = True
+        self.searchAborted = True
+
+    def resetStop(self):
+        # Call before starting a search that may be stopped from another thread, not from inside that thread
+        self.stopRequested = False
+
+    def search(self, gameBoard, maxDepth=None, timeLimit=None, nodeLimit=None, infoCallback=None, useOpeningBook=True):
+        # Searches until maxDepth is completed, timeLimit seconds pass or nodeLimit nodes are searched. Without any
+        # limit the search stops after defaultSearchDepth. infoCallback is called with a SearchResult after every
+        # completed depth. A move from the board's opening book is returned straight away, without searching.
+        if maxDepth is None:
+            maxDepth = maxSearchPly - 1 if timeLimit is not None or nodeLimit is not None else defaultSearchDepth
+        startTime = time.perf_counter()
+        self.gameBoard = gameBoard
+        self.deadline = startTime + timeLimit if timeLimit is not None else None
+        self.nodeLimit = nodeLimit
+        self.nodeCount = 0
+        self.searchAborted = self.stopRequested
+        self.killerMoveLists = [[None, None] for _ in range(maxSearchPly + 1)]
+        self.historyScoreList = [0] * (120 * 120)
+        self.principalVariationTable = [[] for _ in range(maxSearchPly + 1)]
+        self.transpositionTable.searchGeneration += 1
+
+        if useOpeningBook:
+            bookMove = gameBoard.chooseBookMove()
+            if bookMove is not None:
+                return SearchResult(bookMove, [gameClasses.convertMoveToCoordinateNotation(*bookMove)], 0, 0, 0,
+                                    time.perf_counter() - startTime)
+
+        playerColor = gameBoard.playerToMoveNext
+        rootMoveList = gameBoard.generateLegalMoves(playerColor)
+        if gameBoard.checkIfCheckmate(playerColor, rootMoveList):
+            return SearchResult(None, [], -mateScore, 0, 0, time.perf_counter() - startTime)
+        if gameBoard.checkIfStalemate(playerColor, rootMoveList):
+            return SearchResult(None, [], 0, 0, 0, time.perf_counter() - startTime)
+
+        # Used if the first depth is cut short by the limits
+        chessPiece, legalMove = self.orderMoves(rootMoveList, None, 0)[0]
+        searchResult = SearchResult((chessPiece, legalMove), [gameClasses.convertMoveToCoordinateNotation(chessPiece, legalMove)],
+                                    0, 0, 0, 0.0)
+        for depth in range(1, maxDepth + 1):
+            score = self.searchNode(depth, -infiniteScore, infiniteScore, 0)
+            if self.searchAborted:
+                break
+            principalVariation = self.principalVariationTable[0]
+            searchResult = SearchResult(principalVariation[0][:2], [moveNotation for _, _, moveNotation in principalVariation],
+                                        score, depth, self.nodeCount, time.perf_counter() - startTime)
+            if infoCallback is not None:
+                infoCallback(searchResult)
+            if abs(score) >= mateThreshold:
+                break
+            # The next depth takes several times longer than this one, so it would most likely not finish in time
+            if self.deadline is not None and time.perf_counter() - startTime > timeLimit / 2:
+                break
+
+        searchResult.nodeCount = self.nodeCount
+        searchResult.elapsedTime = time.perf_counter() - startTime
+        searchResult.nodesPerSecond = searchResult.nodeCount / searchResult.elapsedTime if searchResult.elapsedTime > 0 else 0.0
+        return searchResult
+
+    def checkSearchLimits(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.searchAborted = True
+        if self.nodeLimit is not None and self.nodeCount >= self.nodeLimit:
+            self.searchAborted = True
+
+    def searchNode(self, depth, alpha, beta, ply):
+        gameBoard = self.gameBoard
+        self.principalVariationTable[ply] = []
+        if ply > 0:
+            if gameBoard.positionCountDict[gameBoard.zobristHash] >= 2 or \
+                    gameBoard.movesSinceLastCaptureOrPawnMove >= 100 or gameBoard.checkIfDraw():
+                return 0
+            if ply >= maxSearchPly:
+                return evaluation.evaluatePosition(gameBoard)
+            # Endgames in the tablebase are scored exactly, with the distance to mate counted from the root
+            tablebaseResult = gameBoard.probeTablebase()
+            if tablebaseResult is not None:
+                tablebaseScore, pliesToMate = tablebaseResult
+                return tablebaseScore * (mateScore - ply - pliesToMate) if tablebaseScore else 0
+
+        playerColor = gameBoard.playerToMoveNext
+        inCheck = gameBoard.whiteInCheck if playerColor == "White" else gameBoard.blackInCheck
+        if inCheck:
+            depth += 1
+        if depth <= 0:
+            return self.quiescenceSearch(alpha, beta, ply)
+
+        self.nodeCount += 1
+        if not self.nodeCount & 1023:
+            self.checkSearchLimits()
+        if self.searchAborted:
+            return 0
+
+        transpositionMove = None
+        transpositionEntry = self.transpositionTable.probe(gameBoard.zobristHash)
+        if transpositionEntry is not None:
+            transpositionMove = transpositionEntry[4]
+            if ply > 0 and transpositionEntry[1] >= depth:
+                score = convertScoreFromTable(transpositionEntry[2], ply)
+                boundType = transpositionEntry[3]
+                if boundType == exactBound or (boundType == lowerBound and score >= beta) or \
+                        (boundType == upperBound and score <= alpha):
+                    return score
+
+        legalMoveList = gameBoard.generateLegalMoves(playerColor)
+        if gameBoard.checkIfCheckmate(playerColor, legalMoveList):
+            return -mateScore + ply
+        if gameBoard.checkIfStalemate(playerColor, legalMoveList):
+            return 0
+
+        originalAlpha = alpha
+        bestScore = -infiniteScore
+        bestEncodedMove = None
+        for chessPiece, legalMove in self.orderMoves(legalMoveList, transpositionMove, ply):
+            undoRecord = gameBoard.makeMove(chessPiece, legalMove)
+            score = -self.searchNode(depth - 1, -beta, -alpha, ply + 1)
+            gameBoard.unmakeMove(undoRecord)
+            if self.searchAborted:
+                return 0
+
+            if score > bestScore:
+                bestScore = score
+                bestEncodedMove = encodeMove(chessPiece, legalMove)
+                if score > alpha:
+                    alpha = score
+                    self.principalVariationTable[ply] = \
+                        [(chessPiece, legalMove, gameClasses.convertMoveToCoordinateNotation(chessPiece, legalMove))] + \
+                        self.principalVariationTable[ply + 1]
+                    if score >= beta:
+                        if self.checkIfQuietMove(legalMove):
+                            self.recordQuietCutoff(bestEncodedMove, depth, ply)
+                        break
+
+        if bestScore <= originalAlpha:
+            boundType = upperBound
+        elif bestScore >= beta:
+            boundType = lowerBound
+        else:
+            boundType = exactBound
+        self.transpositionTable.store(gameBoard.zobristHash, depth, convertScoreToTable(bestScore, ply), boundType,
+                                      bestEncodedMove)
+        return bestScore
+
+    def quiescenceSearch(self, alpha, beta, ply):
+        # Only captures and promotions are searched, so the static evaluation is never taken in the middle of an
+        # exchange
+        gameBoard = self.gameBoard
+        self.nodeCount += 1
+        if not self.nodeCount & 1023:
+            self.checkSearchLimits()
+        if self.searchAborted:
+            return 0
+
+        standPatScore = evaluation.evaluatePosition(gameBoard)
+        if standPatScore >= beta or ply >= maxSearchPly:
+            return standPatScore
+        if standPatScore > alpha:
+            alpha = standPatScore
+
+        tacticalMoveList = [(chessPiece, legalMove) for chessPiece, legalMove in gameBoard.generateLegalMoves()
+                            if not self.checkIfQuietMove(legalMove)]
+        for chessPiece, legalMove in self.orderMoves(tacticalMoveList, None, ply):
+            undoRecord = gameBoard.makeMove(chessPiece, legalMove)
+            score = -self.quiescenceSearch(-beta, -alpha, ply + 1)
+            gameBoard.unmakeMove(undoRecord)
+            if self.searchAborted:
+                return 0
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    @staticmethod
+    def checkIfQuietMove(legalMove):
+        # Castling moves carry the rook as their collided piece but are not captures
+        return not legalMove[3] and (not legalMove[1] or legalMove[2])
+
+    def recordQuietCutoff(self, encodedMove, depth, ply):
+        killerMoveList = self.killerMoveLists[ply]
+        if killerMoveList[0] != encodedMove:
+            killerMoveList[1] = killerMoveList[0]
+            killerMoveList[0] = encodedMove
+        historyIndex = encodedMove[0] * 120 + encodedMove[1]
+        self.historyScoreList[historyIndex] += depth * depth
+        if self.historyScoreList[historyIndex] >= maxHistoryScore:
+            self.historyScoreList = [historyScore // 2 for historyScore in self.historyScoreList]
+
+    def orderMoves(self, legalMoveList, transpositionMove, ply):
+        killerMoveList = self.killerMoveLists[ply]
+        historyScoreList = self.historyScoreList
+        scoredMoveList = []
+        for chessPiece, legalMove in legalMoveList:
+            encodedMove = encodeMove(chessPiece, legalMove)
+            if encodedMove == transpositionMove:
+                orderScore = transpositionMoveOrderScore
+            elif legalMove[1] and not legalMove[2]:
+                orderScore = captureOrderScore + 10 * evaluation.pieceValueList[legalMove[1].pieceType] - chessPiece.pieceType
+                if legalMove[3]:
+                    orderScore += evaluation.pieceValueList[legalMove[3].pieceType]
+            elif legalMove[3]:
+                orderScore = promotionOrderScore + evaluation.pieceValueList[legalMove[3].pieceType]
+            elif encodedMove == killerMoveList[0]:
+                orderScore = killerMoveOrderScoreList[0]
+            elif encodedMove == killerMoveList[1]:
+                orderScore = killerMoveOrderScoreList[1]
+            else:
+                orderScore = historyScoreList[encodedMove[0] * 120 + encodedMove[1]]
+            scoredMoveList.append((orderScore, chessPiece, legalMove))
+        scoredMoveList.sort(key=lambda scoredMove: scoredMove[0], reverse=True)
+        return [(chessPiece, legalMove) for _, chessPiece, legalMove in scoredMoveList]
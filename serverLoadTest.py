@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import gameServer
+
+
+class GameClient:
+    # One connection to the game server, sending one request at a time and skipping events about other moves
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.requestIdCounter = 0
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, requestType, **requestFields):
+        self.requestIdCounter += 1
+        requestFields.update(type=requestType, id=self.requestIdCounter)
+        self.writer.write(json.dumps(requestFields).encode() + b"\n")
+        await self.writer.drain()
+        while True:
+            response = json.loads(await self.reader.readline())
+            if response.get("id") == self.requestIdCounter:
+                if response["type"] == "error":
+                    raise ValueError(response["message"])
+                return response
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def playRandomGame(host, port, maxPlies, randomGenerator, moveLatencyList):
+    # Plays random legal moves until the game ends or maxPlies moves were made, recording each move's round trip time
+    gameClient = await GameClient.connect(host, port)
+    try:
+        gameId = (await gameClient.request("newGame"))["gameId"]
+        for _ in range(maxPlies):
+            moveNotationList = (await gameClient.request("legalMoves", gameId=gameId))["moves"]
+            if not moveNotationList:
+                break
+            startTime = time.perf_counter()
+            moveResponse = await gameClient.request("move", gameId=gameId, move=randomGenerator.choice(moveNotationList))
+            moveLatencyList.append(time.perf_counter() - startTime)
+            if moveResponse["status"] != "ongoing":
+                break
+        await gameClient.request("closeGame", gameId=gameId)
+    finally:
+        await gameClient.close()
+
+
+def findPercentile(sortedValueList, percentile):
+    if not sortedValueList:
+        return 0.0
+    return sortedValueList[min(len(sortedValueList) - 1, int(len(sortedValueList) * percentile / 100))]
+
+
+async def runLoadTest(gameCount, maxPlies=100, host=gameServer.defaultHost, port=None, workers=None, seed=0):
+    # Plays gameCount random games at the same time against the server at host and port, or against a server started
+    # in this process when port is None, and returns (move count, elapsed seconds, sorted move latencies)
+    gameServerInProcess = None
+    if port is None:
+        gameServerInProcess = gameServer.GameServer(host, 0, workers)
+        await gameServerInProcess.start()
+        port = gameServerInProcess.port
+
+    moveLatencyList = []
+    startTime = time.perf_counter()
+    try:
+        await asyncio.gather(*[playRandomGame(host, port, maxPlies, random.Random(seed + gameIndex), moveLatencyList)
+                               for gameIndex in range(gameCount)])
+    finally:
+        elapsedTime = time.perf_counter() - startTime
+        if gameServerInProcess is not None:
+            await gameServerInProcess.close()
+    return len(moveLatencyList), elapsedTime, sorted(moveLatencyList)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many concurrent random games against the game server and report "
+                                                 "move throughput and latency.")
+    parser.add_argument("--games", type=int, default=100, help="number of concurrent games")
+    parser.add_argument("--plies", type=int, default=100, help="most moves played in each game")
+    parser.add_argument("--host", default=gameServer.defaultHost)
+    parser.add_argument("--port", type=int, help="an already running server, instead of one started in this process")
+    parser.add_argument("--workers", type=int, help="validation threads of the server started in this process")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    moveCount, elapsedTime, moveLatencyList = asyncio.run(
+        runLoadTest(arguments.games, arguments.plies, arguments.host, arguments.port, arguments.workers, arguments.seed))
+    print(f"{arguments.games} concurrent games  {moveCount} moves in {elapsedTime:.2f}s  "
+          f"{moveCount / elapsedTime if elapsedTime > 0 else 0.0:.0f} moves/s")
+    print(f"move latency  p50 {findPercentile(moveLatencyList, 50) * 1000:.2f} ms  "
+          f"p99 {findPercentile(moveLatencyList, 99) * 1000:.2f} ms  max {findPercentile(moveLatencyList, 100) * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
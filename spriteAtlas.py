@@ -0,0 +1,80 @@
+import os
+
+import pygame
+
+import gameClasses
+
+defaultAssetDirectory = "assets"
+defaultCacheDirectory = os.path.join("assets", "cache")
+# Sprites besides the pieces, with the fraction of a board square they are scaled to
+overlaySpriteScaleDict = {"redBorder": 1.0, "greenSquare": 1.0, "greenDot": 0.5}
+
+
+def findSpriteSize(blockSize):
+    # Pieces leave a tenth of the square free on each side
+    return blockSize - int(blockSize * 0.2)
+
+
+class SpriteAtlas:
+    # Every piece and overlay sprite, scaled for one window size and packed side by side into a single surface. The
+    # packed atlas and the scaled board are saved to the cache directory the first time a size is used, so later
+    # launches load two images instead of scaling seventeen. Sprites are subsurfaces of the atlas, looked up by
+    # (piece type, player color) or by overlay name.
+    def __init__(self, screenSize, assetDirectory=defaultAssetDirectory, cacheDirectory=defaultCacheDirectory):
+        self.screenSize = screenSize
+        self.assetDirectory = assetDirectory
+        self.cacheDirectory = cacheDirectory
+        self.blockSize = int(screenSize / 8)
+        self.spriteSize = findSpriteSize(self.blockSize)
+
+        # (sprite key, asset name, size) in atlas order, from left to right
+        self.layoutList = []
+        for pieceClass in gameClasses.GameBoard.pieceClassList:
+            for playerColor in ["White", "Black"]:
+                assetName = f"{playerColor.lower()}{pieceClass.__name__[:-len('Piece')]}"
+                self.layoutList.append(((pieceClass.pieceType, playerColor), assetName, self.spriteSize))
+        for overlayName, squareFraction in overlaySpriteScaleDict.items():
+            self.layoutList.append((overlayName, overlayName, int(self.blockSize * squareFraction)))
+
+        atlasPath = os.path.join(cacheDirectory, f"atlas{screenSize}.png")
+        backgroundPath = os.path.join(cacheDirectory, f"chessBoard{screenSize}.png")
+        if self.checkIfCacheIsCurrent([atlasPath, backgroundPath]):
+            self.atlasSurface = pygame.image.load(atlasPath).convert_alpha()
+            self.backgroundSurface = pygame.image.load(backgroundPath).convert()
+        else:
+            self.atlasSurface = self.buildAtlasSurface()
+            self.backgroundSurface = pygame.transform.scale(self.loadAsset("chessBoard"), (screenSize, screenSize)).convert()
+            os.makedirs(cacheDirectory, exist_ok=True)
+            pygame.image.save(self.atlasSurface, atlasPath)
+            pygame.image.save(self.backgroundSurface, backgroundPath)
+
+        self.spriteDict = {}
+        atlasOffset = 0
+        for spriteKey, _, spriteSize in self.layoutList:
+            self.spriteDict[spriteKey] = self.atlasSurface.subsurface((atlasOffset, 0, spriteSize, spriteSize))
+            atlasOffset += spriteSize
+        self.pieceSpriteDict = {spriteKey: sprite for spriteKey, sprite in self.spriteDict.items() if isinstance(spriteKey, tuple)}
+        self.overlaySpriteDict = {overlayName: self.spriteDict[overlayName] for overlayName in overlaySpriteScaleDict}
+
+    def loadAsset(self, assetName):
+        return pygame.image.load(os.path.join(self.assetDirectory, f"{assetName}.png"))
+
+    def checkIfCacheIsCurrent(self, cachePathList):
+        # The cache is rebuilt when any source image is newer than it
+        if not all(os.path.exists(cachePath) for cachePath in cachePathList):
+            return False
+        cacheTime = min(os.path.getmtime(cachePath) for cachePath in cachePathList)
+        assetNameList = ["chessBoard"] + [assetName for _, assetName, _ in self.layoutList]
+        return all(os.path.getmtime(os.path.join(self.assetDirectory, f"{assetName}.png")) <= cacheTime for assetName in assetNameList)
+
+    def buildAtlasSurface(self):
+        atlasWidth = sum(spriteSize for _, _, spriteSize in self.layoutList)
+        atlasHeight = max(spriteSize for _, _, spriteSize in self.layoutList)
+        atlasSurface = pygame.Surface((atlasWidth, atlasHeight), pygame.SRCALPHA).convert_alpha()
+        atlasOffset = 0
+        for _, assetName, spriteSize in self.layoutList:
+            # The atlas starts fully transparent, so taking the maximum copies each sprite's pixels and alpha unchanged
+            atlasSurface.blit(pygame.transform.scale(self.loadAsset(assetName).convert_alpha(), (spriteSize, spriteSize)),
+                              (atlasOffset, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            atlasOffset += spriteSize
+        return atlasSurface
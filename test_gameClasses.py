@@ -0,0 +1,21 @@
+import pytest
+
+import gameClasses
+
+
+@pytest.mark.parametrize("fenString", ["4k2P/8/8/8/8/8/8/4K3 w - - 0 1",
+                                       "4k3/8/8/8/8/8/8/p3K3 b - - 0 1"])
+def test_fromFENRejectsPawnOnBackRank(fenString):
+    with pytest.raises(ValueError):
+        gameClasses.GameBoard.fromFEN(fenString)
+
+
+def test_fromBinaryRejectsPawnOnBackRank():
+    # toBinary does not check pawn ranks, so a board with a pawn moved onto the last rank gives such an encoding
+    gameBoard = gameClasses.GameBoard.fromFEN("4k3/7P/8/8/8/8/8/4K3 w - - 0 1")
+    pawnPiece = gameBoard.squareList[gameClasses.convertPositionToSquareIndex("h7")]
+    gameBoard.squareList[pawnPiece.squareIndex] = None
+    pawnPiece.squareIndex = gameClasses.convertPositionToSquareIndex("h8")
+    gameBoard.squareList[pawnPiece.squareIndex] = pawnPiece
+    with pytest.raises(ValueError):
+        gameClasses.GameBoard.fromBinary(gameBoard.toBinary())
@@ -0,0 +1,44 @@
+import random
+
+import gameClasses
+import gameJournal
+
+
+def findMoveListsBySquare(gameBoard):
+    return {chessPiece.squareIndex: sorted((legalMove[0], bool(legalMove[2]), legalMove[3].__name__ if legalMove[3] else "")
+                                           for legalMove in chessPiece.positionsBeingAttackedByPiece)
+            for chessPiece in gameBoard.pieceList}
+
+
+def checkMatchesFreshBoard(gameBoard):
+    freshGameBoard = gameClasses.GameBoard.fromFEN(gameBoard.toFEN())
+    assert findMoveListsBySquare(gameBoard) == findMoveListsBySquare(freshGameBoard)
+    assert (gameBoard.whiteInCheck, gameBoard.blackInCheck) == (freshGameBoard.whiteInCheck, freshGameBoard.blackInCheck)
+
+
+def test_resumeFromSnapshotRebuildsMoveLists(tmp_path):
+    journalPath = str(tmp_path / "game.journal")
+    gameBoard = gameClasses.GameBoard()
+    with gameJournal.GameJournal(journalPath, gameBoard, snapshotInterval=0) as journal:
+        for moveNotation in ["e2e4", "e7e5", "g1f3"]:
+            journal.playMove(*gameBoard.findMoveFromCoordinateNotation(moveNotation))
+
+    journal = gameJournal.GameJournal.resume(journalPath, snapshotInterval=0)
+    checkMatchesFreshBoard(journal.gameBoard)
+    # Moves played after resuming build on the rebuilt state
+    journal.playMove(*journal.gameBoard.findMoveFromCoordinateNotation("b8c6"))
+    journal.close()
+    checkMatchesFreshBoard(journal.gameBoard)
+
+
+def test_loadEveryPlyMatchesFreshBoard(tmp_path):
+    journalPath = str(tmp_path / "game.journal")
+    bitboardMoveList = gameJournal.playRandomGame(80, random.Random(1))
+    gameBoard = gameClasses.GameBoard()
+    with gameJournal.GameJournal(journalPath, gameBoard, snapshotInterval=16) as journal:
+        for bitboardMove in bitboardMoveList:
+            journal.playMove(*gameBoard.convertBitboardMove(bitboardMove))
+
+    journalContents = gameJournal.readJournal(journalPath)
+    for plyNumber in range(journalContents.plyCount + 1):
+        checkMatchesFreshBoard(gameJournal.loadGameBoard(journalContents, plyNumber))
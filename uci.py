@@ -0,0 +1,202 @@
+import argparse
+import logging
+import sys
+import threading
+
+import endgameTablebase
+import gameClasses
+import legalMoveCache
+import openingBook
+import searchEngine
+
+logger = logging.getLogger(__name__)
+
+engineName = "chess"
+engineAuthor = "angelowilliams"
+# When only clock times are given, a move gets this fraction of the remaining time plus half the increment
+defaultMovesToGo = 30
+
+
+class UCIEngine:
+    # Speaks the Universal Chess Interface over a pair of text streams. The calling thread only reads and answers
+    # commands, and each search runs on its own thread, so isready and stop are answered while a search is going on.
+    def __init__(self, inputStream=sys.stdin, outputStream=sys.stdout, openingBookPath=None, tablebaseDirectory=None):
+        self.inputStream = inputStream
+        self.outputStream = outputStream
+        self.outputLock = threading.Lock()
+        self.searchEngine = searchEngine.SearchEngine()
+        self.legalMoveCache = legalMoveCache.LegalMoveCache()
+        self.openingBook = openingBook.OpeningBook(openingBookPath) if openingBookPath else None
+        self.tablebase = endgameTablebase.EndgameTablebase(tablebaseDirectory) if tablebaseDirectory else None
+        self.gameBoard = self.createGameBoard()
+        self.searchThread = None
+        # Set by stop, so that an infinite search holds back its bestmove until then
+        self.stopEvent = threading.Event()
+
+    def createGameBoard(self, fenString=None):
+        return gameClasses.GameBoard(fenString=fenString, legalMoveCache=self.legalMoveCache, openingBook=self.openingBook,
+                                     tablebase=self.tablebase)
+
+    def sendLine(self, line):
+        # Info lines come from the search thread and replies from the input thread
+        with self.outputLock:
+            self.outputStream.write(line + "\n")
+            self.outputStream.flush()
+
+    def run(self):
+        for line in self.inputStream:
+            if not self.handleCommand(line):
+                break
+        self.stopSearch()
+        return 0
+
+    def handleCommand(self, line):
+        # Returns False once the engine should exit. Unknown commands are ignored, as the protocol asks.
+        tokenList = line.split()
+        if not tokenList:
+            return True
+        command, argumentList = tokenList[0], tokenList[1:]
+        if command == "uci":
+            self.sendLine(f"id name {engineName}")
+            self.sendLine(f"id author {engineAuthor}")
+            self.sendLine("uciok")
+        elif command == "isready":
+            self.sendLine("readyok")
+        elif command == "ucinewgame":
+            self.stopSearch()
+            self.searchEngine.transpositionTable.clear()
+            self.gameBoard = self.createGameBoard()
+        elif command == "position":
+            self.stopSearch()
+            try:
+                self.gameBoard = self.setUpPosition(argumentList)
+            except ValueError as error:
+                logger.warning("Bad position command %r: %s", line.strip(), error)
+                self.sendLine(f"info string {error}")
+        elif command == "go":
+            self.stopSearch()
+            self.startSearch(argumentList)
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "quit":
+            return False
+        else:
+            logger.debug("Ignoring unknown command %r", line.strip())
+        return True
+
+    def setUpPosition(self, argumentList):
+        # "startpos [moves ...]" or "fen <six fields> [moves ...]"
+        if "moves" in argumentList:
+            movesIndex = argumentList.index("moves")
+            positionArgumentList, moveNotationList = argumentList[:movesIndex], argumentList[movesIndex + 1:]
+        else:
+            positionArgumentList, moveNotationList = argumentList, []
+        if positionArgumentList == ["startpos"]:
+            gameBoard = self.createGameBoard()
+        elif positionArgumentList[:1] == ["fen"] and len(positionArgumentList) > 1:
+            gameBoard = self.createGameBoard(" ".join(positionArgumentList[1:]))
+        else:
+            raise ValueError("Expected startpos or fen")
+        for moveNotation in moveNotationList:
+            foundMove = gameBoard.findMoveFromCoordinateNotation(moveNotation)
+            if foundMove is None:
+                raise ValueError(f"Illegal move: {moveNotation}")
+            gameBoard.makeMove(*foundMove)
+        return gameBoard
+
+    def parseSearchLimits(self, argumentList):
+        # Returns (maxDepth, timeLimit, nodeLimit, isInfinite) from the arguments of a go command
+        integerOptionDict = {}
+        isInfinite = False
+        argumentIterator = iter(argumentList)
+        for argument in argumentIterator:
+            if argument == "infinite":
+                isInfinite = True
+            elif argument in ["depth", "movetime", "nodes", "wtime", "btime", "winc", "binc", "movestogo"]:
+                try:
+                    integerOptionDict[argument] = int(next(argumentIterator))
+                except (StopIteration, ValueError):
+                    raise ValueError(f"go {argument} needs a number")
+
+        maxDepth = integerOptionDict.get("depth")
+        if maxDepth is not None:
+            maxDepth = max(1, min(maxDepth, searchEngine.maxSearchPly - 1))
+        timeLimit = None
+        if "movetime" in integerOptionDict:
+            timeLimit = integerOptionDict["movetime"] / 1000
+        else:
+            clockPrefix = "w" if self.gameBoard.playerToMoveNext == "White" else "b"
+            if f"{clockPrefix}time" in integerOptionDict:
+                remainingTime = integerOptionDict[f"{clockPrefix}time"] / 1000
+                increment = integerOptionDict.get(f"{clockPrefix}inc", 0) / 1000
+                movesToGo = integerOptionDict.get("movestogo") or defaultMovesToGo
+                # Never plan to use more than most of what is left on the clock
+                timeLimit = min(remainingTime / movesToGo + increment / 2, remainingTime * 0.8)
+        nodeLimit = integerOptionDict.get("nodes")
+        if isInfinite:
+            maxDepth, timeLimit, nodeLimit = searchEngine.maxSearchPly - 1, None, None
+        return maxDepth, timeLimit, nodeLimit, isInfinite
+
+    def startSearch(self, argumentList):
+        try:
+            maxDepth, timeLimit, nodeLimit, isInfinite = self.parseSearchLimits(argumentList)
+        except ValueError as error:
+            self.sendLine(f"info string {error}")
+            return
+        # Both are cleared here rather than on the search thread, so a stop read right after this go is never lost
+        self.stopEvent.clear()
+        self.searchEngine.resetStop()
+        self.searchThread = threading.Thread(target=self.runSearch, args=(self.gameBoard, maxDepth, timeLimit, nodeLimit, isInfinite),
+                                             name="uciSearch", daemon=True)
+        self.searchThread.start()
+
+    def stopSearch(self):
+        # Ends a running search, which still sends its bestmove, and waits for its thread
+        if self.searchThread is None:
+            return
+        self.stopEvent.set()
+        self.searchEngine.stop()
+        self.searchThread.join()
+        self.searchThread = None
+
+    def runSearch(self, gameBoard, maxDepth, timeLimit, nodeLimit, isInfinite):
+        # Runs on the search thread
+        try:
+            searchResult = self.searchEngine.search(gameBoard, maxDepth=maxDepth, timeLimit=timeLimit, nodeLimit=nodeLimit,
+                                                    infoCallback=self.sendSearchInfo)
+        except Exception:
+            logger.exception("Search failed")
+            self.sendLine("bestmove 0000")
+            return
+        # In infinite mode the protocol only allows bestmove after stop, even if the search ended by itself
+        if isInfinite:
+            self.stopEvent.wait()
+        if searchResult.bestMove is None:
+            self.sendLine("bestmove 0000")
+            return
+        bestMoveLine = f"bestmove {searchResult.principalVariation[0]}"
+        if len(searchResult.principalVariation) > 1:
+            bestMoveLine += f" ponder {searchResult.principalVariation[1]}"
+        self.sendLine(bestMoveLine)
+
+    def sendSearchInfo(self, searchResult):
+        mateDistance = searchResult.findMateDistance()
+        scoreString = f"mate {mateDistance}" if mateDistance is not None else f"cp {searchResult.score}"
+        self.sendLine(f"info depth {searchResult.depth} score {scoreString} nodes {searchResult.nodeCount} "
+                      f"nps {int(searchResult.nodesPerSecond)} time {int(searchResult.elapsedTime * 1000)} "
+                      f"pv {' '.join(searchResult.principalVariation)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the search engine as a UCI engine on standard input and output.")
+    parser.add_argument("--book", help="opening book file to play the first moves from")
+    parser.add_argument("--tablebases", help="directory of endgame tablebases")
+    parser.add_argument("--log", help="write a debug log to this file, since standard output belongs to the protocol")
+    arguments = parser.parse_args()
+    if arguments.log:
+        logging.basicConfig(filename=arguments.log, level=logging.DEBUG)
+    return UCIEngine(openingBookPath=arguments.book, tablebaseDirectory=arguments.tablebases).run()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,11 @@
+import random
+
+# Zobrist keys for hashing positions. The generator is seeded so that every process produces the same keys, which
+# lets hashes be stored on disk or compared across worker processes. Squares use the bitboard numbering, 0 (a1) to
+# 63 (h8), and pieces use the bitboard backend's color and piece type numbers.
+zobristRandom = random.Random(0x5A0B2157)
+pieceSquareKeyLists = [[[zobristRandom.getrandbits(64) for _ in range(64)] for _ in range(6)] for _ in range(2)]
+blackToMoveKey = zobristRandom.getrandbits(64)
+# One key per combination of the four castling rights bits
+castlingRightsKeyList = [zobristRandom.getrandbits(64) for _ in range(16)]
+enPassantFileKeyList = [zobristRandom.getrandbits(64) for _ in range(8)]